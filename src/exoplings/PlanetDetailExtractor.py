@@ -1,23 +1,33 @@
+import logging
+import os
+
 import lightkurve as lk
 import numpy as np
 import pandas as pd
 from astropy.constants import R_earth, R_sun
 
+from .lightcurves import clean_window, download_light_curve_files, extract_transit_window, read_fits_light_curves, transit_mask
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data_csv")  # catalogs shipped with the package
+
+logger = logging.getLogger(__name__)
+
 
 class PlanetDetailExtractor:
-    def __init__(self, telescope="kepler"):
+    def __init__(self, telescope="kepler", archive=None):
         self.r_earth = R_earth.value
         self.r_sun = R_sun.value
         self.telescope = telescope
+        self.archive = archive  # ArchiveClient searched instead of MAST, see archive.py
         if telescope == "kepler":
-            df_kepl = pd.read_csv("data_csv/kepler.csv", skiprows=53, header=0)
+            df_kepl = pd.read_csv(os.path.join(DATA_DIR, "kepler.csv"), skiprows=53, header=0)
             self.df = df_kepl[df_kepl["koi_disposition"] == "CONFIRMED"]
             #### apply extra filters? 'koi_model_snr','koi_tce_plnt_num'
         elif telescope == "tess":
-            df_tess = pd.read_csv("data_csv/tess.csv", skiprows=69, header=0)
+            df_tess = pd.read_csv(os.path.join(DATA_DIR, "tess.csv"), skiprows=69, header=0)
             self.df = df_tess[df_tess["tfopwg_disp"] == "KP"]
         else:
-            print("Telescope not found.")
+            logger.error("Telescope not found.")
 
     def confirmed_planets(self):
         if self.telescope == "kepler":
@@ -25,28 +35,28 @@ class PlanetDetailExtractor:
         elif self.telescope == "tess":
             return self.df[["toi", "tid"]]
 
-    def convert2convention_kepler(self, localdf):
-        z = localdf["koi_prad"].values[0] * self.r_earth / (localdf["koi_srad"].values[0] * self.r_sun)
+    def convert2convention_kepler(self, localdf, i=0):
+        z = localdf["koi_prad"].values[i] * self.r_earth / (localdf["koi_srad"].values[i] * self.r_sun)
         localdict = {
             "z": z,
-            "t0": localdf["koi_time0bk"].values[0],
-            "per": localdf["koi_period"].values[0],
-            "impact": localdf["koi_impact"].values[0],
-            "duration": localdf["koi_duration"].values[0] / 24.0,
+            "t0": localdf["koi_time0bk"].values[i],
+            "per": localdf["koi_period"].values[i],
+            "impact": localdf["koi_impact"].values[i],
+            "duration": localdf["koi_duration"].values[i] / 24.0,
             #  'depth'    : localdf['koi_depth'].values[0]
         }
         return localdict
 
-    def convert2convention_tess(self, localdf):
+    def convert2convention_tess(self, localdf, i=0):
         # planet-to-star radius ratio
-        z = localdf["pl_rade"].values[0] * self.r_earth / (localdf["st_rad"].values[0] * self.r_sun)
+        z = localdf["pl_rade"].values[i] * self.r_earth / (localdf["st_rad"].values[i] * self.r_sun)
 
         localdict = {
             "z": z,
-            "t0": localdf["pl_tranmid"].values[0] - 2457000.0,  # mid-transit time [BTJD]
-            "per": localdf["pl_orbper"].values[0],  # orbital period [days]
+            "t0": localdf["pl_tranmid"].values[i] - 2457000.0,  # mid-transit time [BTJD]
+            "per": localdf["pl_orbper"].values[i],  # orbital period [days]
             "impact": None,  # not in TOI table
-            "duration": localdf["pl_trandurh"].values[0] / 24.0,  # hours → days
+            "duration": localdf["pl_trandurh"].values[i] / 24.0,  # hours → days
             # "depth"   : localdf['pl_trandep'].values[0]               # fractional depth
         }
         return localdict
@@ -58,11 +68,11 @@ class PlanetDetailExtractor:
         if "toi" in self.df.columns:
             localdf = self.df[self.df["tid"] == planet_name].copy()
         else:
-            print("No matching planet name column in TESS catalog")
+            logger.warning("No matching planet name column in TESS catalog")
             return None
 
         if len(localdf) == 0:
-            print(f"{planet_name} not found.")
+            logger.warning("%s not found.", planet_name)
             return None
         else:
             return self.convert2convention_tess(localdf)
@@ -81,7 +91,7 @@ class PlanetDetailExtractor:
             ["koi_time0bk", "koi_period", "koi_impact", "koi_duration", "koi_depth", "koi_prad", "koi_srad", "koi_model_snr", "koi_tce_plnt_num"]
         ].copy()
         if len(localdf) == 0:
-            print("Planet not found.")
+            logger.warning("Planet not found.")
             return None
         else:
             return self.convert2convention_kepler(localdf)
@@ -92,7 +102,81 @@ class PlanetDetailExtractor:
         elif self.telescope == "tess":
             return self.find_planet_details_tess(planet_name)
 
-    def find_data_kepler(self, planet_name, period_days, t0_btjd, window):
+    def find_system_details(self, host):
+        """Catalog parameters of every confirmed planet of a host star.
+
+        Args:
+            host (str | int): TESS TIC id, or Kepler planet name or KIC id of any planet of the system.
+
+        Returns:
+            list[dict]: `find_planet_details` dicts with an extra "name" key, by increasing period.
+                Planets missing a period, t0 or duration are left out, empty if the host is not in the catalog.
+        """
+        if self.telescope == "kepler":
+            row = self.df[self.df["kepler_name"] == host]
+            kepid = row["kepid"].values[0] if len(row) else int(host) if str(host).isdigit() else None
+            localdf = self.df[self.df["kepid"] == kepid]
+            names = list(localdf["kepler_name"].values)
+            convert = self.convert2convention_kepler
+        else:
+            localdf = self.df[self.df["tid"] == int(host)]
+            names = [f"TOI-{toi}" for toi in localdf["toi"].values]
+            convert = self.convert2convention_tess
+
+        planets = [{"name": name, **convert(localdf, i)} for i, name in enumerate(names)]
+        # planets without an ephemeris cannot be windowed or masked
+        planets = [planet for planet in planets if np.isfinite([planet["per"], planet["t0"], planet["duration"]]).all()]
+        return sorted(planets, key=lambda planet: planet["per"])
+
+    def find_system_data(self, host, planets, points=250, reader="fits"):
+        """Download the light curve of a host star once and cut one transit window per planet.
+
+        Before each window is extracted the transits of the sibling planets are removed, so
+        a window never contains another planet's transit.
+
+        Args:
+            host (str | int): TESS TIC id, or Kepler planet name or KIC id.
+            planets (list[dict]): Output of `find_system_details`.
+            points (int): Number of cadences per window.
+            reader (str): "fits" or "lightkurve", see `_read_light_curves`.
+
+        Returns:
+            tuple[pd.DataFrame | None, list[pd.DataFrame | None]]: The whole cleaned light curve, None if no
+                data was found, and the transit windows in the order of `planets`, None for a planet
+                without a usable transit.
+        """
+        df = self.find_full_light_curve(host, reader=reader)
+        if df is None:
+            return None, []
+
+        time, flux, flux_err = (df[column].to_numpy() for column in ("time_btjd", "flux", "flux_err"))
+        windows = []
+        for planet in planets:
+            keep = np.ones(len(time), dtype=bool)
+            for other in planets:
+                if other is not planet:
+                    keep &= ~transit_mask(time, other["per"], other["t0"], other["duration"])
+
+            try:
+                window = extract_transit_window(
+                    time[keep],
+                    flux[keep],
+                    flux_err[keep],
+                    planet["per"],
+                    planet["t0"],
+                    planet["duration"],
+                    points=points,
+                )
+            except RuntimeError as e:
+                # one planet without coverage does not fail the rest of its system
+                logger.warning("No usable transit for %s: %s", planet["name"], e)
+                window = None
+            windows.append(window)
+
+        logger.info("Returning %s transits for system %s.", sum(window is not None for window in windows), host)
+        return df, windows
+
+    def find_data_kepler(self, planet_name, period_days, t0_btjd, window, reader="fits"):
         # --- CONFIGURATION ---
         # target_name = "WASP-18"
         # period_days = 0.94145299   # orbital period from literature
@@ -106,16 +190,19 @@ class PlanetDetailExtractor:
             raise ValueError("Planet not found in local catalog")
 
         kepid = row["kepid"].values[0]
-        print(f"Searching Kepler lightcurves for {planet_name} (KIC {kepid}) ...")
+        logger.info("Searching Kepler lightcurves for %s (KIC %s) ...", planet_name, kepid)
 
         # try:
         #   print(f"Searching for short cadence...")
         #   lc_files = lk.search_lightcurve(f"KIC {kepid}", author="Kepler", cadence="short").download_all()
         #   print(f"Found!")
         # except:
-        print("Searching for 2-min cadence...")
-        lc_files = lk.search_lightcurve(f"KIC {kepid}", author="Kepler", cadence="short").download_all()
-        print("Found!")
+        logger.info("Searching for 1-min cadence...")
+        search_result = self._search(f"KIC {kepid}", author="Kepler", cadence="short")
+        if search_result is None or len(search_result) == 0:
+            # most Kepler stars only have 30-min cadence, which the resampling handles too
+            logger.info("Searching for any cadence...")
+            search_result = self._search(f"KIC {kepid}", author="Kepler")
 
         # # --- DOWNLOAD TESS PDCSAP LIGHTCURVE FILES ---
         # print(f"Searching Kepler lightcurves for {planet_name} ...")
@@ -126,66 +213,18 @@ class PlanetDetailExtractor:
         # if lc_files is None or len(lc_files) == 0:
         #     raise SystemExit("No Kepler lightcurve files found for: " + planet_name)
 
-        if lc_files is None or len(lc_files) == 0:
-            print(f"No Kepler lightcurve files found for: {planet_name}, skipping.")
+        if search_result is None or len(search_result) == 0:
+            logger.warning("No Kepler lightcurve files found for: %s, skipping.", planet_name)
             return None
         else:
-            print(f"Found {len(lc_files)} files. Stitching ...")
+            logger.info("Found %s files. Stitching ...", len(search_result))
 
-        combined = lc_files.stitch()
-        # lcs = [f.PDCSAP_FLUX for f in lc_files if f.PDCSAP_FLUX is not None]
-        # combined = lcs[0]
-        # if len(lcs) > 1:
-        #     for lc in lcs[1:]:
-        #         combined = combined.append(lc)
+        time, flux, flux_err, clean = self._read_light_curves(search_result, reader)
 
-        # --- CLEAN DATA ---
-        lc_clean = combined.remove_nans().remove_outliers(sigma=5)
-        time = lc_clean.time.value  # BTJD (BJD - 2457000)
-        flux = lc_clean.flux.value
-        flux_err = lc_clean.flux_err.value
-
-        df_full = pd.DataFrame({"time_btjd": time, "flux": flux, "flux_err": flux_err})
-        # df_full.to_csv("WASP-18_TESS_full_PDCSAP.csv", index=False)
-        print("Fully cleaned light curve.")
-
-        # --- EXTRACT ONE TRANSIT WINDOW (no interpolation) ---
-        # max_missing = 0.1   # allow up to 10% missing data
-        epoch = 0
-        n_windows = 2
-        df_transit = None
-
-        while df_transit is None:
-            # find mid-transit time for this epoch
-            t0_epoch = t0_btjd + epoch * period_days
-
-            # define window: center ± (duration + 1 duration each side)
-            half_window = n_windows * window
-            mask = (time > t0_epoch - half_window) & (time < t0_epoch + half_window)
-
-            sel_time = time[mask]
-            sel_flux = flux[mask]
-            sel_err = flux_err[mask]
-
-            # if more than 250 points, just take central 250 around transit
-            if len(sel_time) > 250:
-                mid_idx = np.argmin(np.abs(sel_time - t0_epoch))
-                half_n = 125
-                start = max(0, mid_idx - half_n)
-                end = start + 250
-                sel_time = sel_time[start:end]
-                sel_flux = sel_flux[start:end]
-                sel_err = sel_err[start:end]
-
-                df_transit = pd.DataFrame({"time_btjd": sel_time, "flux": sel_flux, "flux_err": sel_err})
-            else:
-                # not enough data, try next transit
-                epoch += 1
-                n_windows += 1
-                if epoch > 1000:  # safety break
-                    raise RuntimeError("No transit found with enough data")
-
-        print(f"Returning one transit with {len(sel_time)} raw points.")
+        # --- EXTRACT ONE TRANSIT WINDOW ---
+        df_transit = extract_transit_window(time, flux, flux_err, period_days, t0_btjd, window, points=250, clean=clean)
+
+        logger.info("Returning one transit with %s points.", len(df_transit))
         return df_transit
 
         # # --- EXTRACT TRANSIT WINDOWS ---
@@ -204,57 +243,90 @@ class PlanetDetailExtractor:
         # print("Returning transit windows.")
         # return df_transits
 
-    def find_data_tess(self, planet_name, period_days, t0_btjd, window, points=250, cadence="short"):
+    def find_data_tess(self, planet_name, period_days, t0_btjd, window, points=250, cadence="short", reader="fits"):
         tid = planet_name
-        print(f"Searching TESS lightcurves for {planet_name} (TIC {tid}) ...")
+        logger.info("Searching TESS lightcurves for %s (TIC %s) ...", planet_name, tid)
 
         if cadence == "short":
-            print("Searching for 2-min cadence...")
-            lc_files = lk.search_lightcurve(f"TIC {tid}", author="SPOC", cadence="short").download_all()
+            logger.info("Searching for 2-min cadence...")
+            search_result = self._search(f"TIC {tid}", author="SPOC", cadence="short")
+        if cadence != "short" or search_result is None or len(search_result) == 0:
+            logger.info("Searching for any cadence...")
+            search_result = self._search(f"TIC {tid}", author="SPOC")
+
+        if search_result is None or len(search_result) == 0:
+            logger.warning("No TESS lightcurve files found for: %s, skipping.", planet_name)
+            return None
+
+        logger.info("Found %s files. Stitching ...", len(search_result))
+        time, flux, flux_err, clean = self._read_light_curves(search_result, reader)
+
+        # --- EXTRACT ONE TRANSIT WINDOW ---
+        df_transit = extract_transit_window(time, flux, flux_err, period_days, t0_btjd, window, points=points, clean=clean)
+
+        logger.info("Returning one TESS transit for %s with %s points.", planet_name, len(df_transit))
+        return df_transit
+
+    def find_full_light_curve(self, planet_name, reader="fits"):
+        """Download and clean the whole light curve of a target without cutting out a transit.
+
+        Short-cadence light curves are used when the target has any, every cadence otherwise.
+
+        Args:
+            planet_name (str | int): Kepler planet name or KIC id, or TESS TIC id.
+            reader (str): "fits" or "lightkurve", see `_read_light_curves`.
+
+        Returns:
+            pd.DataFrame | None: `time_btjd`, `flux` and `flux_err` columns, None if no data was found.
+        """
+        if self.telescope == "kepler":
+            row = self.df[self.df["kepler_name"] == planet_name]
+            target, author = f"KIC {row['kepid'].values[0] if len(row) else planet_name}", "Kepler"
         else:
-            print("Searching for any cadence...")
-            lc_files = lk.search_lightcurve(f"TIC {tid}", author="SPOC").download_all()
+            target, author = f"TIC {planet_name}", "SPOC"
 
-        if lc_files is None or len(lc_files) == 0:
-            print(f"No TESS lightcurve files found for: {planet_name}, skipping.")
+        search_result = self._search(target, author=author, cadence="short")
+        if search_result is None or len(search_result) == 0:
+            # like the transit searches, fall back to the long cadences the resampling handles too
+            search_result = self._search(target, author=author)
+
+        if search_result is None or len(search_result) == 0:
+            logger.warning("No lightcurve files found for: %s, skipping.", planet_name)
             return None
 
-        print(f"Found {len(lc_files)} files. Stitching ...")
-        combined = lc_files.stitch()
+        time, flux, flux_err, clean = self._read_light_curves(search_result, reader)
+        if clean:
+            time, flux, flux_err = clean_window(time, flux, flux_err)
+        return pd.DataFrame({"time_btjd": time, "flux": flux, "flux_err": flux_err})
+
+    def _search(self, target, author, cadence=None):
+        """Search the light curves of a target on MAST, or on `self.archive` when one is set."""
+        if self.archive is not None:
+            return self.archive.search(target, author=author, cadence=cadence)
+        return lk.search_lightcurve(target, author=author, cadence=cadence)
+
+    def _read_light_curves(self, search_result, reader="fits"):
+        """Download and read the light curves of a search result.
+
+        With reader="fits" only the needed FITS columns are read and NaN removal and outlier
+        clipping are deferred to the transit window. reader="lightkurve" stitches full
+        lightkurve objects and cleans the whole light curve up front. Products of an
+        archive are always read as FITS.
+
+        Returns:
+            tuple: Time, flux and flux error arrays, and whether the window still needs cleaning.
+        """
+        if self.archive is not None:
+            time, flux, flux_err = read_fits_light_curves(self.archive.download(search_result))
+            return time, flux, flux_err, True
+
+        if reader == "fits":
+            time, flux, flux_err = read_fits_light_curves(download_light_curve_files(search_result))
+            return time, flux, flux_err, True
+
+        combined = search_result.download_all().stitch()
 
         # --- CLEAN DATA ---
         lc_clean = combined.remove_nans().remove_outliers(sigma=5)
-        time = lc_clean.time.value
-        flux = lc_clean.flux.value
-        flux_err = lc_clean.flux_err.value
-
-        # --- EXTRACT ONE TRANSIT WINDOW ---
-        epoch = 0
-        n_windows = 2
-        df_transit = None
-        while df_transit is None:
-            t0_epoch = t0_btjd + epoch * period_days
-            half_window = n_windows * window
-            mask = (time > t0_epoch - half_window) & (time < t0_epoch + half_window)
-
-            sel_time = time[mask]
-            sel_flux = flux[mask]
-            sel_err = flux_err[mask]
-
-            if len(sel_time) > points:
-                mid_idx = np.argmin(np.abs(sel_time - t0_epoch))
-                start = max(0, mid_idx - int(points / 2))
-                end = start + points
-                sel_time = sel_time[start:end]
-                sel_flux = sel_flux[start:end]
-                sel_err = sel_err[start:end]
-
-                df_transit = pd.DataFrame({"time_btjd": sel_time, "flux": sel_flux, "flux_err": sel_err})
-            else:
-                epoch += 1
-                n_windows = 3
-                if epoch > 1000:
-                    raise RuntimeError("No transit found with enough data")
-
-        print(f"Returning one TESS transit for {planet_name} with {len(df_transit)} points.")
-        return df_transit
+        logger.info("Fully cleaned light curve.")
+        return lc_clean.time.value, lc_clean.flux.value, lc_clean.flux_err.value, False
@@ -1 +1,5 @@
-from .app import main
+def main():
+    """Run the web application, the app is only built when it is called."""
+    from .app import main as serve
+
+    serve()
@@ -0,0 +1,140 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+from werkzeug.exceptions import ServiceUnavailable, TooManyRequests
+
+QUEUE_WAIT_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)  # seconds
+
+
+class AdmissionController:
+    """Concurrency limit with a bounded wait queue and per-client token-bucket rate limits.
+
+    At most `max_concurrent` expensive requests run at once, up to `max_queue` more wait
+    for a slot for at most `queue_timeout` seconds, and anything beyond is turned away
+    immediately with a 503. Each client may start `rate_per_minute` expensive requests per
+    minute with bursts of `burst`, exceeding it is a 429. Both carry a Retry-After.
+
+    Args:
+        max_concurrent (int): Requests running at once.
+        max_queue (int): Requests waiting for a slot.
+        queue_timeout (float): Seconds a request waits before it is rejected.
+        rate_per_minute (float): Sustained requests per client per minute, 0 for no rate limit.
+        burst (int): Requests a client can make at once after being idle.
+    """
+
+    def __init__(self, max_concurrent=2, max_queue=8, queue_timeout=30.0, rate_per_minute=30.0, burst=10):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+
+        self._condition = threading.Condition()
+        self._active = 0
+        self._waiting = 0
+        self._buckets = {}  # client -> (tokens, time of the last update)
+
+        self.admitted = 0
+        self.rejected = {"rate_limit": 0, "queue_full": 0, "queue_timeout": 0}
+        self.wait_buckets = [0] * (len(QUEUE_WAIT_BUCKETS) + 1)
+        self.wait_sum = 0.0
+
+    def acquire(self, client):
+        """Take a slot for `client`, waiting in the queue if needed.
+
+        Raises:
+            TooManyRequests: The client is over its rate limit.
+            ServiceUnavailable: The queue is full or the wait timed out.
+        """
+        starting_time = time.monotonic()
+        with self._condition:
+            retry_after = self._take_token(client, starting_time)
+            if retry_after is not None:
+                self.rejected["rate_limit"] += 1
+                raise TooManyRequests("Too many requests, slow down.", retry_after=retry_after)
+
+            if self._active >= self.max_concurrent:
+                if self._waiting >= self.max_queue:
+                    self.rejected["queue_full"] += 1
+                    raise ServiceUnavailable("The server is busy, try again shortly.", retry_after=self._retry_after())
+
+                self._waiting += 1
+                try:
+                    admitted = self._condition.wait_for(lambda: self._active < self.max_concurrent, timeout=self.queue_timeout)
+                finally:
+                    self._waiting -= 1
+                if not admitted:
+                    self.rejected["queue_timeout"] += 1
+                    raise ServiceUnavailable("The server is busy, try again shortly.", retry_after=self._retry_after())
+
+            self._active += 1
+            self.admitted += 1
+            self._observe_wait(time.monotonic() - starting_time)
+
+    def release(self):
+        """Give back a slot taken by `acquire`."""
+        with self._condition:
+            self._active -= 1
+            self._condition.notify()
+
+    @contextmanager
+    def slot(self, client):
+        """Hold a slot for the duration of the block, see `acquire`."""
+        self.acquire(client)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def metrics(self, prefix="exoplings_admission") -> str:
+        """Counters and gauges in the Prometheus text exposition format."""
+        with self._condition:
+            lines = [
+                f"# TYPE {prefix}_active gauge",
+                f"{prefix}_active {self._active}",
+                f"# TYPE {prefix}_waiting gauge",
+                f"{prefix}_waiting {self._waiting}",
+                f"# TYPE {prefix}_admitted_total counter",
+                f"{prefix}_admitted_total {self.admitted}",
+                f"# TYPE {prefix}_rejected_total counter",
+                *(f'{prefix}_rejected_total{{reason="{reason}"}} {count}' for reason, count in self.rejected.items()),
+                f"# TYPE {prefix}_queue_wait_seconds histogram",
+            ]
+            cumulative = 0
+            for bound, count in zip((*QUEUE_WAIT_BUCKETS, math.inf), self.wait_buckets):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else repr(bound)
+                lines.append(f'{prefix}_queue_wait_seconds_bucket{{le="{le}"}} {cumulative}')
+            lines += [f"{prefix}_queue_wait_seconds_sum {self.wait_sum}", f"{prefix}_queue_wait_seconds_count {cumulative}"]
+        return "\n".join(lines) + "\n"
+
+    def _take_token(self, client, now) -> int | None:
+        """Spend one token of the client's bucket, or return the seconds until one is available."""
+        if self.rate <= 0:
+            return None
+        tokens, last = self._buckets.get(client, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        if tokens < 1:
+            self._buckets[client] = (tokens, now)
+            return math.ceil((1 - tokens) / self.rate)
+        self._buckets[client] = (tokens - 1, now)
+
+        # forget clients whose bucket has refilled, they are back to the default state
+        if len(self._buckets) > 10_000:
+            full_after = self.burst / self.rate
+            self._buckets = {c: (t, s) for c, (t, s) in self._buckets.items() if now - s < full_after}
+        return None
+
+    def _retry_after(self) -> int:
+        """Rough seconds until a slot frees up: the queue timeout spread over the slots."""
+        return max(1, math.ceil(self.queue_timeout * (self._waiting + 1) / (self.max_queue + self.max_concurrent)))
+
+    def _observe_wait(self, seconds):
+        self.wait_sum += seconds
+        for i, bound in enumerate(QUEUE_WAIT_BUCKETS):
+            if seconds <= bound:
+                self.wait_buckets[i] += 1
+                return
+        self.wait_buckets[-1] += 1
@@ -1,14 +1,32 @@
+import logging
 import os
+import threading
+from importlib.metadata import PackageNotFoundError, version
 
 import torch
 from flask import Flask
 from swyft import SwyftTrainer
+from werkzeug.middleware.proxy_fix import ProxyFix
 
-from .models.networks.MultiDim import ExoplingInferrerUltra
-from .models.networks.OneDim import ExoplingDetector
+from .admission import AdmissionController
+from .http_cache import init_static_caching
+from .model_registry import BUILTIN, ModelRegistry
 from .models.simulator import Simulator
+from .models.transit_table import TransitTable
+from .results_store import ResultsStore
+from .upload_store import UploadStore, file_hash
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
+repo_dir = os.path.dirname(os.path.dirname(current_dir))  # the checkout holding src/ and sample_data/
+
+# diagnostics of every module go through logging, a server that configures the root logger keeps its setup
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO").upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger(__name__)
+
+try:
+    APP_VERSION = version("exoplings")
+except PackageNotFoundError:  # running from a source checkout
+    APP_VERSION = "dev"
 
 app = Flask(
     __name__,
@@ -21,32 +39,89 @@ app.secret_key = os.environ.get("SECRET_KEY", "your-secret-key-change-this-in-pr
 UPLOAD_FOLDER = os.environ.get("UPLOAD_FOLDER", ".uploads")
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
 app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024  # 16MB max file size
+app.config["MULTID_SAMPLES"] = int(os.environ.get("MULTID_SAMPLES", 2000))  # network evaluations per truncation round
+app.config["MULTID_ROUNDS"] = int(os.environ.get("MULTID_ROUNDS", 2))
+app.config["MULTID_CHUNK_SIZE"] = int(os.environ.get("MULTID_CHUNK_SIZE", 4096))  # samples scored at once, bounds the corner-plot memory
+app.config["PROGRESSIVE_VISUALIZE"] = os.environ.get("PROGRESSIVE_VISUALIZE", "1") != "0"  # stream /visualize stages as they complete
+# skip the posterior LC and corner plot when the detector rules out a planet with this certainty, unset to never skip
+app.config["EARLY_EXIT_CERTAINTY"] = float(os.environ["EARLY_EXIT_CERTAINTY"]) if os.environ.get("EARLY_EXIT_CERTAINTY") else None
+# Monte-Carlo dropout passes reported with the 1-D posterior as its spread, 0 to only run the deterministic pass
+app.config["MC_DROPOUT_PASSES"] = int(os.environ.get("MC_DROPOUT_PASSES", 0))
+app.config["MC_DROPOUT_GRID"] = int(os.environ.get("MC_DROPOUT_GRID", 200))  # rₚ points per pass
+
+# light curves come from this archive instead of MAST when set, e.g. `exoplings fake-archive` for load tests
+app.config["ARCHIVE_URL"] = os.environ.get("ARCHIVE_URL", "")
+
+# seconds an unknown identifier or a target without data is remembered, 0 to always search again
+app.config["NEGATIVE_CACHE_TTL"] = float(os.environ.get("NEGATIVE_CACHE_TTL", 600))
+
+# light curve run end to end before /readyz reports ready, empty to only wait for the catalogs
+app.config["WARMUP_SAMPLE"] = os.environ.get("WARMUP_SAMPLE", os.path.join(repo_dir, "sample_data", "Test_Transit_Planet_411839167.csv"))
+
+# Admission control of the requests that run the pipeline, cached results are never limited
+app.config["MAX_CONCURRENT_PIPELINES"] = int(os.environ.get("MAX_CONCURRENT_PIPELINES", 2))
+app.config["PIPELINE_QUEUE_SIZE"] = int(os.environ.get("PIPELINE_QUEUE_SIZE", 2 * app.config["MAX_CONCURRENT_PIPELINES"]))
+app.config["PIPELINE_QUEUE_TIMEOUT"] = float(os.environ.get("PIPELINE_QUEUE_TIMEOUT", 30))  # seconds
+app.config["RATE_LIMIT_PER_MINUTE"] = float(os.environ.get("RATE_LIMIT_PER_MINUTE", 30))  # per client, 0 to disable
+app.config["RATE_LIMIT_BURST"] = int(os.environ.get("RATE_LIMIT_BURST", 10))
+# proxies in front of the app whose X-Forwarded-For is trusted, clients are told apart by the address they report
+# 0 by default so clients reaching the app directly cannot pick their own address, the Railway deploy sets 1 for its edge
+app.config["TRUSTED_PROXY_HOPS"] = int(os.environ.get("TRUSTED_PROXY_HOPS", 0))
+if app.config["TRUSTED_PROXY_HOPS"] > 0:
+    hops = app.config["TRUSTED_PROXY_HOPS"]
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops)
+admission = AdmissionController(
+    max_concurrent=app.config["MAX_CONCURRENT_PIPELINES"],
+    max_queue=app.config["PIPELINE_QUEUE_SIZE"],
+    queue_timeout=app.config["PIPELINE_QUEUE_TIMEOUT"],
+    rate_per_minute=app.config["RATE_LIMIT_PER_MINUTE"],
+    burst=app.config["RATE_LIMIT_BURST"],
+)
 
 # Create upload directory if it doesn't exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# Upload index and retention policy
+app.config["UPLOAD_MAX_BYTES"] = int(os.environ.get("UPLOAD_MAX_BYTES", 512 * 1024 * 1024))
+app.config["UPLOAD_MAX_AGE"] = float(os.environ.get("UPLOAD_MAX_AGE_DAYS", 30)) * 24 * 3600
+upload_store = UploadStore(UPLOAD_FOLDER)
+upload_store.sync()
+
+# Precomputed catalog results, filled by `exoplings precompute`
+RESULTS_FOLDER = os.environ.get("RESULTS_FOLDER", ".results")
+app.config["RESULTS_FOLDER"] = RESULTS_FOLDER
+results_store = ResultsStore(RESULTS_FOLDER, version=lambda: model_registry.version)
+
 
 # globals needed
 DEVICE = "gpu" if torch.cuda.is_available() else "cpu"
 
-one_d_network = ExoplingDetector()
-one_d_network.load_state_dict(
-    torch.load(
-        os.path.join(current_dir, "ai_models", "CNN_1D.pth"),
-        weights_only=True,
-    )
+# Versioned weights, see `exoplings publish-model`, the bundled ai_models ones until a version is activated
+app.config["MODEL_REGISTRY"] = os.environ.get("MODEL_REGISTRY", ".models")
+# seconds between checks of the active version, 0 to never switch
+app.config["MODEL_WATCH_INTERVAL"] = float(os.environ.get("MODEL_WATCH_INTERVAL", 5))
+app.config["ADMIN_TOKEN"] = os.environ.get("ADMIN_TOKEN", "")  # bearer token of the /admin endpoints, empty disables them
+model_registry = ModelRegistry(
+    app.config["MODEL_REGISTRY"], os.path.join(current_dir, "ai_models"), watch_interval=app.config["MODEL_WATCH_INTERVAL"]
 )
-
-multi_d_network = ExoplingInferrerUltra()
-multi_d_network.load_state_dict(
-    torch.load(
-        os.path.join(current_dir, "ai_models", "Inferrer_Ultra.pth"),
-        weights_only=True,
-    )
-)
-
-simulator = Simulator(rand_b=True, rand_dur=True, rand_t0=True, t_len=250)
+try:
+    model_registry.activate(model_registry.requested_version(), persist=False)
+except (KeyError, ValueError) as e:
+    logger.error("Could not load model version %s: %s, serving %s.", model_registry.requested_version(), e, BUILTIN)
+    model_registry.activate(BUILTIN, persist=False)
+
+# Noiseless model curves come from the transit table built by `exoplings build-transit-table`, batman otherwise
+TRANSIT_TABLE = os.environ.get("TRANSIT_TABLE", os.path.join(current_dir, "ai_models", "transit_table.npy"))
+transit_table = TransitTable(TRANSIT_TABLE) if os.path.isfile(TRANSIT_TABLE) else None
+# the model version is added to it per response, both identify the content of every result
+TRANSIT_TABLE_CHECKSUM = file_hash(TRANSIT_TABLE)[:16] if os.path.isfile(TRANSIT_TABLE) else ""
+
+simulator = Simulator(rand_b=True, rand_dur=True, rand_t0=True, t_len=250, transit_table=transit_table)
 trainer = SwyftTrainer(accelerator=DEVICE)
+trainer_lock = threading.Lock()  # the Lightning trainer keeps per-run state, one `infer` at a time
+
+# Fingerprinted, immutable and precompressed static files, see `exoplings compress-static`
+init_static_caching(app)
 
 # Register routes from routes.py
 from .routes import register_routes
@@ -58,6 +133,9 @@ def main():
     """Main entry point for the application."""
     port = int(os.environ.get("PORT", 5000))
     debug = os.environ.get("FLASK_ENV") != "production"
+    if not debug or os.environ.get("WERKZEUG_RUN_MAIN"):
+        # warm up while the server starts, in the reloader child only when debugging
+        app.extensions["warmup"].start()
     app.run(debug=debug, host="0.0.0.0", port=port)
 
 
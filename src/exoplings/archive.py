@@ -0,0 +1,55 @@
+import json
+import os
+import threading
+import urllib.parse
+import urllib.request
+
+
+class ArchiveClient:
+    """Light-curve archive reached over plain HTTP instead of MAST, set with ARCHIVE_URL.
+
+    The archive answers `GET /search?target=TIC 123&author=SPOC&cadence=short` with
+    `{"products": [{"filename": ...}, ...]}` and serves the FITS files of the products
+    under `GET /files/<filename>`, which is the layout of `exoplings fake-archive`.
+    Downloaded files are kept in `download_dir` and reused like lightkurve's cache, a
+    search always goes to the archive.
+
+    Args:
+        base_url (str): Root URL of the archive, e.g. "http://127.0.0.1:8765".
+        download_dir (str | None): Directory of the downloaded files, a temporary one by default.
+        timeout (float): Seconds to wait for each response.
+    """
+
+    def __init__(self, base_url, download_dir=None, timeout=30.0):
+        self.base_url = base_url.rstrip("/")
+        self.download_dir = download_dir or os.path.join(os.environ.get("TMPDIR", "/tmp"), "exoplings-archive")
+        self.timeout = timeout
+
+    def search(self, target, author=None, cadence=None) -> list[dict]:
+        """Products of a target, an empty list when the archive has none.
+
+        Raises:
+            OSError: The archive could not be reached or answered with an error.
+        """
+        query = {key: value for key, value in {"target": target, "author": author, "cadence": cadence}.items() if value is not None}
+        with urllib.request.urlopen(f"{self.base_url}/search?{urllib.parse.urlencode(query)}", timeout=self.timeout) as response:
+            return json.load(response)["products"]
+
+    def download(self, products) -> list[str]:
+        """Local paths of the FITS files of `products`, downloading the ones not on disk yet."""
+        os.makedirs(self.download_dir, exist_ok=True)
+        paths = []
+        for product in products:
+            filename = os.path.basename(product["filename"])
+            path = os.path.join(self.download_dir, filename)
+            if not os.path.exists(path):
+                url = f"{self.base_url}/files/{urllib.parse.quote(filename)}"
+                with urllib.request.urlopen(url, timeout=self.timeout) as response:
+                    data = response.read()
+                # written aside and renamed, concurrent requests never read a partial file
+                partial = f"{path}.{os.getpid()}-{threading.get_ident()}.part"
+                with open(partial, "wb") as f:
+                    f.write(data)
+                os.replace(partial, path)
+            paths.append(path)
+        return paths
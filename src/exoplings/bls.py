@@ -0,0 +1,169 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+DEFAULT_DURATIONS = np.array([0.04, 0.06, 0.08, 0.12, 0.16, 0.25])  # days, 1 to 6 hours
+PARALLEL_WORK = 2e8  # periods * points above which the period chunks go to a process pool
+MIN_PERIOD = 0.5  # days, shortest trial period of the default grid
+
+
+def bin_light_curve(time, flux, flux_err, bin_width):
+    """Average a light curve into fixed-width time bins with inverse-variance weights.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: Bin times, mean fluxes and summed weights of the non-empty bins.
+    """
+    weights = 1.0 / flux_err**2
+    idx = ((time - time[0]) / bin_width).astype(np.int64)
+    w = np.bincount(idx, weights=weights)
+    wy = np.bincount(idx, weights=weights * flux)
+    wt = np.bincount(idx, weights=weights * time)
+    filled = w > 0
+    return wt[filled] / w[filled], wy[filled] / w[filled], w[filled]
+
+
+def period_grid(baseline, min_period=MIN_PERIOD, max_period=None, min_duration=DEFAULT_DURATIONS[0], oversample=3, max_periods=50_000):
+    """Frequency-uniform period grid, with at most `max_periods` periods."""
+    max_period = max_period or baseline
+    df = min_duration / (oversample * baseline**2)
+    n = int(min((1 / min_period - 1 / max_period) / df, max_periods))
+    return 1 / np.linspace(1 / max_period, 1 / min_period, max(n, 2))
+
+
+def _search_chunk(time, y, w, periods, durations, n_bins):
+    """Best box per period for a chunk of periods.
+
+    Every period is folded into `n_bins` phase bins with one `bincount` over the whole
+    chunk, and box sums for all start phases come from cumulative sums over the bins.
+    """
+    n_periods = len(periods)
+    # integer phase bin of every point for every period, offset per row for a single bincount
+    idx = np.multiply.outer(n_bins / periods, time).astype(np.int64)
+    idx %= n_bins
+    idx += (np.arange(n_periods) * n_bins)[:, None]
+    idx = idx.ravel()
+
+    shape = (n_periods, len(time))
+    sum_w = np.bincount(idx, weights=np.broadcast_to(w, shape).ravel(), minlength=n_periods * n_bins).reshape(n_periods, n_bins)
+    sum_wy = np.bincount(idx, weights=np.broadcast_to(w * y, shape).ravel(), minlength=n_periods * n_bins).reshape(n_periods, n_bins)
+
+    # pad with the first bins so boxes can wrap around phase 1 -> 0
+    max_width = int(np.ceil(durations.max() / periods.min() * n_bins)) + 1
+    max_width = min(max_width, n_bins)
+    cum_w = np.concatenate([np.zeros((n_periods, 1)), np.cumsum(np.concatenate([sum_w, sum_w[:, :max_width]], axis=1), axis=1)], axis=1)
+    cum_wy = np.concatenate([np.zeros((n_periods, 1)), np.cumsum(np.concatenate([sum_wy, sum_wy[:, :max_width]], axis=1), axis=1)], axis=1)
+
+    best_power = np.zeros(n_periods)
+    best_start = np.zeros(n_periods, dtype=np.int64)
+    best_width = np.ones(n_periods, dtype=np.int64)
+
+    for duration in durations:
+        widths = np.clip(np.round(duration / periods * n_bins).astype(np.int64), 1, max_width)
+        # durations longer than a fifth of the period are not physical transits
+        allowed = duration <= 0.2 * periods
+        for width in np.unique(widths[allowed]):
+            rows = np.flatnonzero(allowed & (widths == width))
+            r = cum_w[rows, width : width + n_bins] - cum_w[rows, :n_bins]
+            s = cum_wy[rows, width : width + n_bins] - cum_wy[rows, :n_bins]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                power = np.where((s < 0) & (r > 0) & (r < 1), s**2 / (r * (1 - r)), 0.0)
+
+            argmax = power.argmax(axis=1)
+            chunk_best = power[np.arange(len(rows)), argmax]
+            better = chunk_best > best_power[rows]
+            best_power[rows[better]] = chunk_best[better]
+            best_start[rows[better]] = argmax[better]
+            best_width[rows[better]] = width
+
+    return best_power, best_start, best_width
+
+
+def bls_search(time, flux, flux_err=None, periods=None, durations=DEFAULT_DURATIONS, max_bins=20_000, chunk_points=4_000_000, workers=None) -> dict:
+    """Box Least Squares period search.
+
+    The light curve is first averaged into bins a third of the shortest duration wide,
+    then the period grid is processed in chunks of neighbouring periods sharing a phase
+    binning, in parallel over a process pool for large searches.
+
+    Args:
+        time, flux (np.ndarray): Light curve.
+        flux_err (np.ndarray | None): Uncertainties used as inverse-variance weights, uniform if None.
+        periods (np.ndarray | None): Trial periods in days, see `period_grid` for the default.
+        durations (np.ndarray): Trial transit durations in days.
+        max_bins (int): Upper limit on the phase bins per period, bins are a third of the shortest duration wide below it.
+        chunk_points (int): Periods per chunk are chosen so that periods * points stays below this.
+        workers (int | None): Worker processes, None to decide from the size of the search, 1 for serial.
+            Servers pass 1, the pool is meant for command line and offline use.
+
+    Returns:
+        dict: Best "period", "t0", "duration", "depth" and "power", plus the "periods" and "power_spectrum" arrays.
+
+    Raises:
+        ValueError: The light curve is too short for the default period grid, it must span more than its shortest period.
+    """
+    time = np.asarray(time, dtype=np.float64)
+    flux = np.asarray(flux, dtype=np.float64)
+    flux_err = np.ones_like(flux) if flux_err is None else np.asarray(flux_err, dtype=np.float64)
+
+    finite = np.isfinite(time) & np.isfinite(flux) & np.isfinite(flux_err) & (flux_err > 0)
+    time, flux, flux_err = time[finite], flux[finite], flux_err[finite]
+    order = np.argsort(time)
+    time, flux, flux_err = time[order], flux[order], flux_err[order]
+
+    durations = np.asarray(durations, dtype=np.float64)
+    t_ref = time[0]
+    baseline = time[-1] - t_ref
+    if periods is None:
+        min_period = max(MIN_PERIOD, 5 * durations.min())
+        if baseline <= min_period:
+            raise ValueError(f"A light curve spanning {baseline:.2f} d is too short for a period search from {min_period:.2f} d")
+        periods = period_grid(baseline, min_period=min_period, max_period=baseline)
+
+    time_binned, flux_binned, w = bin_light_curve(time - t_ref, flux, flux_err, durations.min() / 3)
+    w = w / w.sum()
+    y = flux_binned - np.sum(w * flux_binned)
+
+    # phase bins a third of the shortest duration wide, so short periods use few bins
+    bin_phase = durations.min() / 3
+    chunks = []
+    start = 0
+    while start < len(periods):
+        n_bins = int(np.clip(np.ceil(periods[start:].max() / bin_phase), 16, max_bins))
+        chunk_size = max(1, int(chunk_points // max(len(time_binned), n_bins)))
+        chunk = periods[start : start + chunk_size]
+        chunks.append((chunk, int(np.clip(np.ceil(chunk.max() / bin_phase), 16, max_bins))))
+        start += chunk_size
+
+    if workers is None:
+        workers = os.cpu_count() if len(periods) * len(time_binned) > PARALLEL_WORK else 1
+
+    args = [(time_binned, y, w, chunk, durations, n_bins) for chunk, n_bins in chunks]
+    if workers > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_search_chunk, *zip(*args)))
+    else:
+        results = [_search_chunk(*arg) for arg in args]
+
+    power = np.concatenate([result[0] for result in results])
+    start = np.concatenate([result[1] for result in results])
+    width = np.concatenate([result[2] for result in results])
+    n_bins = np.concatenate([np.full(len(chunk), n) for chunk, n in chunks])
+
+    best = int(np.argmax(power))
+    period = periods[best]
+    duration = width[best] / n_bins[best] * period
+    t0 = t_ref + ((start[best] + width[best] / 2) / n_bins[best] % 1.0) * period
+
+    in_transit = np.abs((time - t0 + period / 2) % period - period / 2) < duration / 2
+    depth = np.median(flux[~in_transit]) - np.median(flux[in_transit]) if in_transit.any() else 0.0
+
+    return {
+        "period": float(period),
+        "t0": float(t0),
+        "duration": float(duration),
+        "depth": float(depth),
+        "power": float(power[best]),
+        "periods": periods,
+        "power_spectrum": power,
+    }
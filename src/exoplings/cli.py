@@ -0,0 +1,355 @@
+import argparse
+import os
+
+
+def _serve(args):
+    from .app import main as serve
+
+    serve()
+
+
+def _precompute(args):
+    from .precompute import precompute
+
+    precompute(
+        results_dir=args.results_dir,
+        telescope=args.telescope,
+        workers=args.workers,
+        limit=args.limit,
+        retry_failed=args.retry_failed,
+    )
+
+
+def _evict_uploads(args):
+    from .app import app, upload_store
+
+    max_bytes = args.max_bytes if args.max_bytes is not None else app.config["UPLOAD_MAX_BYTES"]
+    max_age = args.max_age_days * 24 * 3600 if args.max_age_days is not None else app.config["UPLOAD_MAX_AGE"]
+    evicted = upload_store.evict(max_bytes=max_bytes, max_age=max_age)
+    print(f"Evicted {len(evicted)} uploads.")
+
+
+def _simulate(args):
+    from .simulation_store import SimulationStore
+
+    store = SimulationStore(args.store, t_len=args.t_len, sigma=args.sigma, shard_size=args.shard_size, seed=args.seed)
+    n_total = store.n_planned + args.append if args.append is not None else args.n
+    store.generate(n_total, workers=args.workers, chunk_size=args.chunk_size)
+
+
+def _search(args):
+    import json
+
+    from .app import model_registry
+    from .search import load_full_light_curve, search_light_curve
+
+    candidates = search_light_curve(model_registry.active().detector, load_full_light_curve(args.target), stride=args.stride, top=args.top)
+    if args.json:
+        print(json.dumps(candidates, indent=2))
+        return
+    for rank, candidate in enumerate(candidates, start=1):
+        print(f"#{rank:<3} epoch {candidate['epoch']:.4f} BTJD  rp mode {candidate['mode']:.3f}  certainty {candidate['certainty'] * 100:.2f}%")
+
+
+def _build_transit_table(args):
+    from .models.transit_table import TransitTable
+
+    default_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ai_models", "transit_table.npy")
+    path = args.path or os.environ.get("TRANSIT_TABLE", default_path)
+    table = TransitTable.build(path, n_rp=args.n_rp, n_b=args.n_b, n_u=args.n_u)
+    max_error = table.validate(n=args.validate)
+    print(f"Wrote {path} {table.flux.shape}, max abs error against batman: {max_error:.2e}.")
+    if max_error > args.tolerance:
+        raise SystemExit(f"Error above the tolerance of {args.tolerance:.2e}, use a finer grid.")
+
+
+def _benchmark_figures(args):
+    from .figure_specs import benchmark
+
+    results = benchmark(repeat=args.repeat)
+    for name, result in results.items():
+        speedup = result["plotly"] / result["spec"]
+        print(
+            f"{name:<13} plotly {result['plotly'] * 1000:8.1f} ms  spec {result['spec'] * 1000:8.1f} ms  x{speedup:5.1f}  identical: {result['identical']}"
+        )
+    if not all(result["identical"] for result in results.values()):
+        raise SystemExit("Figure specs differ from the plotly figures.")
+
+
+def _benchmark_uncertainty(args):
+    from .uncertainty import benchmark
+
+    results = benchmark(passes=args.passes, grid_points=args.grid, repeat=args.repeat)
+    for passes, result in results.items():
+        speedup = result["looped"] / result["batched"]
+        print(
+            f"{passes:>3} passes  batched {result['batched'] * 1000:8.1f} ms  looped {result['looped'] * 1000:8.1f} ms  x{speedup:5.1f}  cost of {result['overhead']:5.1f} passes"
+        )
+
+
+def _model_registry(args):
+    from .model_registry import ModelRegistry
+
+    return ModelRegistry(
+        args.registry or os.environ.get("MODEL_REGISTRY", ".models"), os.path.join(os.path.dirname(os.path.abspath(__file__)), "ai_models")
+    )
+
+
+def _publish_model(args):
+    import json
+
+    from .model_registry import MODEL_FILES
+
+    registry = _model_registry(args)
+    # a network not given is carried over from the version served now
+    current = registry.path_for(registry.requested_version())
+    files = {model: getattr(args, model) or os.path.join(current, filename) for model, filename in MODEL_FILES.items()}
+    manifest = registry.publish(args.version, files, input_length=args.input_length)
+    print(json.dumps(manifest, indent=2))
+    if args.activate:
+        _write_active(registry, args.version)
+
+
+def _activate_model(args):
+    registry = _model_registry(args)
+    if args.version not in registry.versions():
+        raise SystemExit(f"Unknown model version {args.version!r}, expected one of {', '.join(registry.versions())}")
+    _write_active(registry, args.version)
+
+
+def _write_active(registry, version):
+    # loaded here first, so a broken version is never announced to the workers
+    registry.activate(version)
+    print(f"Workers switch to {version} within MODEL_WATCH_INTERVAL seconds.")
+
+
+def _list_models(args):
+    registry = _model_registry(args)
+    requested = registry.requested_version()
+    for version in registry.versions():
+        manifest = registry.manifest(version)
+        checksums = " ".join(f"{model} {entry['sha256'][:12]}" for model, entry in manifest["models"].items())
+        print(f"{'*' if version == requested else ' '} {version:<20} {manifest['created']}  {checksums}")
+
+
+def _compress_static(args):
+    from .http_cache import brotli, precompress_static
+
+    static_folder = args.static_folder or os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+    written = precompress_static(static_folder, min_saving=args.min_saving)
+    print(f"Wrote {len(written)} compressed files in {static_folder}.")
+    if brotli is None:
+        print("brotli is not installed, only gzip variants were built (pip install 'exoplings[compression]').")
+
+
+def _train(args):
+    from .training import train
+
+    default_table = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ai_models", "transit_table.npy")
+    train(
+        args.model,
+        args.run_dir,
+        output=args.output,
+        epochs=args.epochs,
+        steps_per_epoch=args.steps_per_epoch,
+        batch_size=args.batch_size,
+        learning_rate=args.learning_rate,
+        sigma=args.sigma,
+        val_samples=args.val_samples,
+        patience=args.patience,
+        ranks=args.ranks,
+        workers=args.workers,
+        threads=args.threads,
+        precision=args.precision,
+        seed=args.seed,
+        transit_table=os.environ.get("TRANSIT_TABLE", default_table),
+        resume=not args.restart,
+    )
+
+
+def _fake_archive(args):
+    from .fake_archive import FakeArchive, synthesize_fixtures
+
+    if args.synthesize:
+        targets = synthesize_fixtures(args.fixtures, n_targets=args.synthesize, seed=args.seed or 0)
+        print(f"Wrote fixtures of {len(targets)} targets in {args.fixtures}.")
+    archive = FakeArchive(args.fixtures, latency=args.latency, jitter=args.jitter, failure_rate=args.failure_rate, seed=args.seed)
+    server = archive.server(args.host, args.port)
+    print(f"Fake archive on http://{args.host}:{server.server_address[1]}, start the app with ARCHIVE_URL pointing to it.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(f"Served {archive.requests} requests, {archive.failures} injected failures.")
+
+
+def _loadtest(args):
+    import glob
+    import json
+
+    from .loadtest import LoadTest, format_report, load_targets, parse_mix
+
+    targets = load_targets(args.targets) if args.targets else []
+    uploads = args.upload or sorted(glob.glob("sample_data/*.csv"))
+    mix = parse_mix(args.mix)
+    if not targets:
+        mix.pop("catalog", None)
+    test = LoadTest(args.url, targets=targets, upload_paths=uploads, mix=mix, timeout=args.timeout, seed=args.seed)
+
+    if args.replay:
+        wall_time = test.replay(args.replay, concurrency=args.concurrency, speed=args.speed)
+    else:
+        duration = args.duration if args.duration is not None or args.requests is not None else 60.0
+        wall_time = test.run(concurrency=args.concurrency, duration=duration, n_scenarios=args.requests, rate=args.rate)
+
+    report = test.report(wall_time)
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+    if args.max_error_rate is not None and report.get("all", {}).get("error_rate", 0.0) > args.max_error_rate:
+        raise SystemExit(f"Error rate above {args.max_error_rate:.1%}.")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="exoplings", description="Exoplings web app and batch tools.")
+    subparsers = parser.add_subparsers(dest="command")
+
+    serve_parser = subparsers.add_parser("serve", help="Run the web application (default).")
+    serve_parser.set_defaults(func=_serve)
+
+    precompute_parser = subparsers.add_parser("precompute", help="Precompute results for every confirmed catalog planet.")
+    precompute_parser.add_argument("--results-dir", default=os.environ.get("RESULTS_FOLDER", ".results"))
+    precompute_parser.add_argument("--telescope", choices=["tess", "kepler", "all"], default="all")
+    precompute_parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count).")
+    precompute_parser.add_argument("--limit", type=int, default=None, help="Only process this many pending targets.")
+    precompute_parser.add_argument("--retry-failed", action="store_true", help="Retry targets that failed previously.")
+    precompute_parser.set_defaults(func=_precompute)
+
+    evict_parser = subparsers.add_parser("evict-uploads", help="Apply the upload retention policy.")
+    evict_parser.add_argument("--max-bytes", type=int, default=None, help="Total size limit (default: UPLOAD_MAX_BYTES).")
+    evict_parser.add_argument("--max-age-days", type=float, default=None, help="Age limit in days (default: UPLOAD_MAX_AGE_DAYS).")
+    evict_parser.set_defaults(func=_evict_uploads)
+
+    simulate_parser = subparsers.add_parser("simulate", help="Generate a sharded training set with the simulator.")
+    simulate_parser.add_argument("store", help="Directory of the simulation store.")
+    size_group = simulate_parser.add_mutually_exclusive_group(required=True)
+    size_group.add_argument("-n", type=int, help="Total number of samples the store should hold.")
+    size_group.add_argument("--append", type=int, help="Number of samples to add to the store.")
+    simulate_parser.add_argument("--shard-size", type=int, default=100_000, help="Samples per shard (new stores only).")
+    simulate_parser.add_argument("--chunk-size", type=int, default=10_000, help="Samples simulated at once inside a worker.")
+    simulate_parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count).")
+    simulate_parser.add_argument("--seed", type=int, default=None, help="Root seed (new stores only).")
+    simulate_parser.add_argument("--sigma", type=float, default=0.0005, help="Noise level of the simulated light curves.")
+    simulate_parser.add_argument("--t-len", type=int, default=250, help="Number of points per light curve.")
+    simulate_parser.set_defaults(func=_simulate)
+
+    search_parser = subparsers.add_parser("search", help="Search a whole light curve for single transits.")
+    search_parser.add_argument("target", help="Uploaded file name, TESS TIC id, or Kepler planet name / KIC id.")
+    search_parser.add_argument("--stride", type=int, default=25, help="Samples between consecutive windows.")
+    search_parser.add_argument("--top", type=int, default=10, help="Number of candidates to report.")
+    search_parser.add_argument("--json", action="store_true", help="Print the candidates as JSON.")
+    search_parser.set_defaults(func=_search)
+
+    table_parser = subparsers.add_parser("build-transit-table", help="Precompute the noiseless transit lookup table.")
+    table_parser.add_argument("--path", default=None, help="Output .npy path (default: TRANSIT_TABLE or ai_models/transit_table.npy).")
+    table_parser.add_argument("--n-rp", type=int, default=121, help="Grid points along rp.")
+    table_parser.add_argument("--n-b", type=int, default=101, help="Grid points along the impact parameter.")
+    table_parser.add_argument("--n-u", type=int, default=601, help="Grid points along the scaled time.")
+    table_parser.add_argument("--validate", type=int, default=2000, help="Prior samples to compare against batman.")
+    table_parser.add_argument("--tolerance", type=float, default=1e-4, help="Maximum accepted abs flux error (a fifth of the default noise).")
+    table_parser.set_defaults(func=_build_transit_table)
+
+    figures_parser = subparsers.add_parser("benchmark-figures", help="Time the figure specs against the plotly figures.")
+    figures_parser.add_argument("--repeat", type=int, default=5, help="Builds per figure and version.")
+    figures_parser.set_defaults(func=_benchmark_figures)
+
+    uncertainty_parser = subparsers.add_parser("benchmark-uncertainty", help="Time batched Monte-Carlo dropout passes against a loop.")
+    uncertainty_parser.add_argument("--passes", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32], help="Numbers of dropout passes to time.")
+    uncertainty_parser.add_argument("--grid", type=int, default=200, help="rₚ points per pass.")
+    uncertainty_parser.add_argument("--repeat", type=int, default=5, help="Runs per number of passes and version.")
+    uncertainty_parser.set_defaults(func=_benchmark_uncertainty)
+
+    publish_parser = subparsers.add_parser("publish-model", help="Add network weights to the model registry as a new version.")
+    publish_parser.add_argument("version", help="Name of the new version.")
+    publish_parser.add_argument("--detector", default=None, help="1-D detector weights (default: those of the active version).")
+    publish_parser.add_argument("--inferrer", default=None, help="Multi-D inferrer weights (default: those of the active version).")
+    publish_parser.add_argument("--input-length", type=int, default=250, help="Light-curve length the networks were built for.")
+    publish_parser.add_argument("--activate", action="store_true", help="Also serve the new version.")
+    publish_parser.add_argument("--registry", default=None, help="Registry directory (default: MODEL_REGISTRY or .models).")
+    publish_parser.set_defaults(func=_publish_model)
+
+    activate_parser = subparsers.add_parser("activate-model", help="Make the running workers serve a version of the model registry.")
+    activate_parser.add_argument("version", help="Version to serve, 'builtin' for the bundled weights.")
+    activate_parser.add_argument("--registry", default=None, help="Registry directory (default: MODEL_REGISTRY or .models).")
+    activate_parser.set_defaults(func=_activate_model)
+
+    models_parser = subparsers.add_parser("list-models", help="List the versions of the model registry, * marks the active one.")
+    models_parser.add_argument("--registry", default=None, help="Registry directory (default: MODEL_REGISTRY or .models).")
+    models_parser.set_defaults(func=_list_models)
+
+    compress_parser = subparsers.add_parser("compress-static", help="Write gzip/brotli variants of the static files.")
+    compress_parser.add_argument("--static-folder", default=None, help="Directory to compress (default: the package static folder).")
+    compress_parser.add_argument("--min-saving", type=float, default=0.1, help="Smallest size reduction for keeping a variant.")
+    compress_parser.set_defaults(func=_compress_static)
+
+    train_parser = subparsers.add_parser("train", help="Train a network on freshly simulated light curves.")
+    train_parser.add_argument(
+        "model", choices=["detector", "inferrer"], help="The 1-D detector (CNN_1D.pth) or the multi-D inferrer (Inferrer_Ultra.pth)."
+    )
+    train_parser.add_argument("run_dir", help="Directory of the checkpoint and history, the run resumes from it.")
+    train_parser.add_argument("--output", default=None, help="Path of the best weights (default: RUN_DIR/<app file name>).")
+    train_parser.add_argument("--epochs", type=int, default=50)
+    train_parser.add_argument("--steps-per-epoch", type=int, default=500, help="Optimizer steps per epoch and rank.")
+    train_parser.add_argument("--batch-size", type=int, default=256, help="Samples per step and rank.")
+    train_parser.add_argument("--learning-rate", type=float, default=1e-3)
+    train_parser.add_argument("--sigma", type=float, default=0.0005, help="Noise level of the simulated light curves.")
+    train_parser.add_argument("--val-samples", type=int, default=10_000, help="Size of the fixed validation set.")
+    train_parser.add_argument("--patience", type=int, default=5, help="Epochs without improvement before stopping, 0 to never stop early.")
+    train_parser.add_argument("--ranks", type=int, default=1, help="Data-parallel training processes (DDP over gloo).")
+    train_parser.add_argument("--workers", type=int, default=2, help="Simulation worker processes per rank.")
+    train_parser.add_argument("--threads", type=int, default=None, help="Torch threads per rank (default: the cores left by the workers).")
+    train_parser.add_argument("--precision", choices=["auto", "bf16", "fp32"], default="auto", help="auto times both and keeps the faster.")
+    train_parser.add_argument("--seed", type=int, default=0)
+    train_parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint in RUN_DIR and start over.")
+    train_parser.set_defaults(func=_train)
+
+    archive_parser = subparsers.add_parser("fake-archive", help="Serve fixture light curves in place of MAST for load tests.")
+    archive_parser.add_argument("--fixtures", default=".archive", help="Directory of the FITS fixtures.")
+    archive_parser.add_argument("--synthesize", type=int, default=None, help="First write synthetic fixtures for this many planets per catalog.")
+    archive_parser.add_argument("--host", default="127.0.0.1")
+    archive_parser.add_argument("--port", type=int, default=8765)
+    archive_parser.add_argument("--latency", type=float, default=0.5, help="Mean delay of every response in seconds.")
+    archive_parser.add_argument("--jitter", type=float, default=0.25, help="Half width of the spread of the delay in seconds.")
+    archive_parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of responses that are 503s.")
+    archive_parser.add_argument("--seed", type=int, default=None)
+    archive_parser.set_defaults(func=_fake_archive)
+
+    loadtest_parser = subparsers.add_parser("loadtest", help="Measure latency, throughput and errors of a running server.")
+    loadtest_parser.add_argument("url", help="Root URL of the server, e.g. http://127.0.0.1:8080.")
+    loadtest_parser.add_argument("--targets", default=None, help="targets.json of fake-archive, or a file with one catalog id per line.")
+    loadtest_parser.add_argument(
+        "--upload", action="append", default=None, help="CSV light curve to upload, repeatable (default: sample_data/*.csv)."
+    )
+    loadtest_parser.add_argument("--mix", default="catalog=6,upload=2,index=2", help="Scenario weights among catalog, upload, unknown and index.")
+    loadtest_parser.add_argument("--concurrency", type=int, default=4, help="Scenarios in flight at once.")
+    loadtest_parser.add_argument("--rate", type=float, default=None, help="Scenarios started per second (default: closed loop).")
+    loadtest_parser.add_argument("--duration", type=float, default=None, help="Seconds to run (default: 60 unless --requests is given).")
+    loadtest_parser.add_argument("--requests", type=int, default=None, help="Number of scenarios to run.")
+    loadtest_parser.add_argument("--replay", default=None, help="Access log to replay instead of the mix.")
+    loadtest_parser.add_argument("--speed", type=float, default=1.0, help="Replay speed-up, 0 to replay back to back.")
+    loadtest_parser.add_argument("--timeout", type=float, default=300.0, help="Seconds to wait for each response.")
+    loadtest_parser.add_argument("--seed", type=int, default=None)
+    loadtest_parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+    loadtest_parser.add_argument("--max-error-rate", type=float, default=None, help="Exit with an error above this error rate.")
+    loadtest_parser.set_defaults(func=_loadtest)
+
+    return parser
+
+
+def main(argv=None):
+    """Command line entry point, runs the web application when no command is given."""
+    args = build_parser().parse_args(argv)
+    func = getattr(args, "func", _serve)
+    func(args)
+
+
+if __name__ == "__main__":
+    main()
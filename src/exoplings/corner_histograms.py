@@ -0,0 +1,100 @@
+import numpy as np
+from scipy.ndimage import gaussian_filter, gaussian_filter1d
+
+
+class CornerHistograms:
+    """Weighted 1-D and 2-D posterior histograms accumulated one chunk of samples at a time.
+
+    Samples are weighted by exp(logratio) like swyft's `get_pdf`. The weights of each
+    histogram are kept relative to the largest logratio seen so far, and the histogram is
+    rescaled when a chunk raises it, so no sample has to be kept after its chunk. Memory
+    is D * bins + D * (D - 1) / 2 * bins² floats whatever the number of samples.
+
+    Args:
+        bounds (np.ndarray): (D, 2) [low, high] range of every parameter, the histogram range.
+        bins (int): Bins per parameter.
+        parnames (list[str] | None): Parameter names, "z[0]" ... "z[D-1]" by default.
+    """
+
+    def __init__(self, bounds, bins=200, parnames=None):
+        self.bounds = np.array(bounds, dtype=np.float64)
+        self.bins = bins
+        n_params = len(self.bounds)
+        self.parnames = [f"z[{i}]" for i in range(n_params)] if parnames is None else list(parnames)
+        self.pairs = [(i, j) for i in range(n_params) for j in range(i + 1, n_params)]
+
+        self.marginals = np.zeros((n_params, bins))
+        self.joints = np.zeros((len(self.pairs), bins, bins))
+        self._marginal_max = np.full(n_params, -np.inf)
+        self._joint_max = -np.inf
+        self.n_samples = 0
+
+    def add(self, z, logratios_1d, logratios_joint):
+        """Accumulate a chunk of samples.
+
+        Args:
+            z (np.ndarray): (N, D) parameter samples.
+            logratios_1d (np.ndarray): (N, D) logratios of the 1-D marginals, weighting the 1-D histograms.
+            logratios_joint (np.ndarray): (N,) logratios of the joint posterior, weighting the 2-D histograms.
+        """
+        if len(z) == 0:
+            return
+        idx = self._bin_indices(z)
+
+        new_max = np.maximum(self._marginal_max, logratios_1d.max(axis=0))
+        self.marginals *= np.exp(self._marginal_max - new_max)[:, None]
+        self._marginal_max = new_max
+        weights = np.exp(logratios_1d - new_max)
+        for d in range(len(self.parnames)):
+            self.marginals[d] += np.bincount(idx[:, d], weights=weights[:, d], minlength=self.bins)
+
+        new_max = max(self._joint_max, float(logratios_joint.max()))
+        self.joints *= np.exp(self._joint_max - new_max)
+        self._joint_max = new_max
+        weights = np.exp(logratios_joint - new_max)
+        for k, (i, j) in enumerate(self.pairs):
+            flat = idx[:, i] * self.bins + idx[:, j]
+            self.joints[k] += np.bincount(flat, weights=weights, minlength=self.bins**2).reshape(self.bins, self.bins)
+
+        self.n_samples += len(z)
+
+    def pdf(self, params, smooth=0.0) -> tuple[np.ndarray, np.ndarray]:
+        """Normalized density on the bin grid, shaped like the output of swyft's `get_pdf`.
+
+        Args:
+            params (str | list[str]): One parameter name, or two for a 2-D marginal.
+            smooth (float): Width in bins of a Gaussian smoothing kernel.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: (bins,) or (bins, bins) density indexed [x, y] and the
+                (bins, 1) or (bins, 2) bin centers, both float32 like swyft.
+        """
+        params = params if isinstance(params, list) else [params]
+        dims = [self.parnames.index(param) for param in params]
+        widths = [self._bin_width(d) for d in dims]
+        centers = np.stack([self._centers(d) for d in dims], axis=1).astype(np.float32)
+
+        if len(dims) == 1:
+            h = self.marginals[dims[0]]
+            h = h / (h.sum() * widths[0])
+            return (gaussian_filter1d(h, smooth) if smooth > 0 else h).astype(np.float32), centers
+
+        i, j = dims
+        h = self.joints[self.pairs.index((min(i, j), max(i, j)))]
+        h = h if i < j else h.T
+        h = h / (h.sum() * widths[0] * widths[1])
+        return (gaussian_filter(h, smooth) if smooth > 0 else h).astype(np.float32), centers
+
+    def _bin_indices(self, z):
+        low = self.bounds[:, 0]
+        span = np.maximum(self.bounds[:, 1] - low, np.finfo(np.float64).tiny)
+        return np.clip(((z - low) / span * self.bins).astype(np.int64), 0, self.bins - 1)
+
+    def _bin_width(self, d):
+        low, high = self.bounds[d]
+        return (high - low) / self.bins if high > low else 1.0
+
+    def _centers(self, d):
+        low, high = self.bounds[d]
+        edges = np.linspace(low, high, self.bins + 1)
+        return (edges[1:] + edges[:-1]) / 2
@@ -1,63 +1,136 @@
-import pathlib
-
+import numpy as np
 import pandas as pd
 
-from .app import app
+from .app import app, upload_store
+from .archive import ArchiveClient
+from .bls import MIN_PERIOD, bls_search
+from .lightcurves import extract_transit_window, resample_to_grid
 from .PlanetDetailExtractor import PlanetDetailExtractor
+from .target_resolver import TESS, UPLOAD, TargetNotFound, TargetResolver
+
+archive = ArchiveClient(app.config["ARCHIVE_URL"]) if app.config["ARCHIVE_URL"] else None
+tess_planet_extractor = PlanetDetailExtractor(telescope="tess", archive=archive)
+kepler_planet_extractor = PlanetDetailExtractor(telescope="kepler", archive=archive)
+target_resolver = TargetResolver(upload_store, tess_planet_extractor, kepler_planet_extractor, negative_ttl=app.config["NEGATIVE_CACHE_TTL"])
+
+WINDOW_POINTS = 250  # network input length, shorter uploads are taken as one pre-windowed transit
+MIN_SEARCH_SPAN = 2 * MIN_PERIOD  # days, shorter uploads are taken as one transit too, a period search needs two periods
+
+
+def load_upload(filename) -> tuple[pd.DataFrame, dict]:
+    """Load an uploaded light curve, cutting one transit out of it when it is longer than a window.
+
+    Long uploads have no catalog ephemeris, so period, t0 and duration come from a BLS
+    search, stored with the upload, and the transit is extracted like a TESS one. Uploads
+    with fewer points, or spanning less than `MIN_SEARCH_SPAN`, are taken as one transit
+    and resampled over their own time span.
+    """
+    df = upload_store.load_frame(filename)
+    planet_params = {"z": None, "duration": None, "impact": None}
+    if len(df) == WINDOW_POINTS:
+        return df, planet_params
+
+    time = df["time_btjd"].to_numpy(dtype=np.float64)
+    flux = df["flux"].to_numpy(dtype=np.float64)
+    flux_err = df["flux_err"].to_numpy(dtype=np.float64) if "flux_err" in df else np.full_like(flux, np.nanstd(flux))
+
+    if len(df) < WINDOW_POINTS or np.nanmax(time) - np.nanmin(time) < MIN_SEARCH_SPAN:
+        order = np.argsort(time, kind="stable")
+        keep = order[np.isfinite(flux[order])]
+        time, flux, flux_err = time[keep], flux[keep], flux_err[keep]
+        if len(time) < 2:
+            return df, planet_params
+        df, _ = resample_to_grid(time, flux, flux_err, (time[0] + time[-1]) / 2, time[-1] - time[0], points=WINDOW_POINTS)
+        return df, planet_params
+
+    ephemeris = upload_store.ephemeris(filename)
+    if ephemeris is None:
+        # serial on the request path, a process pool would fork this multithreaded server outside the admission limit
+        result = bls_search(time, flux, flux_err, workers=1)
+        ephemeris = {key: result[key] for key in ("period", "t0", "duration", "depth")}
+        upload_store.set_ephemeris(filename, ephemeris)
+
+    df = extract_transit_window(
+        time,
+        flux,
+        flux_err,
+        period_days=ephemeris["period"],
+        t0_btjd=ephemeris["t0"],
+        window=ephemeris["duration"],
+        points=WINDOW_POINTS,
+        clean=True,
+    )
+    planet_params.update(duration=ephemeris["duration"], per=ephemeris["period"], t0=ephemeris["t0"])
+    return df, planet_params
+
 
-tess_planet_extractor = PlanetDetailExtractor(telescope="tess")
-kepler_planet_extractor = PlanetDetailExtractor(telescope="kepler")
+def load_target(target) -> tuple[pd.DataFrame, dict]:
+    """Load the light curve of a resolved target, see `TargetResolver.resolve`."""
+    if target.kind == UPLOAD:
+        return load_upload(target.key)
+
+    planet_params = target.planet_params
+    if target.kind == TESS:
+        df = tess_planet_extractor.find_data_tess(
+            target.key,
+            period_days=planet_params["per"],
+            t0_btjd=planet_params["t0"],
+            window=planet_params["duration"],
+        )
+    else:
+        df = kepler_planet_extractor.find_data_kepler(
+            target.key,
+            period_days=planet_params["per"],
+            t0_btjd=planet_params["t0"],
+            window=planet_params["duration"],
+        )
+
+    if df is None or df.empty:
+        raise TargetNotFound(f"No {'TESS' if target.kind == TESS else 'Kepler'} data found for identifier: {target.key}")
+
+    return df, planet_params
 
 
 def load_data(data) -> tuple[pd.DataFrame, dict]:
     """Load data from a file path or identifier.
 
+    Unknown identifiers and targets without data are remembered for NEGATIVE_CACHE_TTL
+    seconds, and concurrent requests for the same target share one load.
+
     Args:
-        data (str | int): File path to CSV file or integer ID for TESS/Kepler data.
+        data (str | int): Uploaded file name or integer ID for TESS/Kepler data.
 
     Returns:
         tuple[pd.DataFrame, dict]: DataFrame with light curve data and dictionary with planet parameters.
     """
-    possible_uploaded_path = pathlib.Path(app.config["UPLOAD_FOLDER"]) / str(data)
-    if possible_uploaded_path.exists() and possible_uploaded_path.is_file() and possible_uploaded_path.suffix.lower() == ".csv":
-        df = pd.read_csv(possible_uploaded_path)
-        return df, {
-            "z": None,
-            "duration": None,
-            "impact": None,
-        }
-
-    else:
-        try:
-            planet_id = int(data)
-            planet_params = tess_planet_extractor.find_planet_details(planet_id)
+    return target_resolver.load(data, load_target)
 
-            df = tess_planet_extractor.find_data_tess(
-                planet_id,
-                period_days=planet_params["per"],
-                t0_btjd=planet_params["t0"],
-                window=planet_params["duration"],
-            )
 
-            if df is None or df.empty:
-                raise ValueError(f"No TESS data found for identifier: {data}")
+def load_system(host) -> tuple[pd.DataFrame, list[pd.DataFrame], list[dict]]:
+    """Load the light curve of a host star once and one transit window per confirmed planet.
 
-            return df, planet_params
-        except (ValueError, TypeError):
-            planet_id = str(data)
-            planet_params = kepler_planet_extractor.find_planet_details(planet_id)
+    Args:
+        host (str | int): TESS TIC id, or Kepler planet name or KIC id of any planet of the system.
 
-            if planet_params is None:
-                raise ValueError(f"No planet details found for identifier: {data}")
+    Returns:
+        tuple[pd.DataFrame, list[pd.DataFrame | None], list[dict]]: Whole light curve, transit windows
+            and planet parameters, the last two in the same order. The window of a planet without a
+            usable transit is None.
+    """
+    host = str(host)
+    if host.isdigit():
+        extractor, host = tess_planet_extractor, int(host)
+    else:
+        extractor, host = kepler_planet_extractor, host.removeprefix("KIC").strip()
 
-            df = kepler_planet_extractor.find_data_kepler(
-                planet_id,
-                period_days=planet_params["per"],
-                t0_btjd=planet_params["t0"],
-                window=planet_params["duration"],
-            )
+    planets = extractor.find_system_details(host)
+    if not planets:
+        raise ValueError(f"No planet details found for system: {host}")
 
-            if df is None or df.empty:
-                raise ValueError(f"No Kepler data found for identifier: {data}")
+    df, windows = extractor.find_system_data(host, planets)
+    if df is None or df.empty:
+        raise ValueError(f"No light curve found for system: {host}")
+    if all(window is None for window in windows):
+        raise ValueError(f"No usable transit found for system: {host}")
 
-            return df, planet_params
+    return df, windows, planets
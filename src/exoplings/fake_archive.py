@@ -0,0 +1,198 @@
+import json
+import os
+import random
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+TARGETS_NAME = "targets.json"
+CADENCE = 2 / (24 * 60)  # days
+SECTOR_DAYS = 27.4
+
+
+class FakeArchive:
+    """Local stand-in for MAST serving fixture light curves, for load tests.
+
+    Implements the two requests of `archive.ArchiveClient`. The fixtures of a target are
+    the FITS files named `<target>-*.fits` in `fixtures_dir`, with the space of the
+    target replaced by an underscore, e.g. `TIC_261136679-s0001.fits`. A target without
+    fixtures has no products. Every response is delayed by `latency` ± `jitter` seconds
+    and a `failure_rate` fraction of them are 503s.
+
+    Args:
+        fixtures_dir (str): Directory of the FITS fixtures.
+        latency (float): Mean delay of a response in seconds.
+        jitter (float): Half width of the uniform spread around the mean delay.
+        failure_rate (float): Fraction of the requests answered with a 503.
+        seed (int | None): Seed of the delays and failures.
+    """
+
+    def __init__(self, fixtures_dir, latency=0.0, jitter=0.0, failure_rate=0.0, seed=None):
+        self.fixtures_dir = fixtures_dir
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+
+    def products(self, target) -> list[dict]:
+        prefix = target.replace(" ", "_") + "-"
+        names = sorted(name for name in os.listdir(self.fixtures_dir) if name.startswith(prefix) and name.endswith(".fits"))
+        return [{"filename": name} for name in names]
+
+    def server(self, host="127.0.0.1", port=8765) -> ThreadingHTTPServer:
+        """HTTP server of the archive, call `serve_forever` on it or use `start`."""
+        archive = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                archive._handle(self)
+
+            def log_message(self, format, *args):
+                pass  # one line per request would drown the load test output
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        return server
+
+    def start(self, host="127.0.0.1", port=0) -> ThreadingHTTPServer:
+        """Serve in a daemon thread, port 0 picks a free port, see `server.server_address`."""
+        server = self.server(host, port)
+        threading.Thread(target=server.serve_forever, name="fake-archive", daemon=True).start()
+        return server
+
+    def _handle(self, handler):
+        with self._lock:
+            self.requests += 1
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            fail = self._random.random() < self.failure_rate
+            self.failures += fail
+        time.sleep(delay)
+
+        if fail:
+            return self._send(handler, 503, b"Injected failure", "text/plain")
+
+        url = urllib.parse.urlsplit(handler.path)
+        if url.path == "/search":
+            target = urllib.parse.parse_qs(url.query).get("target", [""])[0]
+            body = json.dumps({"products": self.products(target)}).encode("utf-8")
+            return self._send(handler, 200, body, "application/json")
+
+        if url.path.startswith("/files/"):
+            filename = os.path.basename(urllib.parse.unquote(url.path.removeprefix("/files/")))
+            path = os.path.join(self.fixtures_dir, filename)
+            if filename.endswith(".fits") and os.path.isfile(path):
+                with open(path, "rb") as f:
+                    return self._send(handler, 200, f.read(), "application/fits")
+
+        self._send(handler, 404, b"Not found", "text/plain")
+
+    @staticmethod
+    def _send(handler, status, body, content_type):
+        handler.send_response(status)
+        handler.send_header("Content-Type", content_type)
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+
+def synthetic_light_curve(planets, sigma=0.0005, days=SECTOR_DAYS, rng=None):
+    """2-minute cadences around the reference transit of every planet of a star, with trapezoidal transits.
+
+    Args:
+        planets (list[dict]): "per", "t0", "duration" and "z" of each planet, `find_planet_details` style.
+        sigma (float): Gaussian noise level.
+        days (float): Span of data centered on each reference transit, overlaps are merged.
+        rng (np.random.Generator | None): Source of the noise.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: Time, flux and flux error.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    # cadences on one grid, so the spans of planets with close reference transits merge
+    steps = [np.arange(np.floor((p["t0"] - days / 2) / CADENCE), np.ceil((p["t0"] + days / 2) / CADENCE)) for p in planets]
+    time = np.unique(np.concatenate(steps)) * CADENCE
+
+    flux = np.ones_like(time)
+    for planet in planets:
+        rp, duration = planet["z"], planet["duration"]
+        phase = np.abs((time - planet["t0"] + 0.5 * planet["per"]) % planet["per"] - 0.5 * planet["per"])
+        ingress = max(duration * rp / (1 + rp), CADENCE)
+        # 1 inside the flat bottom, falling linearly to 0 over the ingress
+        flux -= rp**2 * np.clip((0.5 * duration - phase) / ingress, 0.0, 1.0)
+    flux += rng.normal(0.0, sigma, len(time))
+    return time, flux, np.full_like(time, sigma)
+
+
+def write_fixture(path, time, flux, flux_err, mission, quality=None):
+    """Write a light curve with the columns and header `lightcurves.read_fits_light_curve` reads, all cadences good by default."""
+    from astropy.io import fits
+
+    quality = np.zeros(len(time), dtype=np.int32) if quality is None else np.asarray(quality, dtype=np.int32)
+    columns = [
+        fits.Column(name="TIME", format="D", array=time),
+        fits.Column(name="PDCSAP_FLUX", format="E", array=flux),
+        fits.Column(name="PDCSAP_FLUX_ERR", format="E", array=flux_err),
+        fits.Column(name="QUALITY", format="J", array=quality),
+    ]
+    primary = fits.PrimaryHDU()
+    primary.header["MISSION"] = mission
+    fits.HDUList([primary, fits.BinTableHDU.from_columns(columns)]).writeto(path, overwrite=True)
+
+
+def synthesize_fixtures(fixtures_dir, n_targets=20, seed=0) -> list[str]:
+    """Write synthetic fixtures for the first stars with confirmed planets of both catalogs.
+
+    Transits of every planet of a star follow the catalog ephemeris and radius ratio, so
+    the pipeline finds them where it would in the real light curves. The identifiers
+    accepted by `/visualize` are also written to `targets.json` for `exoplings loadtest`.
+
+    Args:
+        fixtures_dir (str): Output directory.
+        n_targets (int): Stars per catalog.
+        seed (int): Seed of the noise.
+
+    Returns:
+        list[str]: The identifiers of the targets written.
+    """
+    # the app first, it imports data_processing itself through its routes
+    from . import app  # noqa: F401
+    from .data_processing import kepler_planet_extractor, tess_planet_extractor
+
+    os.makedirs(fixtures_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    targets = []
+    catalogs = (
+        (tess_planet_extractor, "tid", "TIC", "TESS"),
+        (kepler_planet_extractor, "kepid", "KIC", "Kepler"),
+    )
+    for extractor, host_column, prefix, mission in catalogs:
+        hosts = extractor.df[host_column].dropna().drop_duplicates()
+        written = 0
+        for host in hosts:
+            if written == n_targets:
+                break
+            # every planet of the star, the archive serves one light curve per star
+            planets = extractor.find_system_details(int(host) if mission == "TESS" else str(int(host)))
+            if not planets:
+                continue
+            for planet in planets:
+                planet["z"] = planet["z"] if np.isfinite(planet["z"]) else 0.05
+
+            time, flux, flux_err = synthetic_light_curve(planets, rng=rng)
+            write_fixture(os.path.join(fixtures_dir, f"{prefix}_{int(host)}-synthetic.fits"), time, flux, flux_err, mission)
+
+            if mission == "TESS":
+                targets.append(str(int(host)))
+            else:
+                targets.extend(planet["name"] for planet in planets)
+            written += 1
+
+    with open(os.path.join(fixtures_dir, TARGETS_NAME), "w", encoding="utf-8") as f:
+        json.dump(targets, f, indent=2)
+    return targets
@@ -0,0 +1,361 @@
+"""Plotly figures as plain dicts, without the validation of the plotly object model.
+
+Every builder returns the same {"data": [...], "layout": {...}} structure that the
+matching `plot_processing` function serializes to, so the browser renders the same
+figure. Templates and the subplot grid of the corner plot are computed once and reused,
+and NumPy arrays are encoded as plotly.js typed arrays like plotly does.
+"""
+
+import copy
+import json
+from functools import lru_cache
+
+import numpy as np
+import plotly.colors
+import plotly.io as pio
+import plotly.utils
+import torch
+from _plotly_utils.utils import convert_to_base64
+from plotly.subplots import make_subplots
+
+from .plot_processing import corner_joint, corner_marginal, create_simple_lc_plot, posterior_lc_curves
+from .utils import summarize_posterior_1D
+
+CORNER_SHADES = ["whitesmoke", "gainsboro", "silver"]
+POSTERIOR_SHADES = ["black", "grey", "whitesmoke"]  # High contrast greys
+
+
+@lru_cache
+def _template(name) -> str:
+    return json.dumps(pio.templates[name], cls=plotly.utils.PlotlyJSONEncoder)
+
+
+def template(name) -> dict:
+    """Serialized Plotly template, parsed once and copied for every figure."""
+    return json.loads(_template(name))
+
+
+@lru_cache
+def _grid_layout(rows, cols, horizontal_spacing, vertical_spacing) -> str:
+    layout = make_subplots(rows=rows, cols=cols, horizontal_spacing=horizontal_spacing, vertical_spacing=vertical_spacing).layout
+    return json.dumps({key: value for key, value in layout.to_plotly_json().items() if key != "template"})
+
+
+def grid_layout(rows, cols, horizontal_spacing=0.02, vertical_spacing=0.02) -> dict:
+    """Axis domains and anchors of a `make_subplots` grid, computed once per grid shape."""
+    return json.loads(_grid_layout(rows, cols, horizontal_spacing, vertical_spacing))
+
+
+def _axis_suffix(row, col, cols) -> str:
+    n = (row - 1) * cols + col
+    return "" if n == 1 else str(n)
+
+
+def _array(values) -> np.ndarray:
+    if isinstance(values, torch.Tensor):
+        return values.detach().cpu().numpy()
+    return np.asarray(values)
+
+
+def _finish(data, layout) -> dict:
+    convert_to_base64(data)
+    return {"data": data, "layout": layout}
+
+
+def to_json(spec) -> str:
+    """Serialize a figure spec like `json.dumps(fig, cls=PlotlyJSONEncoder)` does for a figure."""
+    return json.dumps(spec, cls=plotly.utils.PlotlyJSONEncoder)
+
+
+def light_curve_spec(df) -> dict:
+    """Spec of `create_simple_lc_plot`."""
+    if "time_btjd" not in df or "flux" not in df:
+        # the error figure of plotly express, rare enough to build the slow way
+        return create_simple_lc_plot(df).to_plotly_json()
+
+    trace = {
+        "hovertemplate": "Time (BTJD)=%{x}<br>Normalized Flux=%{y}<extra></extra>",
+        "legendgroup": "",
+        "marker": {"color": "#636efa", "symbol": "circle"},
+        "mode": "lines+markers",
+        "name": "",
+        "showlegend": False,
+        "x": df["time_btjd"].to_numpy(),
+        "xaxis": "x",
+        "y": df["flux"].to_numpy(),
+        "yaxis": "y",
+        "type": "scatter",
+    }
+    # plotly express switches to WebGL above 1000 points, which has no orientation
+    if len(df) > 1000:
+        trace["type"] = "scattergl"
+    else:
+        trace["orientation"] = "v"
+    layout = {
+        "template": template("plotly"),
+        "xaxis": {"anchor": "y", "domain": [0.0, 1.0], "title": {"text": "Time (BTJD)"}},
+        "yaxis": {"anchor": "x", "domain": [0.0, 1.0], "title": {"text": "Normalized Flux"}},
+        "legend": {"tracegroupgap": 0},
+        "title": {"text": "Light Curve"},
+        "height": 600,
+        "showlegend": True,
+        "hovermode": "closest",
+    }
+    return _finish([trace], layout)
+
+
+def posterior_1D_spec(z_true, predictions, sq=False, z_cutoff=0.03, c_cutoff=0.5) -> tuple[dict, list[tuple[float, float]], float, float, bool]:
+    """Spec of `create_posterior_1D_plot`, returned with the same summary values."""
+    z_values, density, credible_intervals, mode, certainty, is_exoplanet = summarize_posterior_1D(z_true, predictions, sq, z_cutoff, c_cutoff)
+    # limits in the precision of the posterior, like the plotly figure
+    y_min, y_max = 0, float(max(density) * 1.1)
+    tensor_credint = torch.tensor(credible_intervals)
+    dhigh = tensor_credint[2, 1] - tensor_credint[0, 1]
+    zmax = z_values[np.argmax(density)]
+    z_values, density = _array(z_values), _array(density)
+
+    shapes = [
+        {
+            "fillcolor": POSTERIOR_SHADES[j],
+            "layer": "below",
+            "line": {"color": "dimgrey"},
+            "opacity": 0.3,
+            "type": "rect",
+            "x0": float(lower),
+            "x1": float(upper),
+            "y0": y_min,
+            "y1": y_max,
+        }
+        for j, (lower, upper) in enumerate(credible_intervals)
+    ]
+
+    data = [{"line": {"color": "black"}, "mode": "lines", "name": "Density", "x": z_values, "y": density, "type": "scatter"}]
+    if z_true[0] is not None:
+        shapes.append({"line": {"color": "red"}, "type": "line", "x0": z_true[0], "x1": z_true[0], "xref": "x", "y0": 0, "y1": 1, "yref": "y domain"})
+        data.append(
+            {
+                "line": {"color": "red", "dash": "dash"},
+                "mode": "lines",
+                "name": "True value",
+                "x": [z_true[0], z_true[0]],
+                "y": [y_min, y_max],
+                "type": "scatter",
+            }
+        )
+
+    layout = {
+        "template": template("simple_white"),
+        "shapes": shapes,
+        "xaxis": {"range": [0, float(min(zmax + 3 * dhigh, 0.3))], "title": {"text": "rₚ [r<sub>s</sub>]"}},
+        "yaxis": {"range": [y_min, y_max], "title": {"text": "Probability density"}},
+    }
+    return _finish(data, layout), credible_intervals, mode, certainty, is_exoplanet
+
+
+def posterior_lc_spec(z_true, null_xs, credible_intervals, mode) -> dict:
+    """Spec of `create_posterior_lc_plot`."""
+    min_lc, max_lc, mode_lc = posterior_lc_curves(z_true, credible_intervals, mode)
+    x_vals = np.arange(len(null_xs))
+
+    data = [
+        {"line": {"color": "rgba(0,0,0,0)"}, "mode": "lines", "showlegend": False, "x": x_vals, "y": max_lc, "type": "scatter"},
+        {
+            "fill": "tonexty",
+            "fillcolor": "gainsboro",
+            "line": {"color": "rgba(0,0,0,0)"},
+            "mode": "lines",
+            "name": "Credible region",
+            "opacity": 1.0,
+            "x": x_vals,
+            "y": min_lc,
+            "type": "scatter",
+        },
+        {"line": {"color": "black"}, "mode": "lines", "name": "Null samples", "opacity": 0.5, "x": x_vals, "y": _array(null_xs), "type": "scatter"},
+        {"line": {"color": "black"}, "mode": "lines", "name": "Mode LC", "x": x_vals, "y": mode_lc, "type": "scatter"},
+    ]
+    layout = {
+        "template": template("simple_white"),
+        "xaxis": {"title": {"text": "Arbitrary Time"}},
+        "yaxis": {"title": {"text": "Normalized Flux"}},
+    }
+    return _finish(data, layout)
+
+
+def corner_spec(lrs_coll, parnames, labels=None, truth=None, bins=100, smooth=0.0, figsize=(600, 600)) -> dict:
+    """Spec of `plot_corner_plotly`."""
+    K = len(parnames)
+    labels = parnames if labels is None else labels
+    layout = grid_layout(K, K)
+    greys = [list(pair) for pair in plotly.colors.get_colorscale("Greys")]
+
+    data = []
+    shapes = []
+    for i in range(K):
+        for j in range(i + 1):
+            suffix = _axis_suffix(i + 1, j + 1, K)
+            axes = {"xaxis": f"x{suffix}", "yaxis": f"y{suffix}"}
+
+            # 1D marginal (diagonal)
+            if i == j:
+                v, zm, bands = corner_marginal(lrs_coll, parnames[i], bins, smooth)
+                data.append({"line": {"color": "black"}, "mode": "lines", "x": zm, "y": v, "type": "scatter", **axes})
+
+                y0, y1 = float(-0.05 * v.max()), float(1.1 * v.max())
+                for k, band in enumerate(bands):
+                    if band is not None:
+                        shapes.append(
+                            {
+                                "fillcolor": CORNER_SHADES[k],
+                                "layer": "below",
+                                "line": {"color": "rgba(0,0,0,0)"},
+                                "opacity": 0.3,
+                                "type": "rect",
+                                "x0": float(band[0]),
+                                "x1": float(band[1]),
+                                "xref": axes["xaxis"],
+                                "y0": y0,
+                                "y1": y1,
+                                "yref": axes["yaxis"],
+                            }
+                        )
+
+                data.append({"line": {"color": "black"}, "mode": "lines", "x": zm, "y": v, "type": "scatter", **axes})
+
+                if truth and parnames[i] in truth:
+                    value = truth[parnames[i]]
+                    shapes.append(
+                        {
+                            "line": {"color": "red", "dash": "dash"},
+                            "type": "line",
+                            "x0": value,
+                            "x1": value,
+                            "xref": axes["xaxis"],
+                            "y0": y0,
+                            "y1": y1,
+                            "yref": axes["yaxis"],
+                        }
+                    )
+                    data.append(
+                        {
+                            "line": {"color": "red", "dash": "dash"},
+                            "mode": "lines",
+                            "showlegend": False,
+                            "x": [value, value],
+                            "y": [y0, y1],
+                            "type": "scatter",
+                            **axes,
+                        }
+                    )
+
+            # 2D joint posterior (lower triangle)
+            else:
+                counts, xbins, ybins, levels = corner_joint(lrs_coll, parnames[j], parnames[i], bins, smooth)
+                data.append(
+                    {"colorscale": copy.deepcopy(greys), "showscale": False, "x": xbins, "y": ybins, "z": counts.T, "type": "heatmap", **axes}
+                )
+                data.append(
+                    {
+                        "contours": {
+                            "coloring": "none",
+                            "end": float(levels[-1]),
+                            "size": float((levels[-1] - levels[0]) / len(levels)),
+                            "start": float(levels[0]),
+                        },
+                        "line": {"color": "black", "width": 1},
+                        "showscale": False,
+                        "x": xbins,
+                        "y": ybins,
+                        "z": counts.T,
+                        "type": "contour",
+                        **axes,
+                    }
+                )
+
+                if truth and parnames[j] in truth and parnames[i] in truth:
+                    data.append(
+                        {
+                            "marker": {"color": "red", "size": 8, "symbol": "x"},
+                            "mode": "markers",
+                            "name": "truth",
+                            "x": [truth[parnames[j]]],
+                            "y": [truth[parnames[i]]],
+                            "type": "scatter",
+                            **axes,
+                        }
+                    )
+
+            # Axis labels
+            if i == K - 1:
+                layout[f"xaxis{suffix}"]["title"] = {"text": labels[j]}
+            if j == 0 and i > 0:
+                layout[f"yaxis{suffix}"]["title"] = {"text": labels[i]}
+
+    layout.update(
+        template=template("simple_white"),
+        shapes=shapes,
+        width=figsize[0],
+        height=figsize[1],
+        showlegend=False,
+        font={"size": 18},
+        margin={"l": 50, "r": 50, "t": 50, "b": 50},
+    )
+    return _finish(data, layout)
+
+
+def benchmark(repeat=5, seed=0) -> dict:
+    """Time the plotly figures against the specs on one simulated light curve.
+
+    Both versions of each figure are serialized, so the time includes the JSON encoding
+    the pipeline does, and the outputs are compared after parsing.
+
+    Returns:
+        dict: Per figure, the mean "plotly" and "spec" build times in seconds and whether the JSON is "identical".
+    """
+    import time
+
+    import pandas as pd
+    import swyft
+
+    from .app import model_registry, simulator, trainer
+    from .plot_processing import (
+        corner_options,
+        create_posterior_1D_plot,
+        create_posterior_lc_plot,
+        plot_corner_plotly,
+        smart_multiD_infer,
+    )
+
+    models = model_registry.active()
+    rng = np.random.default_rng(seed)
+    z_true = [0.1, 0.3, 0.01, 0.0]
+    real_test = (simulator.model_light_curves(np.array([z_true]))[0] + rng.normal(0.0, 0.0005, simulator.t_len)).astype(np.float32)
+    df = pd.DataFrame({"time_btjd": np.linspace(0.0, 1.0, len(real_test)), "flux": real_test})
+
+    predictions = trainer.infer(models.detector, swyft.Sample(x=real_test), swyft.Samples({"z": torch.linspace(0.0, 0.3, 10000)}))
+    _, credible_intervals, mode, _, _ = posterior_1D_spec(z_true, predictions)
+    multi_predictions = smart_multiD_infer(real_test, models.inferrer, trainer, credible_intervals)
+
+    figures = {
+        "light_curve": (lambda: create_simple_lc_plot(df), lambda: light_curve_spec(df)),
+        "posterior": (lambda: create_posterior_1D_plot(z_true, predictions)[0], lambda: posterior_1D_spec(z_true, predictions)[0]),
+        "posterior_lc": (
+            lambda: create_posterior_lc_plot(z_true, real_test, credible_intervals, mode),
+            lambda: posterior_lc_spec(z_true, real_test, credible_intervals, mode),
+        ),
+        "corner": (
+            lambda: plot_corner_plotly(multi_predictions, **corner_options(z_true)),
+            lambda: corner_spec(multi_predictions, **corner_options(z_true)),
+        ),
+    }
+
+    results = {}
+    for name, builders in figures.items():
+        outputs, times = [], []
+        for build in builders:
+            outputs.append(to_json(build()))  # also fills the template and grid caches
+            start = time.perf_counter()
+            for _ in range(repeat):
+                to_json(build())
+            times.append((time.perf_counter() - start) / repeat)
+        results[name] = {"plotly": times[0], "spec": times[1], "identical": json.loads(outputs[0]) == json.loads(outputs[1])}
+    return results
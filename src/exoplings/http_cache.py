@@ -0,0 +1,155 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import stat
+from functools import lru_cache
+
+from flask import Response, make_response, request, send_from_directory
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # optional, install the "compression" extra to build .br files
+    brotli = None
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600  # fingerprinted static URLs never change content
+REVALIDATE = "no-cache"  # pages may be stored but must be revalidated with their ETag
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))  # preferred first
+
+
+def compute_etag(*parts) -> str:
+    """Strong ETag of a response from everything its content depends on."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:32]
+
+
+def not_modified(etag) -> Response | None:
+    """A 304 response when the client already holds `etag`, None when the body has to be sent."""
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = REVALIDATE
+    return response
+
+
+def with_etag(rv, etag, cache_control=REVALIDATE) -> Response:
+    """Attach an ETag and Cache-Control to a view return value."""
+    response = make_response(rv)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = cache_control
+    return response
+
+
+@lru_cache(maxsize=1024)
+def _fingerprint(path, mtime_ns, size) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+def _static_stat(static_folder, filename) -> tuple[str, os.stat_result] | None:
+    """Path and stat of a regular file inside `static_folder`, None for anything else.
+
+    `filename` comes from the URL, paths leaving the folder and devices or FIFOs are
+    rejected before anything is read.
+    """
+    path = safe_join(static_folder, filename)
+    if path is None:
+        return None
+    try:
+        result = os.stat(path)
+    except OSError:
+        return None
+    return (path, result) if stat.S_ISREG(result.st_mode) else None
+
+
+def static_fingerprint(static_folder, filename) -> str | None:
+    """Short content hash of a static file, recomputed only when the file changes."""
+    found = _static_stat(static_folder, filename)
+    if found is None:
+        return None
+    path, result = found
+    return _fingerprint(path, result.st_mtime_ns, result.st_size)
+
+
+def init_static_caching(app):
+    """Fingerprint static URLs and serve them with immutable caching and precompressed variants.
+
+    `url_for("static", filename=...)` gains a `v=<content hash>` argument. A request that
+    carries the current hash is cached for a year as immutable, other static requests are
+    revalidated. A `.br` or `.gz` file written next to an asset by `precompress_static` is
+    sent instead of the asset when the client accepts that encoding.
+    """
+
+    @app.url_defaults
+    def add_static_fingerprint(endpoint, values):
+        if endpoint == "static" and "filename" in values and "v" not in values:
+            fingerprint = static_fingerprint(app.static_folder, values["filename"])
+            if fingerprint is not None:
+                values["v"] = fingerprint
+
+    def static(filename):
+        immutable = request.args.get("v") is not None and request.args["v"] == static_fingerprint(app.static_folder, filename)
+        max_age = IMMUTABLE_MAX_AGE if immutable else None
+        mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+        for encoding, suffix in ENCODINGS:
+            if encoding in request.accept_encodings and _fresh_variant(app.static_folder, filename, suffix):
+                response = send_from_directory(app.static_folder, filename + suffix, mimetype=mimetype, max_age=max_age)
+                response.headers["Content-Encoding"] = encoding
+                break
+        else:
+            response = send_from_directory(app.static_folder, filename, max_age=max_age)
+
+        response.vary.add("Accept-Encoding")
+        if immutable:
+            response.cache_control.immutable = True
+        return response
+
+    app.view_functions["static"] = static
+
+
+def _fresh_variant(static_folder, filename, suffix) -> bool:
+    """Whether a compressed variant exists and is not older than the file it was built from."""
+    original = _static_stat(static_folder, filename)
+    variant = _static_stat(static_folder, filename + suffix)
+    return original is not None and variant is not None and variant[1].st_mtime_ns >= original[1].st_mtime_ns
+
+
+def precompress_static(static_folder, min_saving=0.1) -> list[str]:
+    """Write gzip and, when the brotli package is installed, brotli variants of the static files.
+
+    A variant is only kept when it is at least `min_saving` smaller than the original,
+    already compressed formats such as JPEG and PNG are left alone that way.
+
+    Returns:
+        list[str]: Paths of the files written.
+    """
+    written = []
+    for root, _, files in os.walk(static_folder):
+        for name in files:
+            if name.endswith(tuple(suffix for _, suffix in ENCODINGS)):
+                continue
+            path = os.path.join(root, name)
+            with open(path, "rb") as f:
+                data = f.read()
+
+            variants = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                variants[".br"] = brotli.compress(data, quality=11)
+
+            for suffix, compressed in variants.items():
+                if len(compressed) <= (1 - min_saving) * len(data):
+                    with open(path + suffix, "wb") as f:
+                        f.write(compressed)
+                    written.append(path + suffix)
+                elif os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+    return written
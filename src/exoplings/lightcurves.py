@@ -0,0 +1,229 @@
+import os
+
+import numpy as np
+import pandas as pd
+from astropy.io import fits
+from astropy.stats import sigma_clip
+from lightkurve.utils import KeplerQualityFlags, TessQualityFlags
+
+COLUMNS = ("TIME", "PDCSAP_FLUX", "PDCSAP_FLUX_ERR")
+QUALITY_COLUMNS = ("QUALITY", "SAP_QUALITY")  # SPOC, Kepler
+SPAN_DURATIONS = 2.0  # width of the network input in transit durations, the middle of the simulator's duration prior
+MIN_COVERAGE = 0.8  # fraction of the input that must come from data rather than interpolation
+MAX_EPOCHS_TRIED = 20
+
+
+def download_light_curve_files(search_result, download_dir=None) -> list[str]:
+    """Download the files of a lightkurve search result without opening them.
+
+    Files are stored in, and reused from, the same cache layout lightkurve uses, so both
+    readers share downloads.
+
+    Args:
+        search_result (lk.SearchResult): Result of `lk.search_lightcurve`.
+        download_dir (str | None): Cache directory, defaults to lightkurve's.
+
+    Returns:
+        list[str]: Local paths of the light-curve FITS files.
+    """
+    from astroquery.mast import Observations
+    from lightkurve import config
+
+    download_dir = (download_dir or config.get_cache_dir()).rstrip("/")
+    paths = []
+    for i in range(len(search_result.table)):
+        row = search_result.table[i : i + 1]
+        path = os.path.join(download_dir, "mastDownload", row["obs_collection"][0], row["obs_id"][0], row["productFilename"][0])
+        if not os.path.exists(path):
+            response = Observations.download_products(row, mrp_only=False, download_dir=download_dir)[0]
+            if response["Status"] != "COMPLETE":
+                raise OSError(f"Download of {row['dataURI'][0]} failed: {response['Message']}")
+            path = response["Local Path"]
+        paths.append(path)
+    return paths
+
+
+def read_fits_light_curve(path) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Read one SPOC/Kepler light-curve file and normalize it by its median flux.
+
+    Only the TIME, PDCSAP_FLUX, PDCSAP_FLUX_ERR and QUALITY (SAP_QUALITY in Kepler files)
+    columns are read, through a memory map. Cadences flagged by the default lightkurve quality bitmask and rows
+    without a timestamp are dropped, NaN fluxes are kept for the window cleaning.
+
+    Args:
+        path (str): Path of the FITS file.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: Time, normalized flux and flux error.
+    """
+    with fits.open(path, memmap=True) as hdul:
+        data = hdul[1].data
+        time, flux, flux_err = (np.array(data[column], dtype=np.float64) for column in COLUMNS)
+        quality = np.array(data[next(column for column in QUALITY_COLUMNS if column in data.names)])
+        mission = hdul[0].header.get("MISSION", hdul[0].header.get("TELESCOP", ""))
+
+    flags = TessQualityFlags if str(mission).upper() == "TESS" else KeplerQualityFlags
+    good = np.isfinite(time) & flags.create_quality_mask(quality.astype(np.int32), bitmask="default")
+    time, flux, flux_err = time[good], flux[good], flux_err[good]
+
+    median_flux = np.nanmedian(flux)
+    return time, flux / median_flux, flux_err / median_flux
+
+
+def read_fits_light_curves(paths) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Read, normalize per file and concatenate several light-curve files in time order."""
+    parts = [read_fits_light_curve(path) for path in paths]
+    time, flux, flux_err = (np.concatenate(arrays) for arrays in zip(*parts))
+    order = np.argsort(time, kind="stable")
+    return time[order], flux[order], flux_err[order]
+
+
+def clean_window(time, flux, flux_err, sigma=5.0):
+    """Drop NaN fluxes and sigma-clip outliers, like `remove_nans().remove_outliers(sigma)`."""
+    keep = _clean_mask(flux, sigma)
+    return time[keep], flux[keep], flux_err[keep]
+
+
+def _clean_mask(flux, sigma=5.0) -> np.ndarray:
+    keep = np.isfinite(flux)
+    if keep.any():
+        keep[keep] = ~sigma_clip(flux[keep], sigma=sigma).mask
+    return keep
+
+
+def exposure_times(time) -> np.ndarray:
+    """Time covered by each cadence of a sorted light curve, the shorter gap to its neighbours.
+
+    Taking the shorter gap keeps a cadence next to a data gap as long as its neighbours,
+    and works for light curves mixing several cadences.
+    """
+    if len(time) < 2:
+        return np.zeros(len(time))
+    gaps = np.diff(time)
+    return np.minimum(np.concatenate((gaps[:1], gaps)), np.concatenate((gaps, gaps[-1:])))
+
+
+def resample_to_grid(time, flux, flux_err, center, span, points=250, exposure=None) -> tuple[pd.DataFrame, float]:
+    """Bin a light curve onto `points` evenly spaced times covering `span` days around `center`.
+
+    Every cadence is spread over the bins its exposure overlaps, so a 30-minute cadence
+    fills many bins and many 20-second cadences share one. Bins are the mean of their
+    cadences weighted by overlap / flux_err², bins no cadence reaches are interpolated
+    from their neighbours.
+
+    Args:
+        time, flux, flux_err (np.ndarray): Sorted light curve without NaN fluxes.
+        center (float): Time of the middle point of the grid.
+        span (float): Time between the first and the last point of the grid.
+        points (int): Number of grid points.
+        exposure (np.ndarray | None): Time covered by each cadence, see `exposure_times`.
+
+    Returns:
+        tuple[pd.DataFrame, float]: `time_btjd`, `flux` and `flux_err` on the grid, and the
+            fraction of bins reached by at least one cadence.
+    """
+    step = span / (points - 1)
+    grid = center + np.linspace(-0.5, 0.5, points) * span
+    edges = grid[0] - step / 2 + np.arange(points + 1) * step
+    exposure = exposure_times(time) if exposure is None else exposure
+    start = time - np.maximum(exposure, 1e-9) / 2
+    stop = time + np.maximum(exposure, 1e-9) / 2
+
+    first = np.clip(np.searchsorted(edges, start, side="right") - 1, 0, points - 1)
+    last = np.clip(np.searchsorted(edges, stop, side="left") - 1, 0, points - 1)
+    inside = (stop > edges[0]) & (start < edges[-1])
+    counts = np.where(inside, last - first + 1, 0)
+
+    # one row per (cadence, bin) overlap
+    cadence = np.repeat(np.arange(len(time)), counts)
+    bins = first[cadence] + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    overlap = np.minimum(stop[cadence], edges[bins + 1]) - np.maximum(start[cadence], edges[bins])
+
+    valid_err = np.isfinite(flux_err) & (flux_err > 0)
+    typical_err = np.median(flux_err[valid_err]) if valid_err.any() else 1.0
+    inverse_variance = 1.0 / np.where(valid_err, flux_err, typical_err) ** 2
+
+    weights = overlap * inverse_variance[cadence]
+    weight_sum = np.bincount(bins, weights=weights, minlength=points)
+    flux_sum = np.bincount(bins, weights=weights * flux[cadence], minlength=points)
+    # variance of the weighted mean, sum(w² σ²) / sum(w)²
+    variance_sum = np.bincount(bins, weights=overlap**2 * inverse_variance[cadence], minlength=points)
+
+    covered = weight_sum > 0
+    binned_flux = np.full(points, np.nan)
+    binned_err = np.full(points, np.nan)
+    binned_flux[covered] = flux_sum[covered] / weight_sum[covered]
+    binned_err[covered] = np.sqrt(variance_sum[covered]) / weight_sum[covered]
+    if covered.any() and not covered.all():
+        binned_flux[~covered] = np.interp(grid[~covered], grid[covered], binned_flux[covered])
+        binned_err[~covered] = np.interp(grid[~covered], grid[covered], binned_err[covered])
+
+    df = pd.DataFrame({"time_btjd": grid, "flux": binned_flux.astype(np.float32), "flux_err": binned_err.astype(np.float32)})
+    return df, float(covered.mean())
+
+
+def transit_mask(time, period_days, t0_btjd, duration, factor=1.5) -> np.ndarray:
+    """True for the cadences within `factor` transit durations centered on any transit of a planet."""
+    phase = (time - t0_btjd + 0.5 * period_days) % period_days - 0.5 * period_days
+    return np.abs(phase) < 0.5 * factor * duration
+
+
+def extract_transit_window(
+    time, flux, flux_err, period_days, t0_btjd, window, points=250, span=SPAN_DURATIONS, clean=False, min_coverage=MIN_COVERAGE
+):
+    """Bin one transit onto the fixed input grid of the networks, whatever the cadence.
+
+    The grid has `points` times over `span` transit durations centered on a mid-transit
+    time, the simulator's `linspace(-0.05, 0.05)` scaled by the duration, so a transit
+    takes the same share of the network input at 20-second, 2-minute or 30-minute
+    cadence. Epochs are tried from the one with the most cadences in its window, the
+    first with at least `min_coverage` of its bins reached by data is returned.
+
+    Args:
+        time, flux, flux_err (np.ndarray): Full light curve.
+        period_days (float): Orbital period, NaN or 0 to only look at `t0_btjd`.
+        t0_btjd (float): Reference mid-transit time.
+        window (float): Transit duration in days.
+        points (int): Number of grid points.
+        span (float): Width of the grid in transit durations.
+        clean (bool): Drop NaNs and sigma-clip inside each candidate window only.
+        min_coverage (float): Smallest fraction of bins with data, gaps in the rest are interpolated.
+
+    Returns:
+        pd.DataFrame: `time_btjd`, `flux` and `flux_err` columns.
+    """
+    order = np.argsort(time, kind="stable")
+    time, flux, flux_err = time[order], flux[order], flux_err[order]
+    exposure = exposure_times(time)
+    width = span * window
+    # a cadence just outside the grid can still overlap its first or last bin
+    margin = width / 2 + (exposure.max() if len(exposure) else 0.0)
+
+    for t0_epoch in _epochs_by_data(time, period_days, t0_btjd, margin)[:MAX_EPOCHS_TRIED]:
+        lo, hi = np.searchsorted(time, [t0_epoch - margin, t0_epoch + margin])
+        keep = _clean_mask(flux[lo:hi]) if clean else np.isfinite(flux[lo:hi])
+        if not keep.any():
+            continue
+
+        df, coverage = resample_to_grid(
+            time[lo:hi][keep], flux[lo:hi][keep], flux_err[lo:hi][keep], t0_epoch, width, points=points, exposure=exposure[lo:hi][keep]
+        )
+        if coverage >= min_coverage:
+            return df
+
+    raise RuntimeError("No transit found with enough data")
+
+
+def _epochs_by_data(time, period_days, t0_btjd, margin) -> np.ndarray:
+    """Mid-transit times within the light curve, by decreasing number of cadences around them."""
+    if len(time) == 0:
+        return np.empty(0)
+    if not np.isfinite(period_days) or period_days <= 0:
+        return np.array([t0_btjd])
+
+    first = np.ceil((time[0] - margin - t0_btjd) / period_days)
+    last = np.floor((time[-1] + margin - t0_btjd) / period_days)
+    epochs = t0_btjd + np.arange(first, last + 1) * period_days
+    counts = np.searchsorted(time, epochs + margin) - np.searchsorted(time, epochs - margin)
+    order = np.argsort(-counts, kind="stable")
+    return epochs[order][counts[order] > 0]
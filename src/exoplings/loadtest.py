@@ -0,0 +1,296 @@
+import io
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import NamedTuple
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+import requests
+
+SCENARIOS = ("catalog", "upload", "unknown", "index")
+DEFAULT_MIX = {"catalog": 6, "upload": 2, "index": 2}
+PERCENTILES = (50, 95, 99)
+
+# "[10/Oct/2026:13:55:36 +0000] "GET /visualize/123 HTTP/1.1" 200" of the combined log format, and werkzeug's
+# "[10/Oct/2026 13:55:36] "GET / HTTP/1.1" 200"
+LOG_LINE = re.compile(r'\[(?P<time>[^\]]+)\] "(?P<method>[A-Z]+) (?P<path>\S+) [^"]*" (?P<status>\d{3})')
+LOG_TIME_FORMATS = ("%d/%b/%Y:%H:%M:%S %z", "%d/%b/%Y %H:%M:%S")
+
+
+class Sample(NamedTuple):
+    endpoint: str
+    status: int  # 0 when no response was received
+    latency: float  # seconds
+    ok: bool
+
+
+def parse_mix(text) -> dict[str, float]:
+    """Parse "catalog=6,upload=2,index=2" into scenario weights."""
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip() not in SCENARIOS:
+            raise ValueError(f"Unknown scenario {name.strip()!r}, expected one of {', '.join(SCENARIOS)}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def endpoint_of(method, path) -> str:
+    """Group requests by route: "GET /visualize", "GET /visualize/events", "POST /upload"..."""
+    parts = urlsplit(path).path.strip("/").split("/")
+    if parts[0] == "api":
+        parts = parts[:2]
+    elif parts[-1] == "events" and len(parts) > 2:
+        parts = [parts[0], "events"]
+    else:
+        parts = parts[:1]
+    return f"{method} /{'/'.join(parts)}"
+
+
+class LoadTest:
+    """Drive a running Exoplings server with a mix of browser-like visits and measure every request.
+
+    Scenarios:
+        catalog: open the result page of a catalog target and, when the page streams its
+            stages, read the event stream to the end.
+        upload: upload a light curve, then visit its result page like `catalog`.
+        unknown: classify an identifier that is in no catalog, which should be a 404.
+        index: open the home page.
+
+    Point the server at `exoplings fake-archive` with ARCHIVE_URL so catalog targets do not
+    depend on MAST, and raise RATE_LIMIT_PER_MINUTE or set it to 0, all the traffic comes
+    from one address.
+
+    Args:
+        base_url (str): Root URL of the server.
+        targets (list[str]): Catalog identifiers of the `catalog` scenario.
+        upload_paths (list[str]): CSV light curves of the `upload` scenario.
+        mix (dict[str, float]): Relative weights of the scenarios.
+        timeout (float): Seconds to wait for each response.
+        unique_uploads (bool): Scale the flux of each upload by a tiny distinct factor, so
+            uploads are not deduplicated by the server.
+        seed (int | None): Seed of the scenario and target choices.
+    """
+
+    def __init__(self, base_url, targets=(), upload_paths=(), mix=None, timeout=300.0, unique_uploads=True, seed=None):
+        self.base_url = base_url.rstrip("/")
+        self.targets = list(targets)
+        self.uploads = [pd.read_csv(path) for path in upload_paths]
+        self.mix = dict(mix or DEFAULT_MIX)
+        self.timeout = timeout
+        self.unique_uploads = unique_uploads
+
+        if self.mix.get("catalog") and not self.targets:
+            raise ValueError("The catalog scenario needs targets, see `exoplings fake-archive --synthesize`.")
+        if self.mix.get("upload") and not self.uploads:
+            raise ValueError("The upload scenario needs at least one CSV light curve.")
+
+        self.samples = []
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._uploads_sent = itertools.count()
+        self._local = threading.local()
+
+    @property
+    def session(self) -> requests.Session:
+        # one connection pool per worker thread, like one browser per user
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def request(self, method, path, ok=None, stream=False, **kwargs) -> requests.Response | None:
+        """Send one request and record its latency, status and outcome.
+
+        A response is a success when `ok(response)` is true, or when its status is below 400
+        without `ok`. With `stream` the body is read to the end, an event stream fails if
+        an event carries an error. None is returned when no response was received.
+        """
+        endpoint = endpoint_of(method, path)
+        starting_time = time.perf_counter()
+        try:
+            response = self.session.request(method, self.base_url + path, timeout=self.timeout, allow_redirects=False, stream=stream, **kwargs)
+            failed = False
+            if stream:
+                failed = any(line.startswith(b"data: ") and b'"error"' in line for line in response.iter_lines())
+            latency = time.perf_counter() - starting_time
+        except requests.RequestException:
+            self._record(Sample(endpoint, 0, time.perf_counter() - starting_time, False))
+            return None
+
+        success = not failed and (ok(response) if ok is not None else response.status_code < 400)
+        self._record(Sample(endpoint, response.status_code, latency, success))
+        return response
+
+    def visit(self, target):
+        """Open a result page, then read its event stream when the stages are streamed."""
+        # a redirect from a result page goes back to the home page with an error message
+        page = self.request("GET", f"/visualize/{target}", ok=lambda response: response.status_code == 200)
+        if page is not None and page.status_code == 200 and b"EventSource" in page.content:
+            self.request("GET", f"/visualize/{target}/events", stream=True)
+
+    def run_catalog(self):
+        self.visit(self._random.choice(self.targets))
+
+    def run_unknown(self):
+        self.request("GET", f"/api/classify/unknown-{self._random.randrange(10**6)}", ok=lambda response: response.status_code == 404)
+
+    def run_index(self):
+        self.request("GET", "/")
+
+    def run_upload(self):
+        df = self._random.choice(self.uploads)
+        n = next(self._uploads_sent)
+        if self.unique_uploads:
+            df = df.assign(flux=df["flux"] * (1 + 1e-7 * (n + 1)))
+        body = df.to_csv(index=False).encode("utf-8")
+
+        response = self.request("POST", "/upload", files={"file": (f"loadtest_{n}.csv", io.BytesIO(body), "text/csv")})
+        location = response.headers.get("Location", "") if response is not None else ""
+        if "/visualize/" in location:
+            self.visit(urlsplit(location).path.split("/visualize/", 1)[1])
+
+    def run(self, concurrency=4, duration=None, n_scenarios=None, rate=None):
+        """Run scenarios drawn from the mix until `duration` seconds or `n_scenarios` have passed.
+
+        Without `rate` every worker starts its next scenario as soon as the previous one
+        ends (closed loop). With `rate` scenarios start at that many per second whatever the
+        response times (open loop), with at most `concurrency` in flight.
+
+        Returns:
+            float: Wall time of the run in seconds.
+        """
+        if duration is None and n_scenarios is None:
+            raise ValueError("Give a duration, a number of scenarios or both.")
+        names, weights = zip(*self.mix.items())
+        deadline = time.monotonic() + duration if duration is not None else float("inf")
+        started = itertools.count()
+
+        def next_scenario():
+            if time.monotonic() >= deadline or (n_scenarios is not None and next(started) >= n_scenarios):
+                return None
+            return getattr(self, f"run_{self._random.choices(names, weights)[0]}")
+
+        starting_time = time.perf_counter()
+        if rate is None:
+
+            def worker():
+                while (scenario := next_scenario()) is not None:
+                    scenario()
+
+            threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        else:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                next_start = time.monotonic()
+                while (scenario := next_scenario()) is not None:
+                    time.sleep(max(0.0, next_start - time.monotonic()))
+                    pool.submit(scenario)
+                    next_start += 1.0 / rate
+        return time.perf_counter() - starting_time
+
+    def replay(self, log_path, concurrency=4, speed=1.0):
+        """Replay the GET requests and uploads of an access log.
+
+        Requests start at their recorded offsets divided by `speed`, or back to back with
+        `concurrency` workers when `speed` is 0. An upload is replayed as an upload of one of
+        the load test light curves, other POST requests are skipped.
+
+        Returns:
+            float: Wall time of the replay in seconds.
+        """
+        entries = list(read_access_log(log_path))
+        starting_time = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for offset, method, path in entries:
+                if method == "GET":
+                    job = (self.request, "GET", path, None, path.endswith("/events"))
+                elif method == "POST" and urlsplit(path).path == "/upload" and self.uploads:
+                    job = (self.run_upload,)
+                else:
+                    continue
+                if speed > 0:
+                    time.sleep(max(0.0, starting_time + offset / speed - time.perf_counter()))
+                pool.submit(*job)
+        return time.perf_counter() - starting_time
+
+    def report(self, wall_time) -> dict[str, dict]:
+        """Latency percentiles, throughput and error rate per endpoint and for all requests."""
+        with self._lock:
+            samples = list(self.samples)
+        groups = {}
+        for sample in samples:
+            groups.setdefault(sample.endpoint, []).append(sample)
+        groups = dict(sorted(groups.items()))
+        groups["all"] = samples
+        return {endpoint: summarize(group, wall_time) for endpoint, group in groups.items() if group}
+
+    def _record(self, sample):
+        with self._lock:
+            self.samples.append(sample)
+
+
+def summarize(samples, wall_time) -> dict:
+    latencies = np.array([sample.latency for sample in samples]) * 1000
+    statuses = {}
+    for sample in samples:
+        statuses[sample.status] = statuses.get(sample.status, 0) + 1
+    errors = sum(not sample.ok for sample in samples)
+    return {
+        "requests": len(samples),
+        "throughput": len(samples) / wall_time if wall_time > 0 else 0.0,
+        "errors": errors,
+        "error_rate": errors / len(samples),
+        **{f"p{p}_ms": float(np.percentile(latencies, p)) for p in PERCENTILES},
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+    }
+
+
+def format_report(report) -> str:
+    lines = [f"{'endpoint':<26} {'requests':>8} {'req/s':>7} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  statuses"]
+    for endpoint, row in report.items():
+        statuses = " ".join(f"{status}:{count}" for status, count in row["statuses"].items())
+        lines.append(
+            f"{endpoint:<26} {row['requests']:>8} {row['throughput']:>7.2f} {row['error_rate'] * 100:>6.1f}% "
+            f"{row['p50_ms']:>8.0f} {row['p95_ms']:>8.0f} {row['p99_ms']:>8.0f}  {statuses}"
+        )
+    return "\n".join(lines)
+
+
+def read_access_log(path):
+    """Yield (seconds since the first request, method, path) of every request line of an access log."""
+    first = None
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            match = LOG_LINE.search(line)
+            if match is None:
+                continue
+            timestamp = _parse_log_time(match["time"])
+            first = timestamp if first is None else first
+            yield timestamp - first, match["method"], match["path"]
+
+
+def _parse_log_time(text) -> float:
+    for log_format in LOG_TIME_FORMATS:
+        try:
+            return datetime.strptime(text, log_format).timestamp()
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognized access log time: {text}")
+
+
+def load_targets(path) -> list[str]:
+    """Catalog identifiers from a `targets.json` of `exoplings fake-archive`, or one per line of a text file."""
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".json"):
+            return [str(target) for target in json.load(f)]
+        return [line.strip() for line in f if line.strip()]
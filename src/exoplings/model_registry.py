@@ -0,0 +1,223 @@
+import datetime
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from typing import NamedTuple
+
+import torch
+
+from .models.networks.MultiDim import ExoplingInferrerUltra
+from .models.networks.OneDim import ExoplingDetector
+from .upload_store import file_hash
+
+MANIFEST_NAME = "manifest.json"
+ACTIVE_NAME = "ACTIVE"  # name of the version every worker serves
+BUILTIN = "builtin"  # the weights shipped in ai_models, served when the registry is empty
+# file names and architectures of the two networks, the weights of `exoplings train` have these names
+MODEL_FILES = {"detector": "CNN_1D.pth", "inferrer": "Inferrer_Ultra.pth"}
+ARCHITECTURES = {"detector": ExoplingDetector, "inferrer": ExoplingInferrerUltra}
+INPUT_LENGTH = 250
+
+logger = logging.getLogger(__name__)
+
+
+class ModelSet(NamedTuple):
+    """The networks of one registry version, a request keeps the set it started with."""
+
+    version: str
+    detector: ExoplingDetector
+    inferrer: ExoplingInferrerUltra
+    manifest: dict
+
+    @property
+    def checksums(self) -> tuple[str, ...]:
+        """SHA-256 of the weights of both networks, unlike the version name they change with the weights."""
+        return tuple(self.manifest["models"][model]["sha256"] for model in MODEL_FILES)
+
+
+def build_manifest(version, directory, input_length=INPUT_LENGTH) -> dict:
+    """Manifest of the weights in `directory`: architecture, input length and SHA-256 of each network."""
+    return {
+        "version": version,
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "models": {
+            model: {
+                "file": filename,
+                "architecture": ARCHITECTURES[model].__name__,
+                "input_length": input_length,
+                "sha256": file_hash(os.path.join(directory, filename)),
+            }
+            for model, filename in MODEL_FILES.items()
+        },
+    }
+
+
+class ModelRegistry:
+    """Directory of versioned network weights and the version being served.
+
+    Every version is a subdirectory holding the weights of both networks and a
+    `manifest.json` written by `publish`. The `ACTIVE` file names the version to serve,
+    the bundled `ai_models` weights ("builtin") when it is missing. Weights are checked
+    against their manifest and memory-mapped, so the worker processes of one machine
+    share their pages.
+
+    `activate` loads a version next to the one being served and swaps them in one
+    assignment. Requests hold the `ModelSet` they started with and finish on it.
+
+    Args:
+        directory (str): Registry directory, created on the first publish.
+        builtin_dir (str): Directory of the bundled weights.
+        watch_interval (float): Seconds between checks of `ACTIVE` by `start_watching`, 0 to never check.
+    """
+
+    def __init__(self, directory, builtin_dir, watch_interval=0.0):
+        self.directory = directory
+        self.builtin_dir = builtin_dir
+        self.watch_interval = watch_interval
+        self._active = None
+        self._swap_lock = threading.Lock()
+        self._watcher = None
+        self._builtin_manifest = None
+
+    @property
+    def version(self) -> str | None:
+        return self._active.version if self._active is not None else None
+
+    def active(self) -> ModelSet:
+        """The networks currently served, read once per request."""
+        return self._active
+
+    def versions(self) -> list[str]:
+        published = []
+        if os.path.isdir(self.directory):
+            names = (name for name in os.listdir(self.directory) if not name.startswith("."))
+            published = sorted(name for name in names if os.path.isfile(os.path.join(self.directory, name, MANIFEST_NAME)))
+        return [BUILTIN, *published]
+
+    def path_for(self, version) -> str:
+        return self.builtin_dir if version == BUILTIN else os.path.join(self.directory, version)
+
+    def manifest(self, version) -> dict:
+        if version == BUILTIN:
+            if self._builtin_manifest is None:
+                self._builtin_manifest = build_manifest(BUILTIN, self.builtin_dir)
+            return self._builtin_manifest
+
+        path = os.path.join(self.path_for(version), MANIFEST_NAME)
+        if not os.path.isfile(path):
+            raise KeyError(f"Unknown model version {version!r}")
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def requested_version(self) -> str:
+        """Version named by the `ACTIVE` file, "builtin" without one."""
+        try:
+            with open(os.path.join(self.directory, ACTIVE_NAME), encoding="utf-8") as f:
+                return f.read().strip() or BUILTIN
+        except FileNotFoundError:
+            return BUILTIN
+
+    def load(self, version) -> ModelSet:
+        """Check the weights of a version against its manifest and load them memory-mapped.
+
+        Raises:
+            KeyError: The version is not in the registry.
+            ValueError: A file does not match the checksum, architecture or input length of the manifest.
+        """
+        manifest = self.manifest(version)
+        directory = self.path_for(version)
+        networks = {}
+        for model, architecture in ARCHITECTURES.items():
+            entry = manifest["models"][model]
+            if entry["architecture"] != architecture.__name__:
+                raise ValueError(f"{version}: {model} is a {entry['architecture']}, expected {architecture.__name__}")
+            path = os.path.join(directory, entry["file"])
+            if file_hash(path) != entry["sha256"]:
+                raise ValueError(f"{version}: {entry['file']} does not match the checksum of its manifest")
+
+            network = architecture(input_length=entry["input_length"])
+            # assign keeps the mapped tensors as parameters instead of copying them into fresh ones
+            network.load_state_dict(torch.load(path, mmap=True, weights_only=True), assign=True)
+            # served networks stay in eval mode, requests share them and never switch them to training
+            networks[model] = network.eval()
+        return ModelSet(version, networks["detector"], networks["inferrer"], manifest)
+
+    def activate(self, version, persist=True) -> ModelSet:
+        """Load a version and serve it from now on.
+
+        Args:
+            version (str): Version to serve.
+            persist (bool): Also write it to `ACTIVE`, so the other workers switch to it.
+
+        Returns:
+            ModelSet: The networks now served.
+        """
+        with self._swap_lock:
+            if self._active is None or self._active.version != version:
+                models = self.load(version)
+                previous, self._active = self.version, models
+                logger.info("Serving model version %s%s.", version, f", replacing {previous}" if previous else "")
+            if persist:
+                os.makedirs(self.directory, exist_ok=True)
+                path = os.path.join(self.directory, ACTIVE_NAME)
+                with open(path + ".tmp", "w", encoding="utf-8") as f:
+                    f.write(version + "\n")
+                os.replace(path + ".tmp", path)
+            return self._active
+
+    def publish(self, version, files, input_length=INPUT_LENGTH) -> dict:
+        """Copy the weights of both networks into a new version and write its manifest.
+
+        Args:
+            version (str): Name of the new version, e.g. "2026-10-19" or "v3".
+            files (dict[str, str]): Path of the weights of "detector" and "inferrer".
+            input_length (int): Light-curve length the networks were built for.
+
+        Returns:
+            dict: The manifest of the version.
+        """
+        if version == BUILTIN or not version or os.sep in version or version.startswith("."):
+            raise ValueError(f"Invalid model version {version!r}")
+        target = os.path.join(self.directory, version)
+        if os.path.exists(target):
+            raise ValueError(f"Model version {version!r} already exists")
+
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_dir = os.path.join(self.directory, f".{version}.tmp")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        for model, filename in MODEL_FILES.items():
+            shutil.copyfile(files[model], os.path.join(tmp_dir, filename))
+            # a state dict that does not fit the architecture fails here, not in the workers
+            ARCHITECTURES[model](input_length=input_length).load_state_dict(torch.load(os.path.join(tmp_dir, filename), mmap=True, weights_only=True))
+
+        manifest = build_manifest(version, tmp_dir, input_length)
+        with open(os.path.join(tmp_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        # the version appears complete or not at all
+        os.replace(tmp_dir, target)
+        return manifest
+
+    def start_watching(self):
+        """Follow `ACTIVE` in a daemon thread, once, so every worker serves the version activated by any of them."""
+        if self.watch_interval <= 0 or self._watcher is not None:
+            return
+        self._watcher = threading.Thread(target=self._watch, name="model-watcher", daemon=True)
+        self._watcher.start()
+
+    def _watch(self):
+        failed = None
+        while True:
+            time.sleep(self.watch_interval)
+            requested = self.requested_version()
+            if requested == self.version or requested == failed:
+                continue
+            try:
+                self.activate(requested, persist=False)
+                failed = None
+            except Exception as e:
+                failed = requested  # reported once, retried when ACTIVE changes again
+                logger.error("Could not switch to model version %s: %s", requested, e)
@@ -70,7 +70,15 @@ class ExoplingInferrerUltra(swyft.SwyftModule):
         )
 
     def forward(self, A, B):
-        x = A["x"]  # (batch, 250)
+        embedding = self.embed(A["x"])
+
+        # log-ratio estimators
+        logratios1 = self.logratios1(embedding, B["z"])
+        logratios2 = self.logratios2(embedding, B["z"])
+        return logratios1, logratios2
+
+    def embed(self, x):
+        """Compress a batch of light curves (batch, 250) into (batch, 16) features."""
         x = x.unsqueeze(1)  # (batch, 1, 250)
 
         # conv pipeline
@@ -85,9 +93,4 @@ class ExoplingInferrerUltra(swyft.SwyftModule):
         x = F.leaky_relu(self.fc3(x))
         x = self.dropout(x)
         x = self.bn3(x)
-        embedding = F.leaky_relu(self.fc4(x))
-
-        # log-ratio estimators
-        logratios1 = self.logratios1(embedding, B["z"])
-        logratios2 = self.logratios2(embedding, B["z"])
-        return logratios1, logratios2
+        return F.leaky_relu(self.fc4(x))
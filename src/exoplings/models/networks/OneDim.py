@@ -67,7 +67,14 @@ class ExoplingDetector(swyft.SwyftModule):
         self.logratios = swyft.LogRatioEstimator_1dim(num_features=16, num_params=1, varnames="z")
 
     def forward(self, A, B):
-        x = A["x"]  # (batch, 250)
+        embedding = self.embed(A["x"])
+
+        # log-ratio
+        logratios = self.logratios(embedding, B["z"].unsqueeze(-1))
+        return logratios
+
+    def embed(self, x):
+        """Compress a batch of light curves (batch, 250) into (batch, 16) features."""
         x = x.unsqueeze(1)  # (batch, 1, 250)
 
         # conv pipeline
@@ -82,8 +89,4 @@ class ExoplingDetector(swyft.SwyftModule):
         x = F.leaky_relu(self.fc3(x))
         x = self.dropout(x)
         x = self.bn3(x)
-        embedding = F.leaky_relu(self.fc4(x))
-
-        # log-ratio
-        logratios = self.logratios(embedding, B["z"].unsqueeze(-1))
-        return logratios
+        return F.leaky_relu(self.fc4(x))
@@ -1,56 +1,213 @@
+import logging
+
 import batman
 import numpy as np
 import swyft
 
 DUR2PER = 1 / 0.0254921
+RP_SQRT_MAX = 0.5477225575051661
+
+logger = logging.getLogger(__name__)
 
 
 class Simulator(swyft.Simulator):
-    def __init__(self, rand_b=False, rand_dur=False, rand_t0=False, t_len=250):
+    def __init__(self, rand_b=False, rand_dur=False, rand_t0=False, t_len=250, sigma=0.0005, seed=None, transit_table=None):
         super().__init__()
         self.rand_b = rand_b
         self.rand_dur = rand_dur
         self.rand_t0 = rand_t0
         self.t_len = t_len
+        self.sigma = sigma
+        self.rng = np.random.default_rng(seed)
+        self.transit_table = transit_table
         self.transform_samples = swyft.to_numpy32
 
     def sample_z(self):
         # rp_sqrt = np.random.uniform(low=-0.15, high=0.5477225575051661)
         # rp = np.heaviside( rp_sqrt, 1.) * rp_sqrt**2
 
-        rp = np.random.uniform(low=0.0, high=0.5477225575051661) ** 2
+        rp = self.rng.uniform(low=0.0, high=RP_SQRT_MAX) ** 2
         # rp = np.random.uniform(low=0.03162277660168379, high=0.5477225575051661)**2
         # rp = np.random.uniform(low=0.1, high=0.16)
 
         if self.rand_dur:
-            dur = np.random.uniform(low=0.025, high=0.075)
+            dur = self.rng.uniform(low=0.025, high=0.075)
         else:
             dur = 0.05
 
         if self.rand_b:
-            b = np.random.uniform(low=0.0, high=1.0)
+            b = self.rng.uniform(low=0.0, high=1.0)
         else:
             b = 0.0
 
         if self.rand_t0:
-            t0 = np.random.uniform(low=-0.01, high=0.01)
+            t0 = self.rng.uniform(low=-0.01, high=0.01)
         else:
             t0 = 0.0
 
         return np.array([rp, b, dur, t0])
 
+    def prior_bounds(self):
+        """Return the support of the prior on z as a (4, 2) array of [low, high] rows."""
+        return np.array(
+            [
+                [0.0, RP_SQRT_MAX**2],
+                [0.0, 1.0] if self.rand_b else [0.0, 0.0],
+                [0.025, 0.075] if self.rand_dur else [0.05, 0.05],
+                [-0.01, 0.01] if self.rand_t0 else [0.0, 0.0],
+            ]
+        )
+
+    def sample_z_truncated(self, N, bounds, rng=None):
+        """Draw N samples of z from the prior restricted to the box `bounds`.
+
+        The truncated prior has the same shape as the prior inside the box, so the
+        importance weight prior / proposal is the constant prior mass of the box.
+
+        Args:
+            N (int): Number of samples.
+            bounds (np.ndarray): (4, 2) array of [low, high] rows, clipped to the prior support.
+            rng (np.random.Generator | None): Generator to draw from, defaults to the simulator's.
+
+        Returns:
+            tuple[np.ndarray, float]: (N, 4) float32 samples and the log importance weight.
+        """
+        prior = self.prior_bounds()
+        bounds = np.clip(np.asarray(bounds, dtype=np.float64), prior[:, :1], prior[:, 1:])
+
+        z = self._sample_box(N, bounds, rng).astype(np.float32)
+
+        # rp is uniform in sqrt(rp), so its prior mass is measured in that space
+        sqrt_low, sqrt_high = np.sqrt(bounds[0])
+        log_weight = np.log((sqrt_high - sqrt_low) / RP_SQRT_MAX)
+        for i in range(1, 4):
+            if prior[i, 1] > prior[i, 0]:
+                log_weight += np.log((bounds[i, 1] - bounds[i, 0]) / (prior[i, 1] - prior[i, 0]))
+
+        return z, float(log_weight)
+
+    def sample_z_batch(self, N, rng=None):
+        """Draw N prior samples of z in one vectorized call.
+
+        Args:
+            N (int): Number of samples.
+            rng (np.random.Generator | None): Generator to draw from, defaults to the simulator's.
+
+        Returns:
+            np.ndarray: (N, 4) array of [rp, b, dur, t0] rows.
+        """
+        return self._sample_box(N, self.prior_bounds(), rng)
+
+    def _sample_box(self, N, bounds, rng=None):
+        rng = self.rng if rng is None else rng
+        low, high = bounds[:, 0].copy(), bounds[:, 1].copy()
+        # rp is drawn uniformly in sqrt(rp), like sample_z
+        low[0], high[0] = np.sqrt(low[0]), np.sqrt(high[0])
+        z = rng.uniform(low=low, high=high, size=(N, 4))
+        z[:, 0] **= 2
+        return z
+
+    def calc_m_batch(self, z, out=None, t=None):
+        """Compute noiseless light curves for a batch of parameters.
+
+        A single batman model is reused for the whole batch, batman only recomputes the
+        orbit when the parameters change.
+
+        Args:
+            z (np.ndarray): (N, 4) parameters.
+            out (np.ndarray | None): Preallocated (N, len(t)) array, for example a memory map.
+            t (np.ndarray | None): Times of the light-curve points, defaults to the t_len grid of `phys_sim`.
+
+        Returns:
+            np.ndarray: (N, len(t)) float32 light curves.
+        """
+        t = np.linspace(-0.05, 0.05, self.t_len) if t is None else t
+        if out is None:
+            out = np.empty((len(z), len(t)), dtype=np.float32)
+        if len(z) == 0:
+            return out
+
+        params = self._transit_params(*z[0])
+        model = batman.TransitModel(params, t)
+        for i, (rp, b, dur, t0) in enumerate(z):
+            self._update_transit_params(params, rp, b, dur, t0)
+            out[i] = model.light_curve(params)
+        return out
+
+    def model_light_curves(self, z):
+        """Noiseless light curves on the simulator time grid, without running the swyft graph.
+
+        Curves come from the transit table when one is attached and covers their (rp, b),
+        the others are computed with batman.
+
+        Args:
+            z (np.ndarray): (N, 4) parameters.
+
+        Returns:
+            np.ndarray: (N, t_len) float32 light curves.
+        """
+        z = np.atleast_2d(np.asarray(z, dtype=np.float64))
+        if self.transit_table is None:
+            return self.calc_m_batch(z)
+
+        out = np.empty((len(z), self.t_len), dtype=np.float32)
+        covered = self.transit_table.covers(z)
+        out[covered] = self.transit_table.light_curves(z[covered], np.linspace(-0.05, 0.05, self.t_len))
+        out[~covered] = self.calc_m_batch(z[~covered])
+        return out
+
+    def get_noisy_batch(self, m, sigma=None, rng=None, out=None):
+        """Add Gaussian noise to a batch of light curves in one call.
+
+        Args:
+            m (np.ndarray): (N, t_len) noiseless light curves.
+            sigma (float | None): Noise level, defaults to the simulator's.
+            rng (np.random.Generator | None): Generator to draw from, defaults to the simulator's.
+            out (np.ndarray | None): Preallocated float32 array for the result, may alias `m`.
+
+        Returns:
+            np.ndarray: (N, t_len) float32 noisy light curves.
+        """
+        rng = self.rng if rng is None else rng
+        sigma = self.sigma if sigma is None else sigma
+        if out is None:
+            out = np.empty(m.shape, dtype=np.float32)
+        noise = rng.standard_normal(size=m.shape, dtype=np.float32)
+        np.multiply(noise, sigma, out=noise)
+        np.add(m, noise, out=out)
+        return out
+
+    def simulate_batch(self, N, rng=None, out=None):
+        """Simulate N (z, m, x) triplets without going through the swyft graph.
+
+        Args:
+            N (int): Number of samples.
+            rng (np.random.Generator | None): Generator to draw from, defaults to the simulator's.
+            out (dict | None): Preallocated "z", "m" and "x" arrays of length N to write into.
+
+        Returns:
+            dict: "z" (N, 4), "m" and "x" (N, t_len) float32 arrays.
+        """
+        out = out if out is not None else {}
+        z = self.sample_z_batch(N, rng)
+        if "z" in out:
+            out["z"][:] = z
+        else:
+            out["z"] = z.astype(np.float32)
+        out["m"] = self.calc_m_batch(z, out=out.get("m"))
+        out["x"] = self.get_noisy_batch(out["m"], rng=rng, out=out.get("x"))
+        return out
+
     def calc_m(self, z):
         m = self.phys_sim(rp=z[0], b=z[1], dur=z[2], t0=z[3], t_len=self.t_len)
         return m.astype(np.float32)
 
     def calc_x(self, m):
-        sigma = 0.0005
-        # sigma = 0.00001
-        result = self.get_noisy(m, sigma=sigma)
+        result = self.get_noisy(m, sigma=self.sigma)
         return result.astype(np.float32)
 
-    def build(self, graph):  # the print statements are for illustration only
-        print("--- Building graph!")
+    def build(self, graph):
+        logger.debug("Building graph")
         # z = graph.node('z', lambda: np.random.uniform(low=0., high=0.3))
         # rp, per, inc, t0
         z = graph.node("z", self.sample_z)
@@ -60,29 +217,34 @@ class Simulator(swyft.Simulator):
         # # Store event trust scores
         # trust_scores = graph.node('trust', lambda: self.pass_events[-1])
 
-        print("--- x =", x)
-        print("--- m =", m)
-        print("--- z =", z)
+        logger.debug("Graph nodes x=%s, m=%s, z=%s", x, m, z)
 
     def phys_sim(self, rp, b=0.0, dur=0.025, t0=0.0, t_len=250):
+        params = self._transit_params(rp, b, dur, t0)
+
+        t = np.linspace(-0.05, 0.05, t_len)  # times at which to calculate light curve
+        m = batman.TransitModel(params, t)  # initializes model
+
+        flux = m.light_curve(params)  # calculates light curve
+        return flux
+
+    def _transit_params(self, rp, b=0.0, dur=0.025, t0=0.0):
         params = batman.TransitParams()  # object to store transit parameters
-        params.t0 = t0  # time of inferior conjunction
-        params.per = DUR2PER * dur  # orbital period
-        params.rp = rp  # planet radius (in units of stellar radii)
         params.a = 15.0  # semi-major axis (in units of stellar radii)
-        params.inc = np.rad2deg(np.arccos(b / 15.0))  # orbital inclination (in degrees)
         params.ecc = 0.0  # eccentricity
         params.w = 90.0  # longitude of periastron (in degrees)
         params.limb_dark = "uniform"  # limb darkening model
         params.u = []
         # params.u = [0.5, 0.1, 0.1, -0.1]        #limb darkening coefficients [u1, u2, u3, u4]
+        self._update_transit_params(params, rp, b, dur, t0)
+        return params
 
-        t = np.linspace(-0.05, 0.05, t_len)  # times at which to calculate light curve
-        m = batman.TransitModel(params, t)  # initializes model
-
-        flux = m.light_curve(params)  # calculates light curve
-        return flux
+    def _update_transit_params(self, params, rp, b, dur, t0):
+        params.t0 = t0  # time of inferior conjunction
+        params.per = DUR2PER * dur  # orbital period
+        params.rp = rp  # planet radius (in units of stellar radii)
+        params.inc = np.rad2deg(np.arccos(b / 15.0))  # orbital inclination (in degrees)
 
     def get_noisy(self, y, sigma=0.005):
-        y_noisy = y + np.random.normal(loc=0.0, scale=sigma, size=len(y))
+        y_noisy = y + self.rng.normal(loc=0.0, scale=sigma, size=len(y))
         return y_noisy
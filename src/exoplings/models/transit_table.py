@@ -0,0 +1,114 @@
+import json
+import os
+
+import numpy as np
+
+from .simulator import RP_SQRT_MAX, Simulator
+
+
+class TransitTable:
+    """Precomputed noiseless transit shapes of the `Simulator`, interpolated trilinearly.
+
+    The period of the simulator is proportional to the duration and the orbit is circular,
+    so a model light curve only depends on rp, b and the scaled time u = |t - t0| / dur.
+    The table samples the flux on a regular (rp, b, u) grid, is stored as a .npy file with
+    a JSON sidecar describing the grid, and is opened as a read-only memory map.
+
+    Args:
+        path (str): Path of the .npy table, the grid is read from the same path with a .json suffix.
+    """
+
+    def __init__(self, path):
+        with open(_meta_path(path), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.flux = np.load(path, mmap_mode="r")
+        self.rp_max = self.meta["rp_max"]
+        self.b_max = self.meta["b_max"]
+        self.u_max = self.meta["u_max"]
+
+    @classmethod
+    def build(cls, path, n_rp=121, n_b=101, n_u=601, rp_max=RP_SQRT_MAX**2, b_max=1.0, u_max=0.6):
+        """Compute the table with batman and write it to `path`.
+
+        Args:
+            path (str): Output .npy path.
+            n_rp, n_b, n_u (int): Grid points along rp, b and u.
+            rp_max, b_max (float): Upper ends of the rp and b grids, both start at 0.
+            u_max (float): Scaled time beyond which the flux is 1, must cover the longest
+                half transit (about 0.55 for rp = 0.3 and b = 0).
+
+        Returns:
+            TransitTable: The new table.
+        """
+        simulator = Simulator()
+        u = np.linspace(0.0, u_max, n_u)
+        flux = np.lib.format.open_memmap(f"{path}.tmp", mode="w+", dtype=np.float32, shape=(n_rp, n_b, n_u))
+        z = np.zeros((n_b, 4))
+        z[:, 1] = np.linspace(0.0, b_max, n_b)
+        z[:, 2] = 1.0  # dur = 1 makes the time axis the scaled time u
+        for i, rp in enumerate(np.linspace(0.0, rp_max, n_rp)):
+            z[:, 0] = rp
+            simulator.calc_m_batch(z, out=flux[i], t=u)
+        flux.flush()
+        del flux
+        os.replace(f"{path}.tmp", path)
+
+        with open(_meta_path(path), "w", encoding="utf-8") as f:
+            json.dump({"rp_max": rp_max, "b_max": b_max, "u_max": u_max, "shape": [n_rp, n_b, n_u]}, f, indent=2)
+        return cls(path)
+
+    def covers(self, z) -> np.ndarray:
+        """Whether each row of a (N, 4) parameter array lies inside the (rp, b) domain of the table."""
+        z = np.atleast_2d(z)
+        return (z[:, 0] >= 0) & (z[:, 0] <= self.rp_max) & (z[:, 1] >= 0) & (z[:, 1] <= self.b_max) & (z[:, 2] > 0)
+
+    def light_curves(self, z, t) -> np.ndarray:
+        """Interpolate noiseless light curves.
+
+        Args:
+            z (np.ndarray): (N, 4) [rp, b, dur, t0] rows inside the table domain, see `covers`.
+            t (np.ndarray): Times of the light-curve points.
+
+        Returns:
+            np.ndarray: (N, len(t)) float32 light curves.
+        """
+        z = np.atleast_2d(np.asarray(z, dtype=np.float64))
+        n_rp, n_b, n_u = self.flux.shape
+
+        # fractional grid coordinates, the last cell is clamped so that i + 1 stays in range
+        x_rp = z[:, 0] / self.rp_max * (n_rp - 1)
+        x_b = z[:, 1] / self.b_max * (n_b - 1) if self.b_max > 0 else np.zeros(len(z))
+        u = np.abs(t[None, :] - z[:, 3:4]) / z[:, 2:3]
+        x_u = np.minimum(u / self.u_max, 1.0) * (n_u - 1)
+
+        i_rp = np.minimum(x_rp.astype(np.int64), n_rp - 2)
+        i_b = np.minimum(x_b.astype(np.int64), n_b - 2)
+        i_u = np.minimum(x_u.astype(np.int64), n_u - 2)
+        f_rp = (x_rp - i_rp)[:, None]
+        f_b = (x_b - i_b)[:, None]
+        f_u = x_u - i_u
+
+        # the (N, 2, 2) rp/b corners as contiguous rows of the memory map
+        corners = np.asarray(self.flux[i_rp[:, None, None] + np.arange(2)[None, :, None], i_b[:, None, None] + np.arange(2)[None, None, :]])
+        rows = np.arange(len(z))[:, None]
+        flux = np.zeros((len(z), len(t)))
+        for a, w_rp in enumerate((1 - f_rp, f_rp)):
+            for c, w_b in enumerate((1 - f_b, f_b)):
+                line = corners[:, a, c]
+                flux += w_rp * w_b * ((1 - f_u) * line[rows, i_u] + f_u * line[rows, i_u + 1])
+
+        # past u_max every curve is out of transit
+        flux[u >= self.u_max] = 1.0
+        return flux.astype(np.float32)
+
+    def validate(self, n=2000, t_len=250, seed=0) -> float:
+        """Largest absolute flux difference to batman over `n` curves drawn from the full prior."""
+        simulator = Simulator(rand_b=True, rand_dur=True, rand_t0=True, t_len=t_len, seed=seed)
+        z = simulator.sample_z_batch(n)
+        z = z[self.covers(z)]
+        t = np.linspace(-0.05, 0.05, t_len)
+        return float(np.abs(self.light_curves(z, t) - simulator.calc_m_batch(z)).max())
+
+
+def _meta_path(path):
+    return os.path.splitext(path)[0] + ".json"
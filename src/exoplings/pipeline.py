@@ -0,0 +1,376 @@
+import hashlib
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import plotly.utils
+import swyft
+import torch
+
+from .app import app, model_registry, trainer, trainer_lock
+from .data_processing import load_data, load_system
+from .figure_specs import corner_spec, light_curve_spec, posterior_1D_spec, posterior_lc_spec, to_json
+from .plot_processing import corner_options, create_system_lc_plot, stream_multiD_infer
+from .search import grid_logratios
+from .uncertainty import MAX_PASSES, estimate_uncertainty
+from .utils import summarize_posterior_1D
+
+STAGES = ("light_curve", "posterior", "posterior_lc", "corner")
+
+
+def run_pipeline(filename_or_id, early_exit=None) -> dict:
+    """Run the full inference and plotting pipeline for one light curve.
+
+    Args:
+        filename_or_id (str | int): Uploaded file name or TESS/Kepler identifier.
+        early_exit (float | None): Skip the posterior light curve and the corner plot when
+            the detector rules out a planet with at least this certainty, None to never skip.
+
+    Returns:
+        dict: JSON-serializable result with the extracted transit, the posterior summary
+            and the serialized Plotly figures, as stored by the results store.
+    """
+    loaded = _load_stage(filename_or_id)
+    posterior = _posterior_stage(loaded)
+
+    if _exits_early(posterior, early_exit):
+        return _result(filename_or_id, loaded, posterior, posterior_lc=None, corner=None)
+
+    return _result(
+        filename_or_id,
+        loaded,
+        posterior,
+        posterior_lc=_posterior_lc_stage(loaded, posterior),
+        corner=_corner_stage(loaded, posterior),
+    )
+
+
+def time_stages(df, planet_params, label="in-memory") -> tuple[dict, dict]:
+    """Run every stage on a light curve that is already loaded and time each of them.
+
+    Nothing is stored, this exercises the networks, the simulator and the figure builders,
+    for example to warm up a worker.
+
+    Args:
+        df (pd.DataFrame): Light curve window with `time_btjd` and `flux` columns.
+        planet_params (dict): Planet parameters as returned by `load_data`, a known "z" also runs the posterior light curve.
+        label (str): Target name of the result.
+
+    Returns:
+        tuple[dict, dict]: The `run_pipeline` result and the milliseconds spent per stage of `STAGES`.
+    """
+    timings = {}
+    outputs = {}
+    stages = (
+        ("light_curve", lambda: _prepare(df, planet_params)),
+        ("posterior", lambda: _posterior_stage(outputs["light_curve"])),
+        ("posterior_lc", lambda: _posterior_lc_stage(outputs["light_curve"], outputs["posterior"])),
+        ("corner", lambda: _corner_stage(outputs["light_curve"], outputs["posterior"])),
+    )
+    for stage, run in stages:
+        starting_time = time.perf_counter()
+        outputs[stage] = run()
+        timings[stage] = (time.perf_counter() - starting_time) * 1000
+
+    result = _result(label, outputs["light_curve"], outputs["posterior"], posterior_lc=outputs["posterior_lc"], corner=outputs["corner"])
+    return result, timings
+
+
+def classify(filename_or_id, passes=None) -> dict:
+    """Run only the 1-D detector and its posterior summary, without building any figure.
+
+    Args:
+        filename_or_id (str | int): Uploaded file name or TESS/Kepler identifier.
+        passes (int | None): Monte-Carlo dropout passes, see `_uncertainty`, None for MC_DROPOUT_PASSES.
+
+    Returns:
+        dict: "target", the posterior summary keys of `run_pipeline` and "processing_time".
+    """
+    models = model_registry.active()
+    df, planet_params = load_data(filename_or_id)
+    real_test = df["flux"].values.astype("float32")
+    predictions, processing_time = _infer_1D(models.detector, real_test)
+
+    z_true = _z_true(df, planet_params)
+    _, _, credible_intervals, mode, certainty, is_exoplanet = summarize_posterior_1D(z_true, predictions)
+
+    return {
+        "target": str(filename_or_id),
+        **_summary(mode, credible_intervals, certainty, is_exoplanet, _uncertainty(models.detector, real_test, z_true, is_exoplanet, passes)),
+        "processing_time": processing_time,
+        "model_version": models.version,
+    }
+
+
+def iter_pipeline(filename_or_id, early_exit=None):
+    """Run the pipeline stage by stage and yield each stage output as soon as it is ready.
+
+    The light curve comes first, then the 1-D posterior with the verdict, then the
+    posterior light curve and the corner plot, which only depend on the 1-D posterior
+    and are computed concurrently. A failing stage yields an error payload, and so do
+    the stages depending on it.
+
+    Args:
+        filename_or_id (str | int): Uploaded file name or TESS/Kepler identifier.
+        early_exit (float | None): See `run_pipeline`, skipped stages yield {"plot": None, "skipped": True}.
+
+    Yields:
+        tuple[str, dict]: A stage of `STAGES` with {"plot": ...} plus stage details, or
+            {"error": message}. Finally ("done", result) with the `run_pipeline` result,
+            or ("done", None) if a stage failed.
+    """
+    try:
+        loaded = _load_stage(filename_or_id)
+    except Exception as e:
+        yield "light_curve", {"error": str(e)}
+        yield from ((stage, {"error": "Light curve unavailable"}) for stage in STAGES[1:])
+        yield "done", None
+        return
+    yield "light_curve", {"plot": loaded["plots"]["light_curve"]}
+
+    try:
+        posterior = _posterior_stage(loaded)
+    except Exception as e:
+        yield "posterior", {"error": str(e)}
+        yield from ((stage, {"error": "Posterior unavailable"}) for stage in STAGES[2:])
+        yield "done", None
+        return
+    yield "posterior", {"plot": posterior["plot"], "summary": posterior["summary"], "processing_time": posterior["processing_time"]}
+
+    if _exits_early(posterior, early_exit):
+        yield from ((stage, {"plot": None, "skipped": True}) for stage in STAGES[2:])
+        yield "done", _result(filename_or_id, loaded, posterior, posterior_lc=None, corner=None)
+        return
+
+    plots = {}
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        futures = {
+            pool.submit(_posterior_lc_stage, loaded, posterior): "posterior_lc",
+            pool.submit(_corner_stage, loaded, posterior): "corner",
+        }
+        for future in as_completed(futures):
+            stage = futures[future]
+            try:
+                plots[stage] = future.result()
+            except Exception as e:
+                yield stage, {"error": str(e)}
+            else:
+                yield stage, {"plot": plots[stage]}
+
+    if len(plots) < 2:
+        yield "done", None
+        return
+    yield "done", _result(filename_or_id, loaded, posterior, **plots)
+
+
+def _load_stage(filename_or_id) -> dict:
+    return _prepare(*load_data(filename_or_id))
+
+
+def _prepare(df, planet_params) -> dict:
+    real_test = df["flux"].values.astype("float32")
+
+    return {
+        # the networks of the whole request, a model swap in the meantime does not change them
+        "models": model_registry.active(),
+        "df": df,
+        "planet_params": planet_params,
+        "real_test": real_test,
+        "input_hash": hashlib.sha256(real_test.tobytes()).hexdigest(),
+        "z_true": _z_true(df, planet_params),
+        "plots": {"light_curve": to_json(light_curve_spec(df))},
+    }
+
+
+def _infer_1D(network, real_test):
+    prior_samples = swyft.Samples({"z": torch.linspace(0.0, 0.3, 10000)})
+
+    starting_time = time.perf_counter()
+    with trainer_lock:
+        predictions = trainer.infer(network, swyft.Sample(x=real_test), prior_samples)
+    end_time = time.perf_counter()
+
+    processing_time = int((end_time - starting_time) * 1000)  # in milliseconds
+    return predictions, processing_time
+
+
+def _uncertainty(network, real_test, z_true, is_exoplanet, passes=None) -> dict | None:
+    """Spread of the 1-D posterior over Monte-Carlo dropout passes, None when disabled."""
+    passes = app.config["MC_DROPOUT_PASSES"] if passes is None else passes
+    if passes <= 0:
+        return None
+
+    return estimate_uncertainty(network, real_test, z_true, is_exoplanet, min(passes, MAX_PASSES), grid_points=app.config["MC_DROPOUT_GRID"])
+
+
+def _exits_early(posterior, early_exit) -> bool:
+    """Whether the detector rules out a planet confidently enough to skip the expensive stages."""
+    summary = posterior["summary"]
+    return early_exit is not None and not summary["is_exoplanet"] and summary["certainty"] >= early_exit
+
+
+def _posterior_stage(loaded) -> dict:
+    network = loaded["models"].detector
+    predictions, processing_time = _infer_1D(network, loaded["real_test"])
+
+    posterior_spec, credible_intervals, mode, certainty, is_exoplanet = posterior_1D_spec(loaded["z_true"], predictions)
+    uncertainty = _uncertainty(network, loaded["real_test"], loaded["z_true"], is_exoplanet)
+
+    return {
+        "credible_intervals": credible_intervals,
+        "mode": mode,
+        "summary": _summary(mode, credible_intervals, certainty, is_exoplanet, uncertainty),
+        "plot": to_json(posterior_spec),
+        "processing_time": processing_time,
+    }
+
+
+def _posterior_lc_stage(loaded, posterior) -> str | None:
+    # in case of CSV do not produce posterior lc plot because of missing true values
+    if not loaded["planet_params"]["z"]:
+        return None
+
+    return to_json(posterior_lc_spec(loaded["z_true"], loaded["real_test"], posterior["credible_intervals"], posterior["mode"]))
+
+
+def _corner_stage(loaded, posterior) -> str:
+    options = corner_options(loaded["z_true"])
+    histograms = stream_multiD_infer(
+        loaded["real_test"],
+        loaded["models"].inferrer,
+        rp_interval=posterior["credible_intervals"][-1],
+        n_samples=app.config["MULTID_SAMPLES"],
+        n_rounds=app.config["MULTID_ROUNDS"],
+        chunk_size=app.config["MULTID_CHUNK_SIZE"],
+        bins=options["bins"],
+    )
+    return to_json(corner_spec(histograms, **options))
+
+
+def _result(filename_or_id, loaded, posterior, posterior_lc, corner) -> dict:
+    df = loaded["df"]
+    return {
+        "target": str(filename_or_id),
+        "input_hash": loaded["input_hash"],
+        "model_version": loaded["models"].version,
+        "transit": {column: df[column].astype(float).tolist() for column in ("time_btjd", "flux", "flux_err") if column in df},
+        "planet_params": {key: _to_builtin(value) for key, value in loaded["planet_params"].items()},
+        "summary": posterior["summary"],
+        "plots": {
+            "light_curve": loaded["plots"]["light_curve"],
+            "posterior": posterior["plot"],
+            "posterior_lc": posterior_lc,
+            "corner": corner,
+        },
+        "processing_time": posterior["processing_time"],
+    }
+
+
+def run_system_pipeline(host) -> dict:
+    """Run the 1-D inference for every confirmed planet of a host star.
+
+    The host light curve is downloaded once, one transit window is cut per planet with
+    the sibling transits masked out, and all windows go through the 1-D network in one
+    batch. The multi-dimensional corner plots are left to the per-planet pages.
+
+    Args:
+        host (str | int): TESS TIC id, or Kepler planet name or KIC id of any planet of the system.
+
+    Returns:
+        dict: JSON-serializable result with the system light curve plot and, under "planets",
+            one entry per planet shaped like the `run_pipeline` result. Planets without a usable
+            transit keep their name and parameters, with an "error" and no summary or plots.
+    """
+    models = model_registry.active()
+    df, windows, planets = load_system(host)
+
+    system_fig = create_system_lc_plot(df, planets)
+
+    usable = [i for i, window in enumerate(windows) if window is not None]
+    real_tests = np.stack([windows[i]["flux"].values.astype("float32") for i in usable])
+    z_grid = torch.linspace(0.0, 0.3, 10000)
+
+    starting_time = time.perf_counter()
+    logratios = grid_logratios(models.detector, torch.from_numpy(real_tests), z_grid)
+    end_time = time.perf_counter()
+
+    processing_time = int((end_time - starting_time) * 1000)  # in milliseconds
+
+    results = [
+        {
+            "name": planet_params["name"],
+            "planet_params": {key: _to_builtin(value) for key, value in planet_params.items()},
+            "error": "no usable transit",
+        }
+        for planet_params in planets
+    ]
+    for i, real_test, planet_logratios in zip(usable, real_tests, logratios):
+        window, planet_params = windows[i], planets[i]
+        # same layout as the output of trainer.infer for a single light curve
+        predictions = swyft.LogRatioSamples(
+            logratios=planet_logratios.unsqueeze(-1),
+            params=z_grid[:, None, None],
+            parnames=np.array([["z[0]"]]),
+        )
+        z_true = _z_true(window, planet_params)
+
+        posterior_spec, credible_intervals, mode, certainty, is_exoplanet = posterior_1D_spec(z_true, predictions)
+        posterior_lc = to_json(posterior_lc_spec(z_true, real_test, credible_intervals, mode)) if planet_params["z"] else None
+
+        results[i] = {
+            "name": planet_params["name"],
+            "transit": {column: window[column].astype(float).tolist() for column in ("time_btjd", "flux", "flux_err")},
+            "planet_params": results[i]["planet_params"],
+            "summary": _summary(mode, credible_intervals, certainty, is_exoplanet),
+            "plots": {
+                "light_curve": to_json(light_curve_spec(window)),
+                "posterior": to_json(posterior_spec),
+                "posterior_lc": posterior_lc,
+            },
+        }
+
+    return {
+        "host": str(host),
+        "input_hash": hashlib.sha256(real_tests.tobytes()).hexdigest(),
+        "model_version": models.version,
+        "n_points": len(df),
+        "planets": results,
+        "plots": {"light_curve": json.dumps(system_fig, cls=plotly.utils.PlotlyJSONEncoder)},
+        "processing_time": processing_time,
+    }
+
+
+def _z_true(df, planet_params) -> list:
+    """Known parameters in the simulator convention, with the duration rescaled to the window."""
+    delta_t = df["time_btjd"].values[-1] - df["time_btjd"].values[0]
+    conversion_factor = 0.1 / delta_t
+
+    return [
+        planet_params["z"],
+        planet_params["impact"],
+        planet_params["duration"] * conversion_factor if planet_params["duration"] else 100.0,
+        0.0,
+    ]
+
+
+def _summary(mode, credible_intervals, certainty, is_exoplanet, uncertainty=None) -> dict:
+    summary = {
+        "mode": float(mode),
+        "credible_intervals": [[float(lower), float(upper)] for lower, upper in credible_intervals],
+        "certainty": float(certainty),
+        "is_exoplanet": bool(is_exoplanet),
+    }
+    if uncertainty is not None:
+        summary["uncertainty"] = uncertainty
+    return summary
+
+
+def _to_builtin(value):
+    """Convert NumPy scalars from the catalogs into JSON-friendly Python values."""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return str(value)
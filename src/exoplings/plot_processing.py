@@ -6,11 +6,18 @@ import swyft
 import torch
 from plotly.graph_objs._figure import Figure
 from plotly.subplots import make_subplots
-from scipy.interpolate import CubicSpline
 from swyft.plot.plot import _get_HDI_thresholds, get_pdf
 
-from .app import simulator
-from .utils import compute_cdf, compute_credible_intervals
+from .corner_histograms import CornerHistograms
+from .lightcurves import transit_mask
+from .utils import summarize_posterior_1D
+
+
+def _simulator():
+    """The simulator of the app, imported on use, the app imports this module through its routes."""
+    from .app import simulator
+
+    return simulator
 
 
 def create_simple_lc_plot(df: pd.DataFrame) -> go.Figure:
@@ -43,20 +50,58 @@ def create_simple_lc_plot(df: pd.DataFrame) -> go.Figure:
         return fig
 
 
+def create_search_plot(df: pd.DataFrame, candidates: list[dict]) -> go.Figure:
+    """Plot a full light curve with the windows of the search candidates shaded.
+
+    Args:
+        df (pd.DataFrame): Light curve data.
+        candidates (list[dict]): Output of `search_light_curve`.
+
+    Returns:
+        go.Figure: Plotly figure object.
+    """
+    fig = create_simple_lc_plot(df)
+    fig.update_traces(mode="markers", marker=dict(size=3))
+    for rank, candidate in enumerate(candidates, start=1):
+        fig.add_vrect(
+            x0=candidate["start"],
+            x1=candidate["end"],
+            fillcolor="green" if candidate["is_exoplanet"] else "grey",
+            opacity=0.15 + 0.5 * candidate["certainty"],
+            line_width=0,
+            annotation_text=f"#{rank}",
+            annotation_position="top left",
+        )
+    fig.update_layout(title="Light Curve Search")
+    return fig
+
+
+def create_system_lc_plot(df: pd.DataFrame, planets: list[dict]) -> go.Figure:
+    """Plot the light curve of a host star with the transits of each planet highlighted.
+
+    Args:
+        df (pd.DataFrame): Whole light curve of the host.
+        planets (list[dict]): Planet parameters with "name", "per", "t0" and "duration" keys.
+
+    Returns:
+        go.Figure: Plotly figure object.
+    """
+    fig = create_simple_lc_plot(df)
+    fig.update_traces(mode="markers", marker=dict(size=3, color="lightgrey"), name="Light curve", showlegend=True)
+
+    time = df["time_btjd"].to_numpy()
+    for planet in planets:
+        in_transit = transit_mask(time, planet["per"], planet["t0"], planet["duration"])
+        fig.add_trace(go.Scatter(x=time[in_transit], y=df["flux"].to_numpy()[in_transit], mode="markers", marker=dict(size=3), name=planet["name"]))
+
+    fig.update_layout(title="System Light Curve")
+    return fig
+
+
 def create_posterior_1D_plot(
     z_true, predictions, sq=False, z_cutoff=0.03, c_cutoff=0.5
 ) -> tuple[Figure, list[tuple[float, float]], float, float, bool]:
-    # Extract posterior samples and density (and sort)
-    z_values = predictions.params.T[0][0]
-    z_values, indices = torch.sort(z_values)
-    density = np.exp(predictions.logratios.T[0])[indices]
-
-    if sq:
-        z_values_sq = z_values**2
-    else:
-        z_values_sq = z_values
-
-    credible_intervals = compute_credible_intervals(z_values_sq, density)
+    z_values_sq, density, credible_intervals, mode, certainty, is_exoplanet = summarize_posterior_1D(z_true, predictions, sq, z_cutoff, c_cutoff)
 
     # Build figure
     fig_post = go.Figure()
@@ -106,37 +151,29 @@ def create_posterior_1D_plot(
         )
     fig_post.update_xaxes(range=[0, min(zmax + 3 * dhigh, 0.3)])
 
-    mode = z_values_sq[torch.argmax(density)].item()
-
-    # compute certainty and is_exoplanet
-    cdf = compute_cdf(density)
-    cs = CubicSpline(z_values_sq, cdf)
-
-    if z_true[1]:
-        z_cutoff = 0.008  # for Kepler data
-
-    certainty = cs(z_cutoff)
-
-    if certainty >= c_cutoff:
-        is_exoplanet = False
-    else:
-        is_exoplanet = True
-        certainty = 1 - certainty
-
     return fig_post, credible_intervals, mode, certainty, is_exoplanet
 
 
-def create_posterior_lc_plot(z_true, null_xs, credible_intervals, mode) -> Figure:
+def posterior_lc_curves(z_true, credible_intervals, mode) -> np.ndarray:
+    """Noiseless model light curves at the lower and upper 68% bounds and at the mode of rₚ."""
     if z_true[1] is None:
         impact = 0.2
     else:
         impact = z_true[1]
 
-    # Compute min/max light curves
     min_zpred, max_zpred = credible_intervals[0]
-    min_lc = simulator.sample(conditions={"z": [min_zpred, impact, z_true[2], z_true[3]]})["m"]
-    max_lc = simulator.sample(conditions={"z": [max_zpred, impact, z_true[2], z_true[3]]})["m"]
-    mode_lc = simulator.sample(conditions={"z": [mode, impact, z_true[2], z_true[3]]})["m"]
+    return _simulator().model_light_curves(
+        [
+            [min_zpred, impact, z_true[2], z_true[3]],
+            [max_zpred, impact, z_true[2], z_true[3]],
+            [mode, impact, z_true[2], z_true[3]],
+        ]
+    )
+
+
+def create_posterior_lc_plot(z_true, null_xs, credible_intervals, mode) -> Figure:
+    # Compute min/max light curves
+    min_lc, max_lc, mode_lc = posterior_lc_curves(z_true, credible_intervals, mode)
 
     # X-axis
     x_vals = np.arange(len(null_xs))
@@ -179,6 +216,40 @@ def create_posterior_lc_plot(z_true, null_xs, credible_intervals, mode) -> Figur
     return fig_lc
 
 
+CORNER_LEVELS = [0.68268, 0.95450, 0.99730]
+
+
+def _pdf(lrs_coll, params, bins, smooth):
+    """Binned density from swyft predictions, or from `CornerHistograms` binned at their own resolution."""
+    if isinstance(lrs_coll, CornerHistograms):
+        return lrs_coll.pdf(params, smooth=smooth)
+    return get_pdf(lrs_coll, params, bins=bins, smooth=smooth)
+
+
+def corner_marginal(lrs_coll, parname, bins, smooth):
+    """1-D marginal of a corner plot.
+
+    Returns:
+        tuple: Density, bin centers and, per HDI level from the widest, the (lower, upper)
+            band or None when no bin reaches the level.
+    """
+    v, zm = _pdf(lrs_coll, parname, bins, smooth)
+    zm = zm[:, 0]
+
+    bands = []
+    for lvl in sorted(_get_HDI_thresholds(v, cred_level=CORNER_LEVELS)):
+        mask = v >= lvl
+        bands.append((zm[mask].min(), zm[mask].max()) if mask.any() else None)
+    return v, zm, bands
+
+
+def corner_joint(lrs_coll, parname_x, parname_y, bins, smooth):
+    """2-D marginal of a corner plot: density, x and y bin centers and the sorted HDI thresholds."""
+    counts, xy = _pdf(lrs_coll, [parname_x, parname_y], bins, smooth)
+    levels = sorted(_get_HDI_thresholds(counts, cred_level=CORNER_LEVELS))
+    return counts, xy[:, 0], xy[:, 1], levels
+
+
 def plot_corner_plotly(lrs_coll, parnames, labels=None, truth=None, bins=100, smooth=0.0, figsize=(600, 600)):
     """
     Minimal Plotly corner plot for swyft inference results.
@@ -196,21 +267,18 @@ def plot_corner_plotly(lrs_coll, parnames, labels=None, truth=None, bins=100, sm
 
             # 1D marginal (diagonal)
             if i == j:
-                v, zm = get_pdf(lrs_coll, parnames[i], bins=bins, smooth=smooth)
-                zm = zm[:, 0]
+                v, zm, bands = corner_marginal(lrs_coll, parnames[i], bins, smooth)
 
                 # Density curve
                 fig.add_trace(go.Scatter(x=zm, y=v, mode="lines", line=dict(color="black")), row=i + 1, col=j + 1)
 
                 # Credible interval shading (HDI bands)
-                levels = sorted(_get_HDI_thresholds(v, cred_level=[0.68268, 0.95450, 0.99730]))
                 y0, y1 = -0.05 * v.max(), 1.1 * v.max()
                 shades = ["whitesmoke", "gainsboro", "silver"]
 
-                for k, lvl in enumerate(levels):
-                    mask = v >= lvl
-                    if mask.any():
-                        lower, upper = zm[mask].min(), zm[mask].max()
+                for k, band in enumerate(bands):
+                    if band is not None:
+                        lower, upper = band
                         fig.add_shape(
                             type="rect",
                             x0=lower,
@@ -257,15 +325,12 @@ def plot_corner_plotly(lrs_coll, parnames, labels=None, truth=None, bins=100, sm
 
             # 2D joint posterior (lower triangle)
             if j < i:
-                counts, xy = get_pdf(lrs_coll, [parnames[j], parnames[i]], bins=bins, smooth=smooth)
-                xbins = xy[:, 0]
-                ybins = xy[:, 1]
+                counts, xbins, ybins, levels = corner_joint(lrs_coll, parnames[j], parnames[i], bins, smooth)
 
                 # Heatmap for smooth density
                 fig.add_trace(go.Heatmap(z=counts.T, x=xbins, y=ybins, colorscale="Greys", showscale=False), row=i + 1, col=j + 1)
 
                 # Contour lines for HDI levels
-                levels = sorted(_get_HDI_thresholds(counts, cred_level=[0.68268, 0.95450, 0.99730]))
                 fig.add_trace(
                     go.Contour(
                         z=counts.T,
@@ -317,30 +382,148 @@ def plot_corner_plotly(lrs_coll, parnames, labels=None, truth=None, bins=100, sm
     return fig
 
 
-def plot_smart_multiD_infer(z_true, real_test, network, trainer) -> Figure:
-    prior_samples = simulator.sample(targets=["x"], N=10000)
+def truncated_multiD_infer(real_test, network, trainer, rp_interval=None, n_samples=2000, n_rounds=2, margin=0.5, epsilon=1e-6):
+    """Evaluate the multi-D network on samples from a truncated prior.
+
+    The first round restricts z[0] to the (widened) 1-D credible interval and keeps the
+    full prior on the remaining parameters. Each further round shrinks every parameter to
+    the region where the joint ratio is above `epsilon` of its maximum, like swyft's
+    truncation. Only the last round is returned, so `n_samples` is the number of network
+    evaluations per round.
+
+    Args:
+        real_test (np.ndarray): Observed light curve.
+        network (swyft.SwyftModule): Multi-D ratio estimator.
+        trainer (swyft.SwyftTrainer): Trainer used for inference.
+        rp_interval (tuple[float, float] | None): 1-D HDI on rₚ used for the first round.
+        n_samples (int): Samples drawn per round.
+        n_rounds (int): Number of truncation rounds.
+        margin (float): Fraction of the interval width added on each side of a bound.
+        epsilon (float): Ratio threshold, relative to the maximum, for the truncation.
+
+    Returns:
+        list[swyft.LogRatioSamples]: Predictions with the importance weights folded into the logratios.
+    """
+    prior = _simulator().prior_bounds()
+    bounds = prior.copy()
+    if rp_interval is not None:
+        bounds[0] = _widen(rp_interval, margin, prior[0])
+
+    for round_idx in range(n_rounds):
+        z, log_weight = _simulator().sample_z_truncated(n_samples, bounds)
+        predictions = trainer.infer(network, swyft.Sample(x=real_test), swyft.Samples({"z": z}))
+
+        if round_idx < n_rounds - 1:
+            # predictions[1] holds the joint (z[0], ..., z[3]) ratio
+            logratios = predictions[1].logratios[:, 0].numpy()
+            keep = logratios - logratios.max() > np.log(epsilon)
+            for i in range(len(bounds)):
+                if prior[i, 1] > prior[i, 0]:
+                    bounds[i] = _widen((z[keep, i].min(), z[keep, i].max()), margin, bounds[i])
+
+    # prior / proposal is constant inside the box, but keep the weights correct if mixed with other samples
+    for lrs in predictions:
+        lrs.logratios = lrs.logratios + log_weight
+
+    return predictions
+
+
+@torch.no_grad()
+def stream_multiD_infer(real_test, network, rp_interval=None, n_samples=2000, n_rounds=2, chunk_size=4096, bins=200, margin=0.5, epsilon=1e-6):
+    """Truncated multi-D inference that histograms the posterior while sampling it.
+
+    Same rounds as `truncated_multiD_infer`, but the samples of each round are drawn and
+    scored `chunk_size` at a time: the light curve is embedded once, only the log-ratio
+    heads run per chunk, and the last round is folded into `CornerHistograms`. Peak
+    memory depends on `chunk_size` and `bins` only, so `n_samples` can go to millions.
+    The truncation box of a round is grown chunk by chunk against the running maximum of
+    the joint ratio, which can only make it wider than the exact box.
+
+    Args:
+        real_test (np.ndarray): Observed light curve.
+        network (ExoplingInferrerUltra): Multi-D ratio estimator in eval mode, as the model registry serves it.
+        rp_interval (tuple[float, float] | None): 1-D HDI on rₚ used for the first round.
+        n_samples (int): Samples drawn per round.
+        n_rounds (int): Number of truncation rounds.
+        chunk_size (int): Samples drawn and scored at once.
+        bins (int): Histogram bins per parameter.
+        margin (float): Fraction of the interval width added on each side of a bound.
+        epsilon (float): Ratio threshold, relative to the maximum, for the truncation.
+
+    Returns:
+        CornerHistograms: Weighted histograms of the last round, ranged over its sampling box.
+    """
+    prior = _simulator().prior_bounds()
+    bounds = prior.copy()
+    if rp_interval is not None:
+        bounds[0] = _widen(rp_interval, margin, prior[0])
+
+    embedding = network.embed(torch.as_tensor(real_test, dtype=torch.float32).unsqueeze(0))
+
+    for round_idx in range(n_rounds):
+        last_round = round_idx == n_rounds - 1
+        histograms = CornerHistograms(np.clip(bounds, prior[:, :1], prior[:, 1:]), bins=bins)
+        running_max, low, high = -np.inf, np.full(len(bounds), np.inf), np.full(len(bounds), -np.inf)
+
+        for start in range(0, n_samples, chunk_size):
+            # the importance weight is constant inside the box and cancels in the histograms
+            z, _ = _simulator().sample_z_truncated(min(chunk_size, n_samples - start), bounds)
+            z_tensor = torch.from_numpy(z)
+            pairs = embedding.expand(len(z), -1)
+            logratios_joint = network.logratios2(pairs, z_tensor).logratios[:, 0].numpy()
+
+            if last_round:
+                histograms.add(z, network.logratios1(pairs, z_tensor).logratios.numpy(), logratios_joint)
+                continue
+
+            running_max = max(running_max, float(logratios_joint.max()))
+            keep = logratios_joint - running_max > np.log(epsilon)
+            if keep.any():
+                low = np.minimum(low, z[keep].min(axis=0))
+                high = np.maximum(high, z[keep].max(axis=0))
+
+        if not last_round:
+            for i in range(len(bounds)):
+                if prior[i, 1] > prior[i, 0]:
+                    bounds[i] = _widen((low[i], high[i]), margin, bounds[i])
+
+    return histograms
+
+
+def _widen(interval, margin, limits):
+    """Widen an interval by `margin` times its width on each side, clipped to `limits`."""
+    low, high = float(interval[0]), float(interval[1])
+    pad = max(margin * (high - low), 1e-3 * (limits[1] - limits[0]))
+    return [max(low - pad, limits[0]), min(high + pad, limits[1])]
+
+
+def smart_multiD_infer(real_test, network, trainer, credible_intervals=None, n_samples=2000, n_rounds=2) -> list[swyft.LogRatioSamples]:
+    if credible_intervals is not None:
+        # widest HDI of the 1-D detector as the proposal on rₚ
+        return truncated_multiD_infer(real_test, network, trainer, credible_intervals[-1], n_samples=n_samples, n_rounds=n_rounds)
+
+    prior_samples = _simulator().sample(targets=["x"], N=10000)
     prior_samples["z"] = prior_samples["z"].astype(np.float32)
 
-    predictions = trainer.infer(network, swyft.Sample(x=real_test), prior_samples)
+    return trainer.infer(network, swyft.Sample(x=real_test), prior_samples)
 
-    # Build Plotly corner plot
+
+def corner_options(z_true) -> dict:
+    """Keyword arguments of `plot_corner_plotly` for the four simulator parameters."""
+    options = {
+        "parnames": ["z[0]", "z[1]", "z[2]", "z[3]"],
+        "labels": ["rₚ [r<sub>s</sub>]", "b [r<sub>s</sub>]", "d [arbitrary units]", "t<sub>0</sub> [arbitrary units]"],
+        "bins": 200,
+        "smooth": 3,
+        "figsize": (850, 600),
+    }
     if z_true[0]:
-        fig_post = plot_corner_plotly(
-            predictions,
-            ["z[0]", "z[1]", "z[2]", "z[3]"],
-            labels=["rₚ [r<sub>s</sub>]", "b [r<sub>s</sub>]", "d [arbitrary units]", "t<sub>0</sub> [arbitrary units]"],
-            truth={"z[0]": z_true[0], "z[1]": z_true[1], "z[2]": z_true[2], "z[3]": z_true[3]},
-            bins=200,
-            smooth=3,
-            figsize=(850, 600),
-        )
-    else:
-        fig_post = plot_corner_plotly(
-            predictions,
-            ["z[0]", "z[1]", "z[2]", "z[3]"],
-            labels=["rₚ [r<sub>s</sub>]", "b [r<sub>s</sub>]", "d [arbitrary units]", "t<sub>0</sub> [arbitrary units]"],
-            bins=200,
-            smooth=3,
-            figsize=(850, 600),
-        )
-    return fig_post
+        options["truth"] = {"z[0]": z_true[0], "z[1]": z_true[1], "z[2]": z_true[2], "z[3]": z_true[3]}
+    return options
+
+
+def plot_smart_multiD_infer(z_true, real_test, network, trainer, credible_intervals=None, n_samples=2000, n_rounds=2) -> Figure:
+    predictions = smart_multiD_infer(real_test, network, trainer, credible_intervals, n_samples=n_samples, n_rounds=n_rounds)
+
+    # Build Plotly corner plot
+    return plot_corner_plotly(predictions, **corner_options(z_true))
@@ -0,0 +1,114 @@
+import json
+import os
+import pathlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .results_store import ResultsStore
+
+MANIFEST_NAME = "manifest.json"
+
+
+def confirmed_targets(telescope="all") -> list[str]:
+    """List the identifiers of every confirmed target, in the form accepted by `load_data`.
+
+    Args:
+        telescope (str): "tess", "kepler" or "all".
+
+    Returns:
+        list[str]: TESS TIC ids followed by Kepler planet names.
+    """
+    from .data_processing import kepler_planet_extractor, tess_planet_extractor
+
+    targets = []
+    if telescope in ("tess", "all"):
+        tids = tess_planet_extractor.confirmed_planets()["tid"].dropna()
+        targets.extend(str(int(tid)) for tid in tids.drop_duplicates())
+    if telescope in ("kepler", "all"):
+        names = kepler_planet_extractor.confirmed_planets()["kepler_name"].dropna()
+        targets.extend(str(name) for name in names.drop_duplicates())
+    return targets
+
+
+def load_manifest(results_dir) -> dict:
+    """Load the checkpoint manifest, or an empty one if the run has not started yet."""
+    path = pathlib.Path(results_dir) / MANIFEST_NAME
+    if not path.is_file():
+        return {"done": [], "failed": {}, "model_version": None}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(results_dir, manifest: dict):
+    path = pathlib.Path(results_dir) / MANIFEST_NAME
+    tmp_path = path.with_suffix(".json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _init_worker():
+    # one torch thread per process, the pool provides the parallelism
+    import torch
+
+    torch.set_num_threads(1)
+
+
+def _compute_target(target, results_dir):
+    """Worker entry point: run the pipeline for one target and store its result."""
+    from .pipeline import run_pipeline
+
+    try:
+        ResultsStore(results_dir).put(target, run_pipeline(target))
+        return target, None
+    except Exception as e:
+        return target, f"{type(e).__name__}: {e}"
+
+
+def precompute(results_dir=".results", telescope="all", workers=None, limit=None, retry_failed=False):
+    """Compute and store results for every confirmed catalog target.
+
+    Progress is checkpointed to `manifest.json` in `results_dir` after every target,
+    so an interrupted run picks up where it stopped. A run with another model version
+    than the checkpointed one starts over.
+
+    Args:
+        results_dir (str): Directory of the results store.
+        telescope (str): "tess", "kepler" or "all".
+        workers (int | None): Number of worker processes, defaults to the CPU count.
+        limit (int | None): Only process this many pending targets.
+        retry_failed (bool): Also retry targets that failed in a previous run.
+
+    Returns:
+        dict: The final manifest.
+    """
+    from .app import model_registry
+
+    ResultsStore(results_dir)
+    manifest = load_manifest(results_dir)
+    if manifest.get("model_version") != model_registry.version:
+        if manifest["done"] or manifest["failed"]:
+            print(f"Model version {model_registry.version} differs from the checkpointed {manifest.get('model_version')}, starting over.")
+        manifest = {"done": [], "failed": {}, "model_version": model_registry.version}
+    done = set(manifest["done"])
+    failed = manifest["failed"]
+
+    pending = [t for t in confirmed_targets(telescope) if t not in done and (retry_failed or t not in failed)]
+    if limit is not None:
+        pending = pending[:limit]
+
+    print(f"Precomputing {len(pending)} targets ({len(done)} already done, {len(failed)} failed).")
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = [pool.submit(_compute_target, target, results_dir) for target in pending]
+        for i, future in enumerate(as_completed(futures), start=1):
+            target, error = future.result()
+            if error is None:
+                manifest["done"].append(target)
+                failed.pop(target, None)
+                print(f"[{i}/{len(pending)}] {target}: done")
+            else:
+                failed[target] = error
+                print(f"[{i}/{len(pending)}] {target}: failed ({error.splitlines()[0]})")
+            save_manifest(results_dir, manifest)
+
+    return manifest
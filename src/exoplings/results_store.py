@@ -0,0 +1,55 @@
+import hashlib
+import json
+import os
+import pathlib
+import re
+import threading
+
+
+class ResultsStore:
+    """Directory of precomputed pipeline results, one JSON file per target.
+
+    Args:
+        directory (str): Directory of the JSON files.
+        version (Callable[[], str] | None): Model version being served, results of other
+            versions are not returned. None returns every result.
+    """
+
+    def __init__(self, directory=".results", version=None):
+        self.directory = pathlib.Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.version = version
+
+    def path_for(self, target) -> pathlib.Path:
+        """Return the file holding the result for a target.
+
+        Catalog names such as "Kepler-232 b" are made filesystem safe, with a short hash
+        of the original name appended so that distinct targets never collide.
+        """
+        target = str(target)
+        safe = re.sub(r"[^A-Za-z0-9_.-]+", "_", target).strip("_")
+        digest = hashlib.sha1(target.encode("utf-8")).hexdigest()[:8]
+        return self.directory / f"{safe}-{digest}.json"
+
+    def get(self, target) -> dict | None:
+        """Load the stored result for a target, or None if it was never computed with the served model version."""
+        path = self.path_for(target)
+        if not path.is_file():
+            return None
+        with open(path, encoding="utf-8") as f:
+            result = json.load(f)
+        if self.version is not None and result.get("model_version") != self.version():
+            return None
+        return result
+
+    def put(self, target, result: dict):
+        """Atomically write the result for a target."""
+        path = self.path_for(target)
+        # unique per writer, workers computing the same target do not write into each other's file
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        os.replace(tmp_path, path)
+
+    def __contains__(self, target) -> bool:
+        return self.path_for(target).is_file()
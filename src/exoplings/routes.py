@@ -1,25 +1,128 @@
+import hmac
 import json
 import os
 import time
 from pathlib import Path
 
 import plotly.utils
-import swyft
-import torch
-from flask import flash, redirect, render_template, request, url_for
-from plotly.graph_objs._figure import Figure
+from flask import Response, flash, jsonify, redirect, render_template, request, session, stream_with_context, url_for
 from werkzeug.datastructures.file_storage import FileStorage
+from werkzeug.exceptions import HTTPException, NotFound, ServiceUnavailable, TooManyRequests, Unauthorized
 from werkzeug.utils import secure_filename
 
-from .app import multi_d_network as network_multi
-from .app import one_d_network as network
-from .app import trainer
-from .data_processing import load_data
-from .plot_processing import create_posterior_1D_plot, create_posterior_lc_plot, create_simple_lc_plot, plot_smart_multiD_infer
-from .utils import allowed_file, get_most_recent_curves
+from .app import APP_VERSION, TRANSIT_TABLE_CHECKSUM, admission, model_registry, results_store, upload_store
+from .http_cache import compute_etag, not_modified, with_etag
+from .pipeline import classify, iter_pipeline, run_pipeline, run_system_pipeline
+from .plot_processing import create_search_plot
+from .search import load_full_light_curve, search_light_curve
+from .utils import allowed_file
+from .warmup import Warmup
 
 
 def register_routes(app):
+    warmup = Warmup(app, app.config["WARMUP_SAMPLE"] or None)
+    app.extensions["warmup"] = warmup
+
+    @app.before_request
+    def start_warmup():
+        # workers started without `main` warm up on their first request, usually a /readyz probe
+        warmup.start()
+        model_registry.start_watching()
+
+    @app.after_request
+    def add_model_version(response):
+        response.headers["X-Model-Version"] = model_registry.version
+        return response
+
+    @app.route("/healthz")
+    def healthz():
+        """Liveness probe, answers as soon as the process serves requests.
+
+        Returns:
+            JSON {"status": "ok"}.
+        """
+        return jsonify({"status": "ok"})
+
+    @app.route("/readyz")
+    def readyz():
+        """Readiness probe, ready once the catalogs are loaded and the warmup request ran.
+
+        Returns:
+            JSON with the status and the cold/warm warmup timings in milliseconds, 503 until ready.
+        """
+        if warmup.ready:
+            return jsonify({"status": "ready", "warmup_ms": warmup.timings})
+        return jsonify({"status": warmup.state, "error": warmup.error}), 503
+
+    @app.route("/metrics")
+    def metrics():
+        """Admission control counters, queue wait histogram and gauges in the Prometheus text format."""
+        return Response(admission.metrics(), mimetype="text/plain; version=0.0.4")
+
+    @app.errorhandler(TooManyRequests)
+    @app.errorhandler(ServiceUnavailable)
+    def overloaded(e):
+        """Answer rejected API requests in JSON, pages get the default error page, both with Retry-After."""
+        if not request.path.startswith("/api/"):
+            return e
+        response = jsonify({"error": e.description})
+        response.status_code = e.code
+        response.headers.update(e.get_headers())
+        response.headers["Content-Type"] = "application/json"
+        return response
+
+    def expensive():
+        """Admission slot for work that is not served from a cache, keyed by client address."""
+        return admission.slot(request.remote_addr)
+
+    def require_admin():
+        """Reject requests without the ADMIN_TOKEN bearer token, the admin endpoints do not exist without a token."""
+        token = app.config["ADMIN_TOKEN"]
+        if not token:
+            raise NotFound()
+        supplied = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        if not hmac.compare_digest(supplied.encode("utf-8"), token.encode("utf-8")):
+            raise Unauthorized()
+
+    @app.route("/admin/models")
+    def list_models():
+        """List the model versions of the registry.
+
+        Returns:
+            JSON with the "active" version of this worker, the "requested" version every
+            worker switches to and the manifest of every version.
+        """
+        require_admin()
+        return jsonify(
+            {
+                "active": model_registry.version,
+                "requested": model_registry.requested_version(),
+                "versions": [model_registry.manifest(version) for version in model_registry.versions()],
+            }
+        )
+
+    @app.route("/admin/models/<version>/activate", methods=["POST"])
+    def activate_model(version):
+        """Serve a model version from now on, in this worker at once and in the others at their next check.
+
+        Requests already running finish on the networks they started with.
+
+        Args:
+            version (str): A version of `/admin/models`.
+
+        Returns:
+            JSON with the "active" version, 404 for an unknown version, 422 for weights
+            that do not match their manifest.
+        """
+        require_admin()
+        if version not in model_registry.versions():
+            return jsonify({"error": f"Unknown model version {version!r}"}), 404
+        try:
+            model_registry.activate(version)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 422
+        return jsonify({"active": model_registry.version})
+
     @app.route("/")
     def index():
         """Render the home page.
@@ -29,7 +132,7 @@ def register_routes(app):
         """
         return render_template(
             "index.html",
-            most_recent_curves=get_most_recent_curves(app.config["UPLOAD_FOLDER"], limit=10),
+            most_recent_curves=upload_store.most_recent(limit=10),
         )
 
     @app.route("/about")
@@ -50,6 +153,30 @@ def register_routes(app):
         """
         return render_template("model.html")
 
+    def save_upload(file):
+        """Save an uploaded CSV under a timestamped name and index it.
+
+        Returns:
+            tuple[dict, bool]: The upload record and whether the same content was uploaded before.
+        """
+        filename = secure_filename(file.filename)
+
+        # add timestamp to filename to avoid overwriting
+        filename = f"{int(time.time())}_{filename}"
+
+        filepath = Path(app.config["UPLOAD_FOLDER"]) / filename
+
+        file.save(filepath)
+
+        try:
+            record, duplicate = upload_store.add(filepath)
+        except Exception:
+            os.remove(filepath)
+            raise
+
+        upload_store.evict_in_background(max_bytes=app.config["UPLOAD_MAX_BYTES"], max_age=app.config["UPLOAD_MAX_AGE"])
+        return record, duplicate
+
     @app.route("/upload", methods=["POST"])
     def upload_file():
         """Upload and process a light curve data file.
@@ -64,28 +191,30 @@ def register_routes(app):
         file: FileStorage = request.files["file"]
 
         if allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-
-            # add timestamp to filename to avoid overwriting
-            filename = f"{int(time.time())}_{filename}"
-
-            filepath = Path(app.config["UPLOAD_FOLDER"]) / filename
-
-            file.save(filepath)
-
             try:
-                df, _ = load_data(filename)
-                flash(f"File uploaded successfully! Found {len(df)} rows and {len(df.columns)} columns.")
-                return redirect(url_for("visualize", filename_or_id=filename))
-
+                with expensive():
+                    record, duplicate = save_upload(file)
+            except HTTPException:
+                raise
             except Exception as e:
-                flash(f"Error processing file: {str(e)}")
-                os.remove(filepath)
+                flash(f"Error processing file: {e!s}")
                 return redirect(url_for("index"))
+
+            if duplicate:
+                flash(f"This file was already uploaded as {record['filename']}.")
+            else:
+                flash(f"File uploaded successfully! Found {record['n_rows']} rows and {len(json.loads(record['columns']))} columns.")
+            return redirect(url_for("visualize", filename_or_id=record["filename"]))
         else:
             flash("Invalid file type. Please upload a CSV file.")
             return redirect(url_for("index"))
 
+    def page_etag(kind, input_hash, *parts):
+        """ETag of a result response from its input, the model weights, the app version and any other content."""
+        # a pending flash message is shown by the next rendered page, never answer it with a 304
+        checksums = model_registry.active().checksums
+        return compute_etag(kind, input_hash, *checksums, TRANSIT_TABLE_CHECKSUM, APP_VERSION, *parts, session.get("_flashes"))
+
     @app.route("/visualize/<filename_or_id>")
     def visualize(filename_or_id):
         """Visualize the uploaded light curve data.
@@ -97,60 +226,277 @@ def register_routes(app):
             Rendered visualize.html template with plots and data info.
         """
         try:
-            df, planet_params = load_data(filename_or_id)
+            upload = upload_store.get(filename_or_id)
+            is_upload = upload is not None
+            data_info = {"filename": f"Planet: {filename_or_id}", "target": filename_or_id, "is_upload": is_upload}
+            most_recent_curves = upload_store.most_recent(limit=10)
+
+            result = None if is_upload else results_store.get(filename_or_id)
+            if result is None and app.config["PROGRESSIVE_VISUALIZE"] and request.args.get("progressive", "1") != "0":
+                # open the page right away, the plots arrive through the event stream
+                etag = page_etag("progressive", filename_or_id, most_recent_curves)
+                return not_modified(etag) or with_etag(
+                    render_template(
+                        "visualize.html",
+                        stream_url=url_for("visualize_events", filename_or_id=filename_or_id),
+                        data_info=data_info,
+                        most_recent_curves=most_recent_curves,
+                    ),
+                    etag,
+                )
+
+            # inputs known before running anything: the upload content or the stored result
+            if is_upload:
+                etag = page_etag("visualize", upload["content_hash"], most_recent_curves, app.config["EARLY_EXIT_CERTAINTY"])
+            elif result is not None:
+                etag = page_etag("visualize", result.get("input_hash", filename_or_id), most_recent_curves)
+            else:
+                etag = None
+            if etag is not None and (response := not_modified(etag)):
+                return response
+
+            if result is None:
+                with expensive():
+                    result = run_pipeline(filename_or_id, early_exit=app.config["EARLY_EXIT_CERTAINTY"])
+                if not is_upload:
+                    results_store.put(filename_or_id, result)
+                    etag = page_etag("visualize", result["input_hash"], most_recent_curves)
+
+            return with_etag(
+                render_template(
+                    "visualize.html",
+                    light_curve_plot_json=result["plots"]["light_curve"],
+                    posterior_plot_json=result["plots"]["posterior"],
+                    posterior_lc_plot_json=result["plots"]["posterior_lc"],
+                    corner_plot_json=result["plots"]["corner"],
+                    data_info=data_info,
+                    exoplanet_result={key: result["summary"].get(key) for key in ("is_exoplanet", "certainty", "uncertainty")},
+                    most_recent_curves=most_recent_curves,
+                    processing_time=result["processing_time"],
+                ),
+                etag,
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            flash(f"Error visualizing data: {e!s}")
+            return redirect(url_for("index"))
 
-            light_curve_fig: Figure = create_simple_lc_plot(df)
+    @app.route("/visualize/<filename_or_id>/events")
+    def visualize_events(filename_or_id):
+        """Stream the pipeline stages of a light curve as server-sent events.
 
-            real_test = df["flux"].values.astype("float32")
+        Each stage of `pipeline.STAGES` is sent as an event of the same name whose data is
+        the JSON stage payload, a final "done" event closes the stream. A complete result
+        of a catalog target is stored in the results store.
 
-            data_info = {
-                "filename": f"Planet: {filename_or_id}",
-            }
+        Args:
+            filename_or_id (str): The name of the uploaded file or a TESS/Kepler identifier.
 
-            prior_samples = swyft.Samples({"z": torch.linspace(0.0, 0.3, 10000)})
+        Returns:
+            A text/event-stream response.
+        """
+        is_upload = upload_store.get(filename_or_id) is not None
+        admission.acquire(request.remote_addr)
+        released = False
+
+        def release():
+            # the slot is freed after the last event, or when the client leaves before that
+            nonlocal released
+            if not released:
+                released = True
+                admission.release()
+
+        def events():
+            try:
+                for stage, payload in iter_pipeline(filename_or_id, early_exit=app.config["EARLY_EXIT_CERTAINTY"]):
+                    if stage == "done":
+                        if payload is not None and not is_upload:
+                            results_store.put(filename_or_id, payload)
+                        payload = {"complete": payload is not None}
+                    yield f"event: {stage}\ndata: {json.dumps(payload)}\n\n"
+            finally:
+                release()
+
+        response = Response(
+            stream_with_context(events()),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+        response.call_on_close(release)
+        return response
+
+    @app.route("/api/classify/<filename_or_id>")
+    def classify_api(filename_or_id):
+        """Classify a light curve with the 1-D detector only, without multi-D inference or plots.
+
+        Args:
+            filename_or_id (str): The name of the uploaded file or a TESS/Kepler identifier.
 
-            starting_time = time.perf_counter()
-            predictions = trainer.infer(network, swyft.Sample(x=real_test), prior_samples)
-            end_time = time.perf_counter()
+        Query parameters:
+            uncertainty (int): Monte-Carlo dropout passes reported under "uncertainty",
+                defaults to MC_DROPOUT_PASSES, 0 to skip them.
 
-            processing_time = int((end_time - starting_time) * 1000)  # in milliseconds
+        Returns:
+            JSON with the verdict, its certainty, the rₚ mode and credible intervals. Catalog
+            targets already in the results store are answered from it, unless other
+            dropout passes than the stored ones are asked for.
+        """
+        passes = request.args.get("uncertainty", default=app.config["MC_DROPOUT_PASSES"], type=int)
+        upload = upload_store.get(filename_or_id)
+        result = None if upload is not None or passes != app.config["MC_DROPOUT_PASSES"] else results_store.get(filename_or_id)
+        if result is not None:
+            etag = page_etag("classify", result.get("input_hash", filename_or_id))
+            return not_modified(etag) or with_etag(
+                jsonify(
+                    {
+                        "target": filename_or_id,
+                        **result["summary"],
+                        "processing_time": result["processing_time"],
+                        "model_version": result["model_version"],
+                        "cached": True,
+                    }
+                ),
+                etag,
+            )
+
+        etag = page_etag("classify", upload["content_hash"], passes) if upload is not None else None
+        if etag is not None and (response := not_modified(etag)):
+            return response
+
+        try:
+            with expensive():
+                response = jsonify({**classify(filename_or_id, passes=passes), "cached": False})
+        except HTTPException:
+            raise
+        except Exception as e:
+            return jsonify({"error": str(e)}), 404
+        return with_etag(response, etag) if etag is not None else response
+
+    @app.route("/api/classify", methods=["POST"])
+    def classify_upload_api():
+        """Upload a CSV light curve and classify it like `/api/classify/<filename_or_id>`.
+
+        Returns:
+            JSON classification with the stored upload name as "target", 400 for an invalid file.
+        """
+        file = request.files.get("file")
+        if file is None or not file.filename or not allowed_file(file.filename):
+            return jsonify({"error": "Expected a CSV file in the 'file' field."}), 400
+
+        with expensive():
+            try:
+                record, duplicate = save_upload(file)
+            except Exception as e:
+                return jsonify({"error": f"Error processing file: {e!s}"}), 400
+
+            try:
+                return jsonify({**classify(record["filename"]), "cached": False, "duplicate": duplicate})
+            except Exception as e:
+                return jsonify({"error": str(e)}), 422
 
-            delta_t = df["time_btjd"].values[-1] - df["time_btjd"].values[0]
-            conversion_factor = 0.1 / delta_t
+    @app.route("/search/<filename_or_id>")
+    def search(filename_or_id):
+        """Search a whole light curve for single transits with a sliding window.
 
-            z_true = [
-                planet_params["z"],
-                planet_params["impact"],
-                planet_params["duration"] * conversion_factor if planet_params["duration"] else 100.0,
-                0.0,
-            ]
+        Args:
+            filename_or_id (str): The name of the uploaded file or a TESS/Kepler identifier.
 
-            posterior_fig, credible_intervals, mode, certainty, is_exoplanet = create_posterior_1D_plot(z_true, predictions)
-            posterior_lc_fig = None
-            # in case of CSV do not produce posterior lc plot because of missing true values
-            if planet_params["z"]:
-                posterior_lc_fig: Figure = create_posterior_lc_plot(z_true, real_test, credible_intervals, mode)
+        Returns:
+            Rendered search.html template with the ranked candidates.
+        """
+        stride = request.args.get("stride", default=25, type=int)
+        top = request.args.get("top", default=10, type=int)
+        try:
+            with expensive():
+                df = load_full_light_curve(filename_or_id)
 
-            posterior_corner_fig = plot_smart_multiD_infer(z_true, real_test, network_multi, trainer)
+                starting_time = time.perf_counter()
+                candidates = search_light_curve(model_registry.active().detector, df, stride=stride, top=top)
+                processing_time = int((time.perf_counter() - starting_time) * 1000)  # in milliseconds
 
-            light_curve_plot_json = json.dumps(light_curve_fig, cls=plotly.utils.PlotlyJSONEncoder)
-            posterior_plot_json = json.dumps(posterior_fig, cls=plotly.utils.PlotlyJSONEncoder)
-            posterior_lc_plot_json = json.dumps(posterior_lc_fig, cls=plotly.utils.PlotlyJSONEncoder)
-            posterior_corner_plot_json = json.dumps(posterior_corner_fig, cls=plotly.utils.PlotlyJSONEncoder)
+                search_fig = create_search_plot(df, candidates)
 
             return render_template(
-                "visualize.html",
-                light_curve_plot_json=light_curve_plot_json,
-                posterior_plot_json=posterior_plot_json,
-                posterior_lc_plot_json=posterior_lc_plot_json if posterior_lc_fig else None,
-                corner_plot_json=posterior_corner_plot_json,
-                data_info=data_info,
-                exoplanet_result={"is_exoplanet": is_exoplanet, "certainty": certainty},
-                most_recent_curves=get_most_recent_curves(app.config["UPLOAD_FOLDER"], limit=10),
+                "search.html",
+                search_plot_json=json.dumps(search_fig, cls=plotly.utils.PlotlyJSONEncoder),
+                candidates=candidates,
+                data_info={"filename": f"Planet: {filename_or_id}", "n_points": len(df), "stride": stride},
                 processing_time=processing_time,
             )
+        except HTTPException:
+            raise
         except Exception as e:
-            flash(f"Error visualizing data: {str(e)}")
+            flash(f"Error searching data: {e!s}")
             return redirect(url_for("index"))
-            flash(f"Error visualizing data: {str(e)}")
+
+    def get_system_result(host):
+        """Return the cached system result of a host star, running the pipeline on a miss."""
+        key = f"system-{host}"
+        result = results_store.get(key)
+        if result is None:
+            with expensive():
+                result = run_system_pipeline(host)
+            results_store.put(key, result)
+        return result
+
+    @app.route("/system/<host>")
+    def system(host):
+        """Visualize every confirmed planet of a host star from one shared light curve.
+
+        Args:
+            host (str): TESS TIC id, or Kepler planet name or KIC id of any planet of the system.
+
+        Returns:
+            Rendered system.html template with the system light curve and one section per planet.
+        """
+        try:
+            result = get_system_result(host)
+            etag = page_etag("system", result.get("input_hash", host))
+            return not_modified(etag) or with_etag(
+                render_template(
+                    "system.html",
+                    system_plot_json=result["plots"]["light_curve"],
+                    planets=result["planets"],
+                    data_info={"filename": f"System: {host}", "n_points": result["n_points"]},
+                    processing_time=result["processing_time"],
+                ),
+                etag,
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            flash(f"Error visualizing system: {e!s}")
             return redirect(url_for("index"))
+
+    @app.route("/api/system/<host>")
+    def system_api(host):
+        """Return the per-planet summaries of a host star as JSON.
+
+        Args:
+            host (str): TESS TIC id, or Kepler planet name or KIC id of any planet of the system.
+
+        Returns:
+            JSON with the host, the number of light-curve points and, per planet, its name,
+            catalog parameters and posterior summary.
+        """
+        try:
+            result = get_system_result(host)
+        except HTTPException:
+            raise
+        except Exception as e:
+            return jsonify({"error": str(e)}), 404
+
+        etag = page_etag("system-api", result.get("input_hash", host))
+        return not_modified(etag) or with_etag(
+            jsonify(
+                {
+                    "host": result["host"],
+                    "n_points": result["n_points"],
+                    "planets": [{key: planet[key] for key in ("name", "planet_params", "summary")} for planet in result["planets"]],
+                    "processing_time": result["processing_time"],
+                    "model_version": result["model_version"],
+                }
+            ),
+            etag,
+        )
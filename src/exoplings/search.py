@@ -0,0 +1,165 @@
+import numpy as np
+import pandas as pd
+import torch
+
+from .lightcurves import clean_window
+
+
+def sliding_windows(flux, window=250, stride=25) -> np.ndarray:
+    """Return a zero-copy (n_windows, window) view of `flux` advanced by `stride` samples."""
+    return np.lib.stride_tricks.sliding_window_view(np.ascontiguousarray(flux), window)[::stride]
+
+
+@torch.no_grad()
+def grid_logratios(network, x, z_grid) -> torch.Tensor:
+    """Evaluate the 1-D network for every light curve of a batch at every point of an rₚ grid.
+
+    The embedding of each light curve is computed once and paired with every point of the
+    grid, so a batch of B light curves costs one convolutional pass and one pass of the
+    log-ratio head over B * len(z_grid) pairs.
+
+    Args:
+        network (ExoplingDetector): 1-D network in eval mode, as the model registry serves it.
+        x (torch.Tensor): (B, 250) flux batch.
+        z_grid (torch.Tensor): rₚ grid.
+
+    Returns:
+        torch.Tensor: (B, len(z_grid)) log-ratios.
+    """
+    return embedding_logratios(network, network.embed(x), z_grid)
+
+
+def embedding_logratios(network, embedding, z_grid) -> torch.Tensor:
+    """Log-ratio head of the 1-D network on every (embedding, rₚ) pair, (len(embedding), len(z_grid))."""
+    pairs = embedding.repeat_interleave(len(z_grid), dim=0)
+    z = z_grid.repeat(len(embedding)).unsqueeze(-1)
+    return network.logratios(pairs, z).logratios.reshape(len(embedding), len(z_grid))
+
+
+def score_windows(network, windows, z_grid=None, z_cutoff=0.03, batch_size=256, indices=None) -> dict:
+    """Score light-curve windows with the 1-D detector.
+
+    Only the windows of the current batch are copied out of `windows`, so it can be the
+    strided view of `sliding_windows`.
+
+    Args:
+        network (ExoplingDetector): 1-D network.
+        windows (np.ndarray): (n_windows, 250) flux windows, normalized per window here.
+        z_grid (torch.Tensor | None): rₚ grid, defaults to 200 points over the prior.
+        z_cutoff (float): rₚ below which a signal is not considered a planet.
+        batch_size (int): Windows per forward pass, see `grid_logratios`.
+        indices (np.ndarray | None): Windows to score, all of them if None.
+
+    Returns:
+        dict: "mode", "p_planet" (posterior mass above `z_cutoff`) and "density" arrays per scored window.
+    """
+    z_grid = torch.linspace(0.0, 0.3, 200) if z_grid is None else z_grid
+    below_cutoff = (z_grid < z_cutoff).numpy()
+    indices = np.arange(len(windows)) if indices is None else np.asarray(indices)
+
+    modes, p_planet, densities = [], [], []
+    for start in range(0, len(indices), batch_size):
+        batch = np.asarray(windows[indices[start : start + batch_size]], dtype=np.float32)
+        batch = batch / np.median(batch, axis=1, keepdims=True)
+
+        logratios = grid_logratios(network, torch.from_numpy(batch), z_grid)
+
+        density = torch.exp(logratios - logratios.max(dim=1, keepdim=True).values).numpy()
+        density /= density.sum(axis=1, keepdims=True)
+
+        modes.append(z_grid.numpy()[density.argmax(axis=1)])
+        p_planet.append(1.0 - density[:, below_cutoff].sum(axis=1))
+        densities.append(density)
+
+    return {
+        "mode": np.concatenate(modes),
+        "p_planet": np.concatenate(p_planet),
+        "density": np.concatenate(densities),
+    }
+
+
+def search_light_curve(network, df, window=250, stride=25, top=10, z_cutoff=0.03, batch_size=256) -> list[dict]:
+    """Slide the detector over a full light curve and rank candidate single transits.
+
+    Windows spanning a data gap (time span above 1.5 times the median) are skipped, and
+    overlapping candidates are reduced to the best one.
+
+    Args:
+        network (ExoplingDetector): 1-D network.
+        df (pd.DataFrame): Light curve with `time_btjd` and `flux` columns.
+        window (int): Samples per window, the network input length.
+        stride (int): Samples between consecutive windows.
+        top (int): Number of candidates to return.
+        z_cutoff (float): rₚ below which a signal is not considered a planet.
+        batch_size (int): Windows per forward pass.
+
+    Returns:
+        list[dict]: Candidates sorted by decreasing certainty, with "epoch", "start", "end",
+            "certainty", "mode" and "is_exoplanet" keys.
+    """
+    time = df["time_btjd"].to_numpy(dtype=np.float64)
+    flux = df["flux"].to_numpy(dtype=np.float32)
+    if len(flux) < window:
+        raise ValueError(f"Light curve has {len(flux)} points, at least {window} are needed")
+
+    starts = np.arange(0, len(flux) - window + 1, stride)
+    spans = time[starts + window - 1] - time[starts]
+    valid = spans <= 1.5 * np.median(spans)
+    starts = starts[valid]
+
+    windows = sliding_windows(flux, window, stride)
+    scores = score_windows(network, windows, z_cutoff=z_cutoff, batch_size=batch_size, indices=np.flatnonzero(valid))
+
+    candidates = []
+    taken = np.zeros(len(flux), dtype=bool)
+    for i in np.argsort(-scores["p_planet"]):
+        start = starts[i]
+        center = start + window // 2
+        # keep one candidate per transit: skip windows centered inside a better one
+        if taken[center]:
+            continue
+        taken[start : start + window] = True
+        candidates.append(
+            {
+                "epoch": float(time[center]),
+                "start": float(time[start]),
+                "end": float(time[start + window - 1]),
+                "certainty": float(scores["p_planet"][i]),
+                "mode": float(scores["mode"][i]),
+                "is_exoplanet": bool(scores["p_planet"][i] >= 0.5),
+            }
+        )
+        if len(candidates) == top:
+            break
+
+    return candidates
+
+
+def load_full_light_curve(target) -> pd.DataFrame:
+    """Load a whole light curve from an upload, a TESS TIC id or a Kepler planet name / KIC id."""
+    # imported here, the scoring functions above are used by modules the app itself imports
+    from .app import upload_store
+    from .data_processing import kepler_planet_extractor, tess_planet_extractor
+
+    target = str(target)
+    if upload_store.get(target) is not None:
+        df = _clean_upload(upload_store.load_frame(target))
+    elif target.isdigit():
+        df = tess_planet_extractor.find_full_light_curve(int(target))
+    else:
+        df = kepler_planet_extractor.find_full_light_curve(target.removeprefix("KIC").strip())
+
+    if df is None or df.empty:
+        raise ValueError(f"No light curve found for identifier: {target}")
+    return df
+
+
+def _clean_upload(df) -> pd.DataFrame:
+    """Sort an uploaded light curve in time, drop NaN fluxes and clip outliers like the catalog light curves."""
+    df = df.sort_values("time_btjd", kind="stable")
+    time = df["time_btjd"].to_numpy(dtype=np.float64)
+    flux = df["flux"].to_numpy(dtype=np.float64)
+    flux_err = df["flux_err"].to_numpy(dtype=np.float64) if "flux_err" in df else np.full_like(flux, np.nan)
+    finite = np.isfinite(time)
+    time, flux, flux_err = clean_window(time[finite], flux[finite], flux_err[finite])
+    return pd.DataFrame({"time_btjd": time, "flux": flux, "flux_err": flux_err})
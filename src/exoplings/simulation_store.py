@@ -0,0 +1,200 @@
+import json
+import os
+import pathlib
+import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import torch
+from torch.utils.data import IterableDataset, get_worker_info
+
+from .models.simulator import Simulator
+
+MANIFEST_NAME = "manifest.json"
+KEYS = ("z", "m", "x")
+
+
+def _shard_rng(seed, index):
+    """Generator of one shard, derived from the store seed so a shard is reproducible on resume."""
+    return np.random.default_rng(np.random.SeedSequence(entropy=seed, spawn_key=(index,)))
+
+
+def _simulate_shard(directory, index, n, t_len, sigma, seed, chunk_size):
+    """Worker entry point: simulate one shard into memory-mapped .npy files."""
+    directory = pathlib.Path(directory)
+    name = f"shard-{index:05d}"
+    tmp_dir = directory / f".{name}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    arrays = {
+        "z": np.lib.format.open_memmap(tmp_dir / "z.npy", mode="w+", dtype=np.float32, shape=(n, 4)),
+        "m": np.lib.format.open_memmap(tmp_dir / "m.npy", mode="w+", dtype=np.float32, shape=(n, t_len)),
+        "x": np.lib.format.open_memmap(tmp_dir / "x.npy", mode="w+", dtype=np.float32, shape=(n, t_len)),
+    }
+
+    simulator = Simulator(rand_b=True, rand_dur=True, rand_t0=True, t_len=t_len, sigma=sigma)
+    rng = _shard_rng(seed, index)
+    for start in range(0, n, chunk_size):
+        stop = min(start + chunk_size, n)
+        simulator.simulate_batch(stop - start, rng=rng, out={key: arrays[key][start:stop] for key in KEYS})
+
+    for array in arrays.values():
+        array.flush()
+    del arrays
+
+    shutil.rmtree(directory / name, ignore_errors=True)
+    os.replace(tmp_dir, directory / name)
+    return index, name, n
+
+
+class SimulationStore:
+    """Sharded, memory-mapped store of simulated (z, m, x) training samples.
+
+    Each shard is a directory with `z.npy`, `m.npy` and `x.npy`, and `manifest.json`
+    records the simulator settings, the planned shards with their sizes and the
+    completed ones.
+    """
+
+    def __init__(self, directory, t_len=250, sigma=0.0005, shard_size=100_000, seed=None):
+        self.directory = pathlib.Path(directory)
+        self.manifest_path = self.directory / MANIFEST_NAME
+
+        if self.manifest_path.is_file():
+            with open(self.manifest_path, encoding="utf-8") as f:
+                self.manifest = json.load(f)
+            if self.manifest["t_len"] != t_len or self.manifest["sigma"] != sigma:
+                raise ValueError(
+                    f"Store at {directory} was created with t_len={self.manifest['t_len']} and sigma={self.manifest['sigma']}, "
+                    f"got t_len={t_len} and sigma={sigma}"
+                )
+        else:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self.manifest = {
+                "t_len": t_len,
+                "sigma": sigma,
+                "shard_size": shard_size,
+                "seed": seed if seed is not None else int(np.random.SeedSequence().entropy % 2**63),
+                "planned": [],
+                "shards": [],
+            }
+            self._save_manifest()
+        # stores written before shards were planned only list the completed ones
+        self.manifest.setdefault("planned", [{"index": shard["index"], "n": shard["n"]} for shard in self.manifest["shards"]])
+
+    @property
+    def n_samples(self) -> int:
+        """Samples in the completed shards."""
+        return sum(shard["n"] for shard in self.manifest["shards"])
+
+    @property
+    def n_planned(self) -> int:
+        """Samples in the store once every planned shard is simulated."""
+        return sum(shard["n"] for shard in self.manifest["planned"])
+
+    def _save_manifest(self):
+        tmp_path = self.manifest_path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def generate(self, n_total, workers=None, chunk_size=10_000):
+        """Simulate shards until the store holds `n_total` samples.
+
+        Shards are planned in the manifest with their sizes before they are simulated,
+        the last one holding the remainder. Planned shards are kept, so the same call
+        resumes an interrupted run, and a larger `n_total` appends shards for exactly
+        the missing samples.
+
+        Args:
+            n_total (int): Target number of samples in the store, at least the ones already planned are simulated.
+            workers (int | None): Number of worker processes, defaults to the CPU count.
+            chunk_size (int): Samples simulated per call inside a worker, bounds its memory.
+        """
+        shard_size = self.manifest["shard_size"]
+        planned = self.manifest["planned"]
+        next_index = max((shard["index"] for shard in planned), default=-1) + 1
+        missing = n_total - self.n_planned
+        while missing > 0:
+            planned.append({"index": next_index, "n": min(shard_size, missing)})
+            next_index += 1
+            missing -= planned[-1]["n"]
+        self._save_manifest()
+
+        done = {shard["index"] for shard in self.manifest["shards"]}
+        pending = [shard for shard in planned if shard["index"] not in done]
+
+        print(f"Simulating {len(pending)} shards, {sum(shard['n'] for shard in pending)} samples ({len(done)} shards already in the store).")
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(
+                    _simulate_shard,
+                    self.directory,
+                    shard["index"],
+                    shard["n"],
+                    self.manifest["t_len"],
+                    self.manifest["sigma"],
+                    self.manifest["seed"],
+                    chunk_size,
+                )
+                for shard in pending
+            ]
+            for future in as_completed(futures):
+                index, name, n = future.result()
+                self.manifest["shards"].append({"index": index, "name": name, "n": n})
+                self.manifest["shards"].sort(key=lambda shard: shard["index"])
+                self._save_manifest()
+                print(f"Shard {name} done ({self.n_samples} samples in the store).")
+
+    def shard_paths(self) -> list[pathlib.Path]:
+        return [self.directory / shard["name"] for shard in self.manifest["shards"]]
+
+
+class ShardedDataset(IterableDataset):
+    """Stream samples from a `SimulationStore` without loading it into memory.
+
+    Shards are opened as read-only memory maps and split between DataLoader workers and,
+    when `world_size` > 1, between distributed ranks.
+
+    Args:
+        directory (str): Directory of the simulation store.
+        keys (tuple[str]): Arrays to yield for each sample.
+        shuffle (bool): Shuffle the shard order and the samples inside each shard.
+        seed (int): Seed for the shuffling, combined with the epoch.
+        rank (int): Rank of this process in distributed training.
+        world_size (int): Number of distributed processes.
+    """
+
+    def __init__(self, directory, keys=("z", "x"), shuffle=True, seed=0, rank=0, world_size=1):
+        super().__init__()
+        with open(pathlib.Path(directory) / MANIFEST_NAME, encoding="utf-8") as f:
+            manifest = json.load(f)
+        self.paths = [pathlib.Path(directory) / shard["name"] for shard in manifest["shards"]]
+        self.keys = keys
+        self.shuffle = shuffle
+        self.seed = seed
+        self.rank = rank
+        self.world_size = world_size
+        self.epoch = 0
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def __iter__(self):
+        rng = np.random.default_rng((self.seed, self.epoch))
+        paths = list(self.paths)
+        if self.shuffle:
+            rng.shuffle(paths)
+
+        worker = get_worker_info()
+        n_workers = worker.num_workers if worker else 1
+        worker_id = worker.id if worker else 0
+        paths = paths[self.rank * n_workers + worker_id :: self.world_size * n_workers]
+
+        for path in paths:
+            arrays = {key: np.load(path / f"{key}.npy", mmap_mode="r") for key in self.keys}
+            n = len(arrays[self.keys[0]])
+            order = rng.permutation(n) if self.shuffle else range(n)
+            for i in order:
+                yield {key: torch.from_numpy(np.array(arrays[key][i])) for key in self.keys}
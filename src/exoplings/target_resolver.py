@@ -0,0 +1,156 @@
+import threading
+import time
+from concurrent.futures import Future
+from typing import NamedTuple
+
+UPLOAD = "upload"
+TESS = "tess"
+KEPLER = "kepler"
+UNKNOWN = "unknown"
+
+MAX_NEGATIVE_ENTRIES = 10000  # remembered failures, the oldest are forgotten first
+
+
+class TargetNotFound(ValueError):
+    """The identifier is unknown, or the archive has no light curve for it."""
+
+
+class Target(NamedTuple):
+    """What an identifier of the web app refers to.
+
+    Attributes:
+        kind (str): One of UPLOAD, TESS, KEPLER or UNKNOWN.
+        key: Upload file name, TESS TIC id (int) or Kepler planet name, None when unknown.
+        planet_params (dict | None): Catalog parameters found while resolving a TESS or Kepler target.
+    """
+
+    kind: str
+    key: str | int | None
+    planet_params: dict | None = None
+
+
+class TargetResolver:
+    """Resolve identifiers to targets and load them at most once at a time.
+
+    Uploads are looked up in the upload index, integers in the TESS catalog and anything
+    else in the Kepler catalog, without trying each source in turn on failure. Identifiers
+    that are unknown, or whose light curve could not be found, are remembered for
+    `negative_ttl` seconds so repeated requests fail without searching the archive again,
+    other errors are not. At most `max_negative` failures are remembered.
+    Concurrent loads of the same identifier share a single call of the loader.
+
+    Args:
+        upload_store (UploadStore): Index of the uploaded light curves.
+        tess_extractor, kepler_extractor (PlanetDetailExtractor): Catalogs of the two missions.
+        negative_ttl (float): Seconds a failed lookup is remembered, 0 to disable.
+        max_negative (int): Number of failed lookups remembered at most.
+    """
+
+    def __init__(self, upload_store, tess_extractor, kepler_extractor, negative_ttl=600.0, max_negative=MAX_NEGATIVE_ENTRIES):
+        self.upload_store = upload_store
+        self.tess_extractor = tess_extractor
+        self.kepler_extractor = kepler_extractor
+        self.negative_ttl = negative_ttl
+        self.max_negative = max_negative
+        self._lock = threading.Lock()
+        self._negative = {}  # identifier -> (expiry time, error message), in expiry order
+        self._in_flight = {}  # identifier -> Future of the running load
+
+    def resolve(self, data) -> Target:
+        """Find what an identifier refers to, without downloading anything."""
+        key = str(data)
+        if self.upload_store.get(key) is not None:
+            return Target(UPLOAD, key)
+
+        try:
+            tic = int(data)
+        except (ValueError, TypeError):
+            tic = None
+        if tic is not None:
+            planet_params = self.tess_extractor.find_planet_details(tic)
+            if planet_params is not None:
+                return Target(TESS, tic, planet_params)
+
+        planet_params = self.kepler_extractor.find_planet_details(key)
+        if planet_params is not None:
+            return Target(KEPLER, key, planet_params)
+
+        return Target(UNKNOWN, None)
+
+    def load(self, data, loader):
+        """Resolve an identifier and load it with `loader`, sharing concurrent loads.
+
+        Args:
+            data (str | int): Upload file name or catalog identifier.
+            loader (Callable[[Target], Any]): Loads a resolved target, raising TargetNotFound when it has no data.
+
+        Returns:
+            The result of `loader`, the same object for every caller of a shared load.
+
+        Raises:
+            TargetNotFound: If the identifier is unknown or has no data, also while the failure is cached.
+        """
+        key = str(data)
+        with self._lock:
+            message = self._cached_failure(key)
+            if message is None:
+                future = self._in_flight.get(key)
+                leader = future is None
+                if leader:
+                    future = self._in_flight[key] = Future()
+        if message is not None:
+            raise TargetNotFound(message)
+        if not leader:
+            return future.result()
+
+        try:
+            target = self.resolve(data)
+            if target.kind == UNKNOWN:
+                raise TargetNotFound(f"No planet details found for identifier: {data}")
+            result = loader(target)
+        except TargetNotFound as e:
+            # uploads are never remembered, the index is the source of truth for them
+            if self.negative_ttl > 0 and self.upload_store.get(key) is None:
+                with self._lock:
+                    self._remember_failure(key, str(e))
+            future.set_exception(e)
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def forget(self, data=None):
+        """Drop the cached failure of one identifier, or of all identifiers if None."""
+        with self._lock:
+            if data is None:
+                self._negative.clear()
+            else:
+                self._negative.pop(str(data), None)
+
+    def _remember_failure(self, key, message):
+        """Remember a failure, purging the expired entries and the oldest beyond `max_negative`."""
+        now = time.monotonic()
+        self._negative.pop(key, None)
+        # entries share one TTL, so insertion order is expiry order and the purge stops at the first live entry
+        while self._negative:
+            oldest = next(iter(self._negative))
+            if self._negative[oldest][0] > now and len(self._negative) < self.max_negative:
+                break
+            del self._negative[oldest]
+        self._negative[key] = (now + self.negative_ttl, message)
+
+    def _cached_failure(self, key) -> str | None:
+        """Error message of a remembered failure, None if there is none or it expired."""
+        entry = self._negative.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._negative[key]
+            return None
+        return entry[1]
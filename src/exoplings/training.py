@@ -0,0 +1,341 @@
+import copy
+import json
+import os
+import pathlib
+import socket
+import time
+
+import numpy as np
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+from torch import nn
+from torch.nn.parallel import DistributedDataParallel
+from torch.utils.data import DataLoader, IterableDataset, get_worker_info
+
+from .model_registry import MODEL_FILES
+from .models.simulator import Simulator
+
+CHECKPOINT_NAME = "checkpoint.pt"
+VALIDATION_KEY = 2**32 - 1  # spawn key of the validation set, never used by a training stream
+
+
+def build_network(model):
+    """A fresh network of the kind the model registry loads, "detector" or "inferrer"."""
+    if model == "detector":
+        from .models.networks.OneDim import ExoplingDetector
+
+        return ExoplingDetector()
+    if model == "inferrer":
+        from .models.networks.MultiDim import ExoplingInferrerUltra
+
+        return ExoplingInferrerUltra()
+    raise ValueError(f"Unknown model {model!r}, expected one of {', '.join(MODEL_FILES)}")
+
+
+def simulate(simulator, n, rng, model) -> dict[str, torch.Tensor]:
+    """Simulate a batch of (z, x) pairs, z is only rp for the detector like in `pipeline`."""
+    z = simulator.sample_z_batch(n, rng)
+    x = simulator.get_noisy_batch(simulator.model_light_curves(z), rng=rng)
+    z = z[:, 0] if model == "detector" else z
+    return {"z": torch.from_numpy(z.astype(np.float32)), "x": torch.from_numpy(x)}
+
+
+class SimulatedBatches(IterableDataset):
+    """Endless stream of freshly simulated training batches.
+
+    Each DataLoader worker of each distributed rank draws from its own random stream,
+    derived from the seed, the epoch, the rank and the worker id, so no two workers
+    produce the same samples and a resumed run sees the same data as an uninterrupted one.
+    Use it with `DataLoader(batch_size=None)`, batches are simulated whole.
+
+    Args:
+        simulator (Simulator): Prior and noise model, see `Simulator.model_light_curves`.
+        batch_size (int): Samples per batch.
+        model (str): "detector" to yield rp only as z, "inferrer" for the 4 parameters.
+        seed (int): Root seed.
+        rank (int): Rank of this process in distributed training.
+    """
+
+    def __init__(self, simulator, batch_size, model, seed=0, rank=0):
+        super().__init__()
+        self.simulator = simulator
+        self.batch_size = batch_size
+        self.model = model
+        self.seed = seed
+        self.rank = rank
+        self.epoch = 0
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def __iter__(self):
+        worker = get_worker_info()
+        worker_id = worker.id if worker else 0
+        rng = np.random.default_rng(np.random.SeedSequence(entropy=self.seed, spawn_key=(self.epoch, self.rank, worker_id)))
+        while True:
+            yield simulate(self.simulator, self.batch_size, rng, self.model)
+
+
+class _Loss(nn.Module):
+    """swyft's contrastive loss as the forward pass, so DistributedDataParallel sees it."""
+
+    def __init__(self, network):
+        super().__init__()
+        self.network = network
+
+    def forward(self, batch):
+        return self.network._calc_loss(batch)
+
+
+def train(
+    model,
+    run_dir,
+    output=None,
+    epochs=50,
+    steps_per_epoch=500,
+    batch_size=256,
+    learning_rate=1e-3,
+    sigma=0.0005,
+    val_samples=10_000,
+    patience=5,
+    ranks=1,
+    workers=2,
+    threads=None,
+    precision="auto",
+    seed=0,
+    transit_table=None,
+    resume=True,
+):
+    """Train the detector or the inferrer on freshly simulated light curves.
+
+    Every rank is a process training a replica of the network on its own simulated
+    batches, gradients are averaged with DistributedDataParallel over gloo. Each epoch
+    ends with the validation loss on a fixed simulated set, the learning rate drops
+    tenfold after 3 epochs without improvement and training stops after `patience`,
+    like swyft's trainer. A checkpoint is written every epoch and the best weights are
+    written to `output` as a plain state dict, ready for `exoplings publish-model`.
+
+    Args:
+        model (str): "detector" (CNN_1D.pth) or "inferrer" (Inferrer_Ultra.pth).
+        run_dir (str): Directory of the checkpoint, a run resumes from it.
+        output (str | None): Path of the best weights, `run_dir`/<app file name> by default.
+        epochs (int): Maximum number of epochs.
+        steps_per_epoch (int): Optimizer steps per epoch and rank.
+        batch_size (int): Samples per step and rank.
+        learning_rate (float): Initial AdamW learning rate.
+        sigma (float): Noise level of the simulated light curves.
+        val_samples (int): Size of the validation set.
+        patience (int): Epochs without improvement before stopping, 0 to always run `epochs`.
+        ranks (int): Training processes.
+        workers (int): Simulation worker processes per rank.
+        threads (int | None): Torch threads per rank, by default the cores left by the workers.
+        precision (str): "bf16", "fp32" or "auto" to time both once and keep the faster.
+        seed (int): Seed of the data and of the weight initialization.
+        transit_table (str | None): Transit table to simulate from, batman otherwise.
+        resume (bool): Continue from the checkpoint in `run_dir` when there is one.
+    """
+    run_dir = pathlib.Path(run_dir)
+    run_dir.mkdir(parents=True, exist_ok=True)
+    config = {
+        "model": model,
+        "output": str(output or run_dir / MODEL_FILES[model]),
+        "epochs": epochs,
+        "steps_per_epoch": steps_per_epoch,
+        "batch_size": batch_size,
+        "learning_rate": learning_rate,
+        "sigma": sigma,
+        "val_samples": val_samples,
+        "patience": patience,
+        "ranks": ranks,
+        "workers": workers,
+        "threads": threads or max(1, (os.cpu_count() or 1) // ranks - workers),
+        "precision": precision,
+        "seed": seed,
+        "transit_table": transit_table,
+        "run_dir": str(run_dir),
+        "resume": resume,
+    }
+    build_network(model)  # fail on a bad model name before starting processes
+    os.makedirs(os.path.dirname(os.path.abspath(config["output"])), exist_ok=True)
+
+    if ranks == 1:
+        _train_rank(0, config, None)
+        return
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        init_method = f"tcp://127.0.0.1:{s.getsockname()[1]}"
+    mp.spawn(_train_rank, args=(config, init_method), nprocs=ranks, join=True)
+
+
+def _train_rank(rank, config, init_method):
+    world_size = config["ranks"]
+    if init_method is not None:
+        dist.init_process_group("gloo", init_method=init_method, rank=rank, world_size=world_size)
+    torch.set_num_threads(config["threads"])
+    torch.manual_seed(config["seed"])  # same initial weights on every rank
+    log = print if rank == 0 else lambda *args, **kwargs: None
+
+    simulator = _simulator(config)
+    network = build_network(config["model"])
+    optimizer = torch.optim.AdamW(network.parameters(), lr=config["learning_rate"])
+    scheduler = torch.optim.lr_scheduler.ReduceLROnPlateau(optimizer, factor=0.1, patience=3)
+    state = {"epoch": 0, "best_val_loss": float("inf"), "stale_epochs": 0, "samples": 0, "history": []}
+
+    checkpoint_path = pathlib.Path(config["run_dir"]) / CHECKPOINT_NAME
+    if config["resume"] and checkpoint_path.is_file():
+        checkpoint = torch.load(checkpoint_path, weights_only=False)
+        if checkpoint["config"]["model"] != config["model"] or checkpoint["config"]["sigma"] != config["sigma"]:
+            raise ValueError(f"{checkpoint_path} is a {checkpoint['config']['model']} run with sigma={checkpoint['config']['sigma']}")
+        network.load_state_dict(checkpoint["network"])
+        optimizer.load_state_dict(checkpoint["optimizer"])
+        scheduler.load_state_dict(checkpoint["scheduler"])
+        state = checkpoint["state"]
+        log(f"Resuming from epoch {state['epoch']} ({state['samples']} samples seen).")
+
+    dataset = SimulatedBatches(simulator, config["batch_size"], config["model"], seed=config["seed"], rank=rank)
+    loader_options = {"num_workers": config["workers"], "prefetch_factor": 4} if config["workers"] else {}
+    loader = DataLoader(dataset, batch_size=None, **loader_options)
+    validation = _validation_batches(simulator, config, rank, world_size)
+
+    loss_module = _Loss(network)
+    if init_method is not None:
+        loss_module = DistributedDataParallel(loss_module)
+
+    bf16 = _use_bf16(config["precision"], loss_module, network, simulate(simulator, config["batch_size"], np.random.default_rng(0), config["model"]))
+    if init_method is not None:
+        flag = torch.tensor([bf16], dtype=torch.int32)
+        dist.broadcast(flag, src=0)  # the timing of rank 0 decides for everyone
+        bf16 = bool(flag.item())
+    log(
+        f"Training the {config['model']} on {world_size} rank(s) x {config['threads']} threads, "
+        f"{config['workers']} simulation workers per rank, {'bf16' if bf16 else 'fp32'}."
+    )
+
+    while state["epoch"] < config["epochs"]:
+        dataset.set_epoch(state["epoch"])
+        network.train()
+        starting_time = time.perf_counter()
+        waiting = 0.0
+        train_loss = 0.0
+        batches = iter(loader)
+        for _ in range(config["steps_per_epoch"]):
+            wait_start = time.perf_counter()
+            batch = next(batches)
+            waiting += time.perf_counter() - wait_start
+
+            with torch.autocast("cpu", dtype=torch.bfloat16, enabled=bf16):
+                loss = loss_module(batch)
+            optimizer.zero_grad(set_to_none=True)
+            loss.backward()
+            optimizer.step()
+            train_loss += loss.item()
+        del batches  # stops the workers of this epoch
+        elapsed = time.perf_counter() - starting_time
+
+        val_loss = _validation_loss(network, validation, bf16, init_method is not None)
+        scheduler.step(val_loss)
+        n_samples = config["steps_per_epoch"] * config["batch_size"] * world_size
+        state["samples"] += n_samples
+        state["epoch"] += 1
+        state["history"].append({"epoch": state["epoch"], "train_loss": train_loss / config["steps_per_epoch"], "val_loss": val_loss})
+
+        improved = val_loss < state["best_val_loss"]
+        if improved:
+            state["best_val_loss"], state["stale_epochs"] = val_loss, 0
+        else:
+            state["stale_epochs"] += 1
+
+        log(
+            f"Epoch {state['epoch']}: train loss {train_loss / config['steps_per_epoch']:.4f}, val loss {val_loss:.4f}{' *' if improved else ''}, "
+            f"{n_samples / elapsed:,.0f} samples/s, {waiting / elapsed:.0%} waiting for data, lr {optimizer.param_groups[0]['lr']:.1e}."
+        )
+        if rank == 0:
+            if improved:
+                _atomic_save(network.state_dict(), config["output"])
+            _atomic_save(
+                {
+                    "network": network.state_dict(),
+                    "optimizer": optimizer.state_dict(),
+                    "scheduler": scheduler.state_dict(),
+                    "state": state,
+                    "config": config,
+                },
+                checkpoint_path,
+            )
+        if config["patience"] and state["stale_epochs"] >= config["patience"]:
+            log(f"No improvement for {config['patience']} epochs, stopping.")
+            break
+
+    if rank == 0:
+        # the same check `ModelRegistry.publish` does
+        build_network(config["model"]).load_state_dict(torch.load(config["output"], weights_only=True))
+        with open(pathlib.Path(config["run_dir"]) / "history.json", "w", encoding="utf-8") as f:
+            json.dump(state["history"], f, indent=2)
+        log(f"Best val loss {state['best_val_loss']:.4f}, weights in {config['output']}, publish them with `exoplings publish-model` to serve them.")
+    if init_method is not None:
+        dist.destroy_process_group()
+
+
+def _simulator(config) -> Simulator:
+    table = None
+    if config["transit_table"] and os.path.isfile(config["transit_table"]):
+        from .models.transit_table import TransitTable
+
+        table = TransitTable(config["transit_table"])
+    return Simulator(rand_b=True, rand_dur=True, rand_t0=True, t_len=250, sigma=config["sigma"], transit_table=table)
+
+
+def _validation_batches(simulator, config, rank, world_size) -> list[dict]:
+    """This rank's share of the fixed validation set, the same set on every run with the same seed."""
+    rng = np.random.default_rng(np.random.SeedSequence(entropy=config["seed"], spawn_key=(VALIDATION_KEY,)))
+    data = simulate(simulator, config["val_samples"], rng, config["model"])
+    data = {key: value[rank::world_size] for key, value in data.items()}
+    n = len(data["x"])
+    return [{key: value[start : start + config["batch_size"]] for key, value in data.items()} for start in range(0, n, config["batch_size"])]
+
+
+@torch.no_grad()
+def _validation_loss(network, batches, bf16, distributed) -> float:
+    network.eval()
+    total = torch.zeros(2, dtype=torch.float64)
+    for batch in batches:
+        with torch.autocast("cpu", dtype=torch.bfloat16, enabled=bf16):
+            loss = network._calc_loss(batch, randomized=False)
+        total += torch.tensor([loss.item() * len(batch["x"]), len(batch["x"])], dtype=torch.float64)
+    if distributed:
+        dist.all_reduce(total)
+    return float(total[0] / total[1])
+
+
+def _use_bf16(precision, loss_module, network, batch, repeat=3) -> bool:
+    """Whether to train under bfloat16 autocast, timing a few steps of both when `precision` is "auto".
+
+    bfloat16 is only faster on CPUs with native support (AVX512-BF16, AMX), elsewhere
+    it is emulated and slower than float32.
+    """
+    if precision != "auto":
+        return precision == "bf16"
+    # the timing moves the batch norm statistics, put them back afterwards
+    initial_state = copy.deepcopy(network.state_dict())
+
+    def step_time(bf16):
+        times = []
+        for _ in range(repeat + 1):  # the first step pays for the kernel selection
+            starting_time = time.perf_counter()
+            with torch.autocast("cpu", dtype=torch.bfloat16, enabled=bf16):
+                loss = loss_module(batch)
+            loss.backward()
+            times.append(time.perf_counter() - starting_time)
+        loss_module.zero_grad(set_to_none=True)
+        return min(times[1:])
+
+    bf16 = step_time(True) < 0.9 * step_time(False)
+    network.load_state_dict(initial_state)
+    return bf16
+
+
+def _atomic_save(obj, path):
+    path = str(path)
+    torch.save(obj, f"{path}.tmp")
+    os.replace(f"{path}.tmp", path)
@@ -0,0 +1,150 @@
+import time
+
+import numpy as np
+import swyft
+import torch
+import torch.nn.functional as F
+from torch import nn
+
+from .models.networks.OneDim import SpatialDropout1D
+from .search import embedding_logratios
+from .utils import summarize_posterior_1D
+
+MAX_PASSES = 64
+DEFAULT_GRID_POINTS = 200  # the head costs passes * grid points, 200 resolves rₚ to 1.5e-3 like `score_windows`
+
+
+def _dropout(x, p, generator, channels=False) -> torch.Tensor:
+    """Inverted dropout of `x` with its mask drawn from `generator`, of whole channels when `channels`."""
+    if p == 0:
+        return x
+    shape = (*x.shape[:2], *(1,) * (x.dim() - 2)) if channels else x.shape
+    keep = torch.bernoulli(torch.full(shape, 1 - p, dtype=x.dtype), generator=generator)
+    return x * keep / (1 - p)
+
+
+def mc_dropout_embed(network, x, generator) -> torch.Tensor:
+    """`ExoplingDetector.embed` with its dropout applied as in training, on a network in eval mode.
+
+    The dropout masks are drawn from `generator` and applied functionally, neither the
+    modes of the shared network nor the global random state are changed, so concurrent
+    requests on it do not affect each other. Batch norm keeps its running
+    statistics, the K replicas of one light curve would otherwise be normalized with
+    each other, and the log-ratio head stays deterministic so every pass is one smooth
+    posterior instead of independent noise at each rₚ.
+    """
+    x = x.unsqueeze(1)  # (batch, 1, 250)
+    for block in network.conv_layers:
+        for layer in block:
+            if isinstance(layer, SpatialDropout1D):
+                x = _dropout(x, layer.p, generator, channels=True)
+            elif isinstance(layer, nn.Dropout):
+                x = _dropout(x, layer.p, generator)
+            else:
+                x = layer(x)
+    features = x.view(x.size(0), -1)
+
+    # dense pipeline of `embed`
+    x = F.leaky_relu(network.fc1(features))
+    x = F.leaky_relu(network.fc2(x))
+    x = _dropout(x, network.dropout.p, generator)
+    x = network.bn2(x)
+    x = F.leaky_relu(network.fc3(x))
+    x = _dropout(x, network.dropout.p, generator)
+    x = network.bn3(x)
+    return F.leaky_relu(network.fc4(x))
+
+
+@torch.no_grad()
+def mc_dropout_logratios(network, x, z_grid, passes, seed=0) -> torch.Tensor:
+    """Log-ratios of `passes` dropout-enabled evaluations of the 1-D network on one light curve.
+
+    The light curve is replicated along the batch dimension, so the passes cost one
+    convolutional pass over a batch of `passes` and one pass of the head over
+    `passes * len(z_grid)` pairs instead of `passes` separate evaluations. The dropout
+    masks are drawn from `seed`, the same light curve always gets the same estimate.
+
+    Args:
+        network (ExoplingDetector): 1-D network in eval mode, as the model registry serves it.
+        x (np.ndarray | torch.Tensor): (250,) flux.
+        z_grid (torch.Tensor): rₚ grid.
+        passes (int): Number of dropout masks.
+        seed (int): Seed of the dropout masks.
+
+    Returns:
+        torch.Tensor: (passes, len(z_grid)) log-ratios.
+    """
+    batch = torch.as_tensor(np.asarray(x, dtype=np.float32)).unsqueeze(0).expand(passes, -1)
+    # a generator of this call only, concurrent requests do not change each other's masks
+    generator = torch.Generator().manual_seed(seed)
+    return embedding_logratios(network, mc_dropout_embed(network, batch, generator), z_grid)
+
+
+def summarize_mc_dropout(z_true, logratios, z_grid, is_exoplanet) -> dict:
+    """Spread of the posterior summary over the dropout passes.
+
+    Every pass is summarized like the deterministic posterior. The certainty is the one
+    of the deterministic verdict `is_exoplanet` in every pass, so it stays comparable when
+    some passes reach the opposite verdict, and "agreement" is the fraction that do not.
+
+    Returns:
+        dict: "passes", mean and std of "mode", "certainty" and "credible_intervals", and "agreement".
+    """
+    modes, intervals, certainties, verdicts = [], [], [], []
+    for pass_logratios in logratios:
+        # same layout as the output of trainer.infer for a single light curve
+        predictions = swyft.LogRatioSamples(logratios=pass_logratios.unsqueeze(-1), params=z_grid[:, None, None], parnames=np.array([["z[0]"]]))
+        _, _, credible_intervals, mode, certainty, verdict = summarize_posterior_1D(z_true, predictions)
+        modes.append(mode)
+        intervals.append([[float(lower), float(upper)] for lower, upper in credible_intervals])
+        certainties.append(float(certainty) if verdict == is_exoplanet else 1.0 - float(certainty))
+        verdicts.append(verdict == is_exoplanet)
+
+    intervals = np.array(intervals)
+    return {
+        "passes": len(logratios),
+        "mode": {"mean": float(np.mean(modes)), "std": float(np.std(modes))},
+        "certainty": {"mean": float(np.mean(certainties)), "std": float(np.std(certainties))},
+        "credible_intervals": {"mean": intervals.mean(axis=0).tolist(), "std": intervals.std(axis=0).tolist()},
+        "agreement": float(np.mean(verdicts)),
+    }
+
+
+def estimate_uncertainty(network, real_test, z_true, is_exoplanet, passes, grid_points=DEFAULT_GRID_POINTS, seed=0) -> dict:
+    """`summarize_mc_dropout` of `passes` dropout passes on one light curve, with its "processing_time" in ms."""
+    z_grid = torch.linspace(0.0, 0.3, grid_points)
+    starting_time = time.perf_counter()
+    logratios = mc_dropout_logratios(network, real_test, z_grid, passes, seed=seed)
+    processing_time = int((time.perf_counter() - starting_time) * 1000)
+    return {**summarize_mc_dropout(z_true, logratios, z_grid, is_exoplanet), "processing_time": processing_time}
+
+
+def benchmark(passes=(1, 2, 4, 8, 16, 32), grid_points=DEFAULT_GRID_POINTS, repeat=5, seed=0) -> dict:
+    """Time the batched dropout passes against looping over single passes on one simulated light curve.
+
+    Returns:
+        dict: Per number of passes, the mean "batched" and "looped" times in seconds and
+            "overhead", the batched time over the time of one pass.
+    """
+    from .app import model_registry, simulator
+
+    network = model_registry.active().detector
+    rng = np.random.default_rng(seed)
+    z_true = [0.1, 0.3, 0.01, 0.0]
+    real_test = (simulator.model_light_curves(np.array([z_true]))[0] + rng.normal(0.0, 0.0005, simulator.t_len)).astype(np.float32)
+    z_grid = torch.linspace(0.0, 0.3, grid_points)
+
+    def timed(run):
+        run()  # allocator and kernel warmup
+        starting_time = time.perf_counter()
+        for _ in range(repeat):
+            run()
+        return (time.perf_counter() - starting_time) / repeat
+
+    single = timed(lambda: mc_dropout_logratios(network, real_test, z_grid, 1, seed=seed))
+    results = {}
+    for n in passes:
+        batched = timed(lambda n=n: mc_dropout_logratios(network, real_test, z_grid, n, seed=seed))
+        looped = timed(lambda n=n: [mc_dropout_logratios(network, real_test, z_grid, 1, seed=seed + i) for i in range(n)])
+        results[n] = {"batched": batched, "looped": looped, "overhead": batched / single}
+    return results
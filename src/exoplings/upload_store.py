@@ -0,0 +1,230 @@
+import hashlib
+import json
+import logging
+import pathlib
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    filename TEXT PRIMARY KEY,
+    uploaded_at REAL NOT NULL,
+    size INTEGER NOT NULL,
+    content_hash TEXT NOT NULL UNIQUE,
+    n_rows INTEGER NOT NULL,
+    columns TEXT NOT NULL,
+    array_path TEXT NOT NULL,
+    ephemeris TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_uploads_uploaded_at ON uploads (uploaded_at DESC);
+"""
+# the columns the pipeline reads, other columns of an upload are not cached
+LIGHT_CURVE_COLUMNS = ("time_btjd", "flux", "flux_err")
+REQUIRED_COLUMNS = ("time_btjd", "flux")
+
+logger = logging.getLogger(__name__)
+
+
+def file_hash(path) -> str:
+    """Return the SHA-256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class UploadStore:
+    """SQLite index of the uploaded light curves.
+
+    Every upload is recorded with its upload time, size, content hash, row count and the
+    location of its parsed array, so listing, lookup and deduplication are indexed queries
+    instead of directory scans. The size of an upload is the one of its CSV file and of
+    its parsed array together.
+    """
+
+    def __init__(self, directory=".uploads", db_name="uploads.sqlite3"):
+        self.directory = pathlib.Path(directory)
+        self.arrays_dir = self.directory / ".arrays"
+        self.arrays_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.directory / db_name
+        with closing(self._connect()) as conn, conn:
+            conn.executescript(SCHEMA)
+            if "ephemeris" not in {row["name"] for row in conn.execute("PRAGMA table_info(uploads)")}:
+                conn.execute("ALTER TABLE uploads ADD COLUMN ephemeris TEXT")
+        self._evict_policy = (None, None)
+        self._evict_requested = threading.Event()
+        self._evictor = None
+        self._evictor_lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def add(self, filepath) -> tuple[dict, bool]:
+        """Parse and register a saved upload.
+
+        If a file with the same content was already uploaded, the new copy is deleted and
+        the existing record is returned instead.
+
+        Args:
+            filepath (str | Path): Path of the saved CSV file inside the upload directory.
+
+        Returns:
+            tuple[dict, bool]: The upload record and whether it was a duplicate.
+
+        Raises:
+            ValueError: The file has no time_btjd or flux column, or they are not numeric. The file is left in place.
+            Exception: Whatever pandas raises if the file cannot be parsed. The file is left in place.
+        """
+        filepath = pathlib.Path(filepath)
+        content_hash = file_hash(filepath)
+
+        existing = self._find_by_hash(content_hash)
+        if existing is not None and (self.directory / existing["filename"]).is_file():
+            filepath.unlink()
+            return existing, True
+        elif existing is not None:
+            # stale record whose file disappeared, replace it
+            self.remove(existing["filename"])
+
+        df = pd.read_csv(filepath)
+        missing = [column for column in REQUIRED_COLUMNS if column not in df.columns]
+        if missing:
+            raise ValueError(f"Missing column(s) {', '.join(missing)}, expected {', '.join(LIGHT_CURVE_COLUMNS)}.")
+        columns = [column for column in LIGHT_CURVE_COLUMNS if column in df.columns]
+        array_path = self.arrays_dir / f"{content_hash}.npy"
+        np.save(array_path, df[columns].to_numpy(dtype=np.float64))
+
+        record = {
+            "filename": filepath.name,
+            "uploaded_at": filepath.stat().st_mtime,
+            "size": filepath.stat().st_size + array_path.stat().st_size,
+            "content_hash": content_hash,
+            "n_rows": len(df),
+            "columns": json.dumps(columns),
+            "array_path": array_path.name,
+            "ephemeris": None,
+        }
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.execute(
+                    "INSERT INTO uploads (filename, uploaded_at, size, content_hash, n_rows, columns, array_path, ephemeris)"
+                    " VALUES (:filename, :uploaded_at, :size, :content_hash, :n_rows, :columns, :array_path, :ephemeris)",
+                    record,
+                )
+        except sqlite3.IntegrityError:
+            # an identical file was registered concurrently
+            existing = self._find_by_hash(content_hash)
+            filepath.unlink()
+            return existing, True
+
+        return record, False
+
+    def get(self, filename) -> dict | None:
+        """Return the record of an upload, or None if no such upload exists."""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT * FROM uploads WHERE filename = ?", (str(filename),)).fetchone()
+        return dict(row) if row else None
+
+    def load_frame(self, filename) -> pd.DataFrame:
+        """Load the parsed light curve of an upload."""
+        record = self.get(filename)
+        if record is None:
+            raise KeyError(f"Unknown upload: {filename}")
+        values = np.load(self.arrays_dir / record["array_path"], mmap_mode="r")
+        return pd.DataFrame(np.array(values), columns=json.loads(record["columns"]))
+
+    def ephemeris(self, filename) -> dict | None:
+        """Return the transit ephemeris found in an upload, None before `set_ephemeris`."""
+        record = self.get(filename)
+        return json.loads(record["ephemeris"]) if record is not None and record["ephemeris"] else None
+
+    def set_ephemeris(self, filename, ephemeris: dict):
+        """Remember the transit ephemeris found in an upload, it is removed with the upload."""
+        with closing(self._connect()) as conn, conn:
+            conn.execute("UPDATE uploads SET ephemeris = ? WHERE filename = ?", (json.dumps(ephemeris), str(filename)))
+
+    def most_recent(self, limit=10) -> list[str]:
+        """Return the file names of the most recent uploads, newest first."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT filename FROM uploads ORDER BY uploaded_at DESC LIMIT ?", (limit,)).fetchall()
+        return [row["filename"] for row in rows]
+
+    def remove(self, filename):
+        """Delete an upload, its parsed array and its record."""
+        record = self.get(filename)
+        if record is None:
+            return
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM uploads WHERE filename = ?", (record["filename"],))
+        (self.directory / record["filename"]).unlink(missing_ok=True)
+        (self.arrays_dir / record["array_path"]).unlink(missing_ok=True)
+
+    def evict(self, max_bytes=None, max_age=None) -> list[str]:
+        """Apply the retention policy.
+
+        Args:
+            max_bytes (int | None): Evict the oldest uploads until the total size is below this.
+            max_age (float | None): Evict uploads older than this many seconds.
+
+        Returns:
+            list[str]: File names of the evicted uploads.
+        """
+        evicted = []
+        with closing(self._connect()) as conn:
+            if max_age is not None:
+                rows = conn.execute("SELECT filename FROM uploads WHERE uploaded_at < ?", (time.time() - max_age,)).fetchall()
+                evicted.extend(row["filename"] for row in rows)
+            if max_bytes is not None:
+                total = 0
+                for row in conn.execute("SELECT filename, size FROM uploads ORDER BY uploaded_at DESC"):
+                    total += row["size"]
+                    if total > max_bytes and row["filename"] not in evicted:
+                        evicted.append(row["filename"])
+
+        for filename in evicted:
+            self.remove(filename)
+        return evicted
+
+    def evict_in_background(self, max_bytes=None, max_age=None):
+        """Run `evict` in a daemon thread instead of the caller's.
+
+        Calls made while an eviction runs are folded into a single next run with the latest policy.
+        """
+        self._evict_policy = (max_bytes, max_age)
+        self._evict_requested.set()
+        with self._evictor_lock:
+            if self._evictor is None:
+                self._evictor = threading.Thread(target=self._evict_loop, name="upload-evictor", daemon=True)
+                self._evictor.start()
+
+    def _evict_loop(self):
+        while True:
+            self._evict_requested.wait()
+            self._evict_requested.clear()
+            max_bytes, max_age = self._evict_policy
+            try:
+                self.evict(max_bytes=max_bytes, max_age=max_age)
+            except Exception:
+                logger.exception("Upload eviction failed")
+
+    def sync(self):
+        """Index CSV files present in the upload directory but missing from the store."""
+        for path in self.directory.glob("*.csv"):
+            if path.is_file() and self.get(path.name) is None:
+                try:
+                    self.add(path)
+                except Exception as e:
+                    logger.warning("Skipping unreadable upload %s: %s", path.name, e)
+
+    def _find_by_hash(self, content_hash) -> dict | None:
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT * FROM uploads WHERE content_hash = ?", (content_hash,)).fetchone()
+        return dict(row) if row else None
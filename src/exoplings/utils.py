@@ -1,7 +1,6 @@
-import pathlib
-
 import numpy as np
 import torch
+from scipy.interpolate import CubicSpline
 
 
 def allowed_file(filename):
@@ -11,20 +10,6 @@ def allowed_file(filename):
     }
 
 
-def get_most_recent_curves(directory=".uploads", limit=10):
-    """Retrieve the most recent light curve files from the upload directory.
-
-    Args:
-        directory (str): The directory to search for uploaded files.
-        limit (int): The maximum number of recent files to return.
-    Returns:
-        List[str]: List of the most recent file names.
-    """
-    p = pathlib.Path(directory)
-    files = sorted(p.glob("*"), key=lambda x: x.stat().st_mtime, reverse=True)
-    return [f.name for f in files[:limit] if f.is_file()]
-
-
 def compute_credible_intervals(z_values, density, levels=[0.682, 0.954, 0.997]):
     """Compute highest density intervals (HDIs) for given credible levels."""
     # Flatten and sort by density descending
@@ -60,3 +45,47 @@ def compute_cdf(density):
     cdf = np.cumsum(density) / torch.sum(density)
 
     return cdf
+
+
+def summarize_posterior_1D(z_true, predictions, sq=False, z_cutoff=0.03, c_cutoff=0.5):
+    """Summarize the 1-D rₚ posterior without building any figure.
+
+    Args:
+        z_true (list): Known parameters, a known impact parameter marks Kepler data.
+        predictions (swyft.LogRatioSamples): 1-D network output on an rₚ grid.
+        sq (bool): Summarize rₚ squared instead of rₚ.
+        z_cutoff (float): rₚ below which a signal is not considered a planet.
+        c_cutoff (float): Posterior mass below `z_cutoff` above which the verdict is "no planet".
+
+    Returns:
+        tuple: Sorted rₚ values, their unnormalized density, the credible intervals,
+            the mode, the certainty of the verdict and the verdict itself.
+    """
+    # Extract posterior samples and density (and sort)
+    z_values = predictions.params.T[0][0]
+    z_values, indices = torch.sort(z_values)
+    density = np.exp(predictions.logratios.T[0])[indices]
+
+    if sq:
+        z_values = z_values**2
+
+    credible_intervals = compute_credible_intervals(z_values, density)
+
+    mode = z_values[torch.argmax(density)].item()
+
+    # compute certainty and is_exoplanet
+    cdf = compute_cdf(density)
+    cs = CubicSpline(z_values, cdf)
+
+    if z_true[1]:
+        z_cutoff = 0.008  # for Kepler data
+
+    certainty = cs(z_cutoff)
+
+    if certainty >= c_cutoff:
+        is_exoplanet = False
+    else:
+        is_exoplanet = True
+        certainty = 1 - certainty
+
+    return z_values, density, credible_intervals, mode, certainty, is_exoplanet
@@ -0,0 +1,113 @@
+import logging
+import threading
+import time
+
+import pandas as pd
+from flask import render_template
+
+from .data_processing import kepler_planet_extractor, tess_planet_extractor
+from .pipeline import time_stages
+
+# Known parameters for the bundled sample, so the posterior light curve is warmed up as well
+WARMUP_PARAMS = {"z": 0.1, "impact": 0.3, "duration": 0.1}
+
+RETRY_DELAY = 5.0  # seconds before the first retry of a failed warmup, doubled after every failure
+MAX_RETRY_DELAY = 300.0
+
+logger = logging.getLogger(__name__)
+
+
+class Warmup:
+    """Readiness of a worker: the catalogs are loaded and a synthetic request ran end to end.
+
+    The first run of the pipeline pays for torch kernel initialization, the Lightning
+    trainer setup in `trainer.infer`, the simulator graph and the first touch of both
+    checkpoints. The warmup runs the bundled sample through every stage and renders the
+    result page twice, in a background thread, and logs the cold and warm timings. A failed
+    warmup is retried with exponential backoff until it succeeds.
+
+    Args:
+        app (Flask): Application whose templates are rendered.
+        sample_path (str | None): CSV light curve to run, None to only wait for the catalogs.
+        retry_delay (float): Seconds before the first retry, doubled after every failure.
+        max_retry_delay (float): Upper bound of the delay between retries.
+    """
+
+    def __init__(self, app, sample_path, retry_delay=RETRY_DELAY, max_retry_delay=MAX_RETRY_DELAY):
+        self.app = app
+        self.sample_path = sample_path
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.state = "pending"  # "running", "ready" or "failed", the latter until the next attempt
+        self.error = None
+        self.failures = 0
+        self.timings = {}
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the warmup in a daemon thread, once."""
+        with self._lock:
+            if self.state != "pending":
+                return
+            self.state = "running"
+        threading.Thread(target=self._run_until_ready, name="warmup", daemon=True).start()
+
+    def _run_until_ready(self):
+        while not self.run():
+            delay = min(self.retry_delay * 2 ** (self.failures - 1), self.max_retry_delay)
+            logger.info("Retrying the warmup in %.0f s.", delay)
+            time.sleep(delay)
+
+    def run(self) -> bool:
+        """Run the warmup once.
+
+        Returns:
+            bool: Whether the worker is ready.
+        """
+        try:
+            if tess_planet_extractor.df.empty or kepler_planet_extractor.df.empty:
+                raise RuntimeError("Planet catalogs are empty")
+            if self.sample_path:
+                df = pd.read_csv(self.sample_path)
+                for run in ("cold", "warm"):
+                    self.timings[run] = self._time_request(df)
+                logger.info("Warmup done: %s cold, %s warm.", _format(self.timings["cold"]), _format(self.timings["warm"]))
+        except Exception as e:
+            self.error = str(e)
+            self.failures += 1
+            self.state = "failed"
+            logger.exception("Warmup failed")
+            return False
+        self.error = None
+        self.state = "ready"
+        return True
+
+    def _time_request(self, df) -> dict:
+        starting_time = time.perf_counter()
+        result, timings = time_stages(df, WARMUP_PARAMS, label="warmup")
+
+        render_start = time.perf_counter()
+        with self.app.test_request_context():
+            render_template(
+                "visualize.html",
+                light_curve_plot_json=result["plots"]["light_curve"],
+                posterior_plot_json=result["plots"]["posterior"],
+                posterior_lc_plot_json=result["plots"]["posterior_lc"],
+                corner_plot_json=result["plots"]["corner"],
+                data_info={"filename": "Planet: warmup", "target": "warmup", "is_upload": True},
+                exoplanet_result={"is_exoplanet": result["summary"]["is_exoplanet"], "certainty": result["summary"]["certainty"]},
+                most_recent_curves=[],
+                processing_time=result["processing_time"],
+            )
+        timings["render"] = (time.perf_counter() - render_start) * 1000
+        timings["total"] = (time.perf_counter() - starting_time) * 1000
+        return timings
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+
+def _format(timings) -> str:
+    stages = ", ".join(f"{stage} {ms:.0f}" for stage, ms in timings.items() if stage != "total")
+    return f"{timings['total']:.0f} ms ({stages})"
@@ -0,0 +1,19 @@
+import numpy as np
+import pytest
+
+from exoplings.fake_archive import CADENCE, write_fixture
+
+
+@pytest.fixture
+def light_curve_file(tmp_path):
+    """Factory writing a small FITS light curve, `flux_level` times a flat flux with 1e-3 errors."""
+
+    def write(name="target.fits", start=0.0, n=200, flux_level=1000.0, mission="TESS", quality=None, time=None):
+        time = start + np.arange(n) * CADENCE if time is None else np.asarray(time, dtype=np.float64)
+        flux = np.full(len(time), flux_level, dtype=np.float32)
+        flux_err = np.full(len(time), 1e-3 * flux_level, dtype=np.float32)
+        path = tmp_path / name
+        write_fixture(path, time, flux, flux_err, mission, quality=quality)
+        return str(path)
+
+    return write
@@ -0,0 +1,56 @@
+import argparse
+import ast
+import inspect
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from exoplings import cli
+from exoplings.fake_archive import synthesize_fixtures
+
+
+def commands() -> dict:
+    parser = cli.build_parser()
+    subparsers = next(action for action in parser._actions if isinstance(action, argparse._SubParsersAction))
+    return {name: subparser.get_default("func") for name, subparser in subparsers.choices.items()}
+
+
+def imports_of(func) -> list[str]:
+    """The import statements of a function, relative ones made absolute."""
+    statements = []
+    for node in ast.walk(ast.parse(textwrap.dedent(inspect.getsource(func)))):
+        if isinstance(node, ast.ImportFrom) and node.level:
+            node = ast.ImportFrom(module=".".join(filter(None, ["exoplings", node.module])), names=node.names, level=0)
+        if isinstance(node, ast.Import | ast.ImportFrom):
+            statements.append(ast.unparse(node))
+    return statements
+
+
+def run_fresh(code, cwd):
+    """Run code in a new interpreter, outside the repository like an installed command."""
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path), "MODEL_WATCH_INTERVAL": "0", "WARMUP_SAMPLE": ""}
+    return subprocess.run([sys.executable, "-c", code], cwd=cwd, env=env, capture_output=True, text=True, timeout=600, check=False)
+
+
+def test_help_does_not_build_the_app(tmp_path):
+    code = "import sys\nfrom exoplings import cli\ntry:\n    cli.main(['--help'])\nexcept SystemExit:\n    pass\nassert 'exoplings.app' not in sys.modules"
+    result = run_fresh(code, tmp_path)
+
+    assert result.returncode == 0, result.stderr
+
+
+@pytest.mark.parametrize("name", sorted(commands()))
+def test_command_imports(name, tmp_path):
+    # every command imports its modules in a fresh interpreter, so import cycles are not hidden by the test process
+    result = run_fresh("\n".join(imports_of(commands()[name])) or "pass", tmp_path)
+
+    assert result.returncode == 0, result.stderr
+
+
+def test_synthesize_fixtures_imports(tmp_path):
+    result = run_fresh("\n".join(imports_of(synthesize_fixtures)), tmp_path)
+
+    assert result.returncode == 0, result.stderr
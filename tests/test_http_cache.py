@@ -0,0 +1,46 @@
+import os
+
+import pytest
+from flask import Flask
+
+from exoplings.http_cache import init_static_caching, static_fingerprint
+
+
+@pytest.fixture
+def client(tmp_path):
+    static_folder = tmp_path / "static"
+    static_folder.mkdir()
+    (static_folder / "style.css").write_text("body { color: black; }")
+    (tmp_path / "secret.txt").write_text("not static")
+    app = Flask(__name__, static_folder=str(static_folder))
+    init_static_caching(app)
+    return app.test_client()
+
+
+def test_static_fingerprint_only_hashes_files_inside_the_folder(tmp_path):
+    static_folder = tmp_path / "static"
+    static_folder.mkdir()
+    (static_folder / "app.js").write_text("run()")
+    (tmp_path / "secret.txt").write_text("not static")
+
+    assert static_fingerprint(str(static_folder), "app.js") is not None
+    assert static_fingerprint(str(static_folder), "../secret.txt") is None
+    assert static_fingerprint(str(static_folder), ".") is None
+
+
+@pytest.mark.skipif(not os.path.exists("/dev/zero"), reason="needs /dev/zero")
+def test_static_fingerprint_ignores_devices():
+    assert static_fingerprint("/dev", "zero") is None
+
+
+def test_static_serves_fingerprinted_files_as_immutable(client):
+    fingerprint = static_fingerprint(client.application.static_folder, "style.css")
+    response = client.get(f"/static/style.css?v={fingerprint}")
+
+    assert response.status_code == 200
+    assert response.cache_control.immutable
+
+
+def test_static_rejects_paths_leaving_the_folder(client):
+    assert client.get("/static/..%2fsecret.txt?v=x").status_code == 404
+    assert client.get("/static/..%2f..%2f..%2f..%2f..%2fdev%2fzero?v=x").status_code == 404
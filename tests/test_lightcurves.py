@@ -0,0 +1,117 @@
+import numpy as np
+import pytest
+
+from exoplings.fake_archive import CADENCE
+from exoplings.lightcurves import MIN_COVERAGE, extract_transit_window, read_fits_light_curve, read_fits_light_curves, resample_to_grid
+
+ATTITUDE_TWEAK = 1  # in the default bitmask of both missions
+SCATTERED_LIGHT = 16  # bit 5, in the default TESS bitmask only
+
+
+def test_read_fits_light_curve_drops_flagged_cadences(light_curve_file):
+    quality = np.zeros(200, dtype=np.int32)
+    quality[[10, 20, 30]] = ATTITUDE_TWEAK
+    time, flux, flux_err = read_fits_light_curve(light_curve_file(quality=quality))
+
+    assert len(time) == len(flux) == len(flux_err) == 197
+    assert not np.isin(np.array([10, 20, 30]) * CADENCE, time).any()
+
+
+def test_read_fits_light_curve_uses_the_bitmask_of_its_mission(light_curve_file):
+    quality = np.zeros(200, dtype=np.int32)
+    quality[:50] = SCATTERED_LIGHT
+
+    tess_time, _, _ = read_fits_light_curve(light_curve_file("tess.fits", mission="TESS", quality=quality))
+    kepler_time, _, _ = read_fits_light_curve(light_curve_file("kepler.fits", mission="Kepler", quality=quality))
+
+    assert len(tess_time) == 150
+    assert len(kepler_time) == 200
+
+
+def test_read_fits_light_curve_drops_missing_timestamps(light_curve_file):
+    time = np.arange(200) * CADENCE
+    time[5] = np.nan
+    read_time, _, _ = read_fits_light_curve(light_curve_file(time=time))
+
+    assert len(read_time) == 199
+    assert np.isfinite(read_time).all()
+
+
+def test_read_fits_light_curve_normalizes_by_the_median_flux(light_curve_file):
+    _, flux, flux_err = read_fits_light_curve(light_curve_file(flux_level=5000.0))
+
+    np.testing.assert_allclose(flux, 1.0)
+    np.testing.assert_allclose(flux_err, 1e-3, rtol=1e-6)
+
+
+def test_read_fits_light_curves_normalizes_each_file(light_curve_file):
+    # the later sector is read first, the result is still in time order
+    paths = [light_curve_file("sector2.fits", start=30.0, flux_level=200.0), light_curve_file("sector1.fits", start=0.0, flux_level=8000.0)]
+    time, flux, flux_err = read_fits_light_curves(paths)
+
+    assert len(time) == 400
+    assert np.all(np.diff(time) > 0)
+    np.testing.assert_allclose(flux, 1.0)
+    np.testing.assert_allclose(flux_err, 1e-3, rtol=1e-6)
+
+
+def test_resample_to_grid_covers_a_continuous_light_curve():
+    time = np.linspace(-1.0, 1.0, 2000)
+    df, coverage = resample_to_grid(time, np.ones_like(time), np.full_like(time, 1e-3), center=0.0, span=1.0, points=250)
+
+    assert len(df) == 250
+    assert coverage == 1.0
+    np.testing.assert_allclose(df["time_btjd"].iloc[[0, -1]], [-0.5, 0.5])
+    np.testing.assert_allclose(df["flux"], 1.0)
+
+
+def test_resample_to_grid_interpolates_gaps_and_reports_them():
+    time = np.linspace(-1.0, 1.0, 2000)
+    kept = (time < -0.1) | (time > 0.1)
+    flux = np.where(time < 0, 1.0, 2.0)
+    df, coverage = resample_to_grid(time[kept], flux[kept], np.full(kept.sum(), 1e-3), center=0.0, span=1.0, points=250)
+
+    assert coverage == pytest.approx(0.8, abs=0.01)
+    assert df["flux"].notna().all()
+    # the gap is interpolated between the fluxes on both sides
+    gap = df["flux"][df["time_btjd"].abs() < 0.09]
+    assert gap.is_monotonic_increasing
+    assert (gap > 1.0).all() and (gap < 2.0).all()
+
+
+def test_resample_to_grid_weights_by_inverse_variance():
+    # two cadences exactly filling the first of two bins
+    time = np.array([-0.75, -0.25])
+    df, coverage = resample_to_grid(time, np.array([1.0, 2.0]), np.array([1e-3, 2e-3]), center=0.0, span=1.0, points=2, exposure=np.array([0.5, 0.5]))
+
+    assert coverage == 0.5
+    assert df["flux"].iloc[0] == pytest.approx((1.0 / 1e-6 + 2.0 / 4e-6) / (1 / 1e-6 + 1 / 4e-6))
+
+
+def test_extract_transit_window_skips_epochs_in_gaps():
+    period, t0, duration = 2.0, 1.0, 0.1
+    time = np.arange(0.0, 10.0, CADENCE)
+    # the epochs at 3 and 5 lose most of their window to data gaps
+    gap = (np.abs(time - 3.0) < 0.08) | (np.abs(time - 5.0) < 0.08)
+    time = time[~gap]
+    flux = np.ones_like(time)
+    df = extract_transit_window(time, flux, np.full_like(time, 1e-3), period, t0, duration)
+
+    assert len(df) == 250
+    center = df["time_btjd"].mean()
+    assert np.isclose(center % period, t0, atol=0.01)
+    assert not np.isclose(center, 3.0, atol=0.01) and not np.isclose(center, 5.0, atol=0.01)
+
+
+def test_extract_transit_window_requires_min_coverage():
+    period, t0, duration = 2.0, 1.0, 0.1
+    time = np.arange(0.0, 10.0, CADENCE)
+    # every epoch keeps only the first 60% of its window
+    phase = (time - t0 + 0.5 * period) % period - 0.5 * period
+    time = time[(phase < 0.02) | (phase > 0.1)]
+    flux_err = np.full_like(time, 1e-3)
+
+    with pytest.raises(RuntimeError):
+        extract_transit_window(time, np.ones_like(time), flux_err, period, t0, duration, min_coverage=MIN_COVERAGE)
+    df = extract_transit_window(time, np.ones_like(time), flux_err, period, t0, duration, min_coverage=0.5)
+    assert df["flux"].notna().all()
@@ -0,0 +1,86 @@
+import os
+
+import lightkurve as lk
+import numpy as np
+import pandas as pd
+import pytest
+
+from exoplings import PlanetDetailExtractor as extractor_module
+from exoplings.fake_archive import CADENCE
+from exoplings.lightcurves import extract_transit_window
+from exoplings.PlanetDetailExtractor import PlanetDetailExtractor
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+# small light curves in the archive layouts, one planet each with flagged cadences, missing values and an outlier
+FIXTURES = {
+    "tess": (["tess_s0001_0000000100000001_lc.fits", "tess_s0002_0000000100000001_lc.fits"], "100000001", (1.7, 1.2, 0.08)),
+    "kepler": (["kplr010000001-2009131110544_slc.fits"], "10000001", (1.3, 131.9, 0.07)),
+}
+
+
+class LocalSearchResult:
+    """The parts of a lightkurve search result both readers use, served from local files."""
+
+    def __init__(self, paths):
+        self.paths = paths
+
+    def __len__(self):
+        return len(self.paths)
+
+    def download_all(self):
+        return lk.LightCurveCollection([lk.read(path) for path in self.paths])
+
+
+@pytest.fixture(params=sorted(FIXTURES))
+def archive_fixture(request, monkeypatch):
+    names, host, ephemeris = FIXTURES[request.param]
+    search_result = LocalSearchResult([os.path.join(DATA_DIR, name) for name in names])
+    monkeypatch.setattr(extractor_module, "download_light_curve_files", lambda result: result.paths)
+    extractor = PlanetDetailExtractor(request.param)
+    monkeypatch.setattr(extractor, "_search", lambda target, author, cadence=None: search_result)
+    return extractor, search_result, host, ephemeris
+
+
+def assert_frames_match(fits_df, lightkurve_df):
+    assert list(fits_df.columns) == list(lightkurve_df.columns) == ["time_btjd", "flux", "flux_err"]
+    assert len(fits_df) == len(lightkurve_df)
+    for column in fits_df.columns:
+        np.testing.assert_allclose(fits_df[column], lightkurve_df[column], rtol=1e-6)
+
+
+def test_fits_reader_matches_lightkurve_on_the_full_light_curve(archive_fixture):
+    extractor, _, host, _ = archive_fixture
+
+    fits_df = extractor.find_full_light_curve(host, reader="fits")
+    assert_frames_match(fits_df, extractor.find_full_light_curve(host, reader="lightkurve"))
+    # the flagged cadences, missing values and the outlier are gone
+    assert fits_df["flux"].notna().all()
+    assert fits_df["flux"].max() < 1.01
+
+
+def test_fits_reader_matches_lightkurve_on_the_transit_window(archive_fixture):
+    extractor, search_result, _, (period, t0, duration) = archive_fixture
+
+    windows = []
+    for reader in ("fits", "lightkurve"):
+        time, flux, flux_err, clean = extractor._read_light_curves(search_result, reader)
+        windows.append(extract_transit_window(time, flux, flux_err, period, t0, duration, clean=clean))
+    assert_frames_match(*windows)
+    assert len(windows[0]) == 250
+
+
+def test_find_system_data_skips_planets_without_a_usable_transit(monkeypatch):
+    extractor = PlanetDetailExtractor("tess")
+    time = np.arange(0.0, 10.0, CADENCE)
+    # every transit of the second planet falls into a data gap
+    time = time[np.abs((time - 1.5) % 4.0 - 2.0) > 0.2]
+    df = pd.DataFrame({"time_btjd": time, "flux": np.ones_like(time), "flux_err": np.full_like(time, 1e-3)})
+    monkeypatch.setattr(extractor, "find_full_light_curve", lambda host, reader="fits": df)
+    planets = [{"name": "b", "per": 2.0, "t0": 1.0, "duration": 0.1}, {"name": "c", "per": 4.0, "t0": 3.5, "duration": 0.1}]
+
+    full, windows = extractor.find_system_data(1, planets)
+
+    assert full is df
+    assert len(windows) == 2
+    assert len(windows[0]) == 250
+    assert windows[1] is None
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+import torch
+
+from exoplings.models.networks.OneDim import ExoplingDetector
+from exoplings.search import _clean_upload, score_windows, search_light_curve, sliding_windows
+
+
+@pytest.fixture(scope="module")
+def network():
+    torch.manual_seed(0)
+    return ExoplingDetector(input_length=250).eval()
+
+
+def test_sliding_windows_is_a_view():
+    flux = np.arange(1000, dtype=np.float32)
+    windows = sliding_windows(flux, 250, 25)
+
+    assert windows.shape == (31, 250)
+    assert np.shares_memory(windows, flux)
+    assert windows[2, 0] == 50
+
+
+def test_score_windows_scores_the_given_windows(network):
+    flux = np.random.default_rng(0).normal(1.0, 1e-3, 2000).astype(np.float32)
+    windows = sliding_windows(flux, 250, 25)
+    indices = np.array([0, 3, 40])
+
+    subset = score_windows(network, windows, indices=indices, batch_size=2)
+    everything = score_windows(network, windows)
+
+    assert len(subset["p_planet"]) == 3
+    np.testing.assert_allclose(subset["p_planet"], everything["p_planet"][indices], rtol=1e-5)
+
+
+def test_search_light_curve_skips_windows_over_gaps(network):
+    time = np.concatenate([np.arange(1000), np.arange(1000) + 5000]) * 0.002
+    flux = np.random.default_rng(0).normal(1.0, 1e-3, 2000).astype(np.float32)
+    candidates = search_light_curve(network, pd.DataFrame({"time_btjd": time, "flux": flux}), top=100)
+
+    assert candidates
+    assert all(candidate["end"] - candidate["start"] < 1.0 for candidate in candidates)
+
+
+def test_clean_upload_sorts_and_drops_nans():
+    rng = np.random.default_rng(0)
+    time = rng.permutation(300).astype(np.float64)
+    flux = rng.normal(1.0, 1e-3, 300)
+    flux[[5, 17]] = np.nan
+    df = _clean_upload(pd.DataFrame({"time_btjd": time, "flux": flux}))
+
+    assert len(df) == 298
+    assert df["time_btjd"].is_monotonic_increasing
+    assert df["flux"].notna().all()
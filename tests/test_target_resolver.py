@@ -0,0 +1,79 @@
+import pytest
+
+from exoplings.target_resolver import KEPLER, TargetNotFound, TargetResolver
+
+
+class Catalog:
+    def __init__(self, known=()):
+        self.known = set(known)
+
+    def find_planet_details(self, key):
+        return {"per": 1.0} if str(key) in self.known else None
+
+
+class Uploads:
+    def get(self, key):
+        return None
+
+
+def resolver(**kwargs):
+    return TargetResolver(Uploads(), Catalog(), Catalog(["Kepler-1 b", "Kepler-2 b"]), **kwargs)
+
+
+def missing(target):
+    raise TargetNotFound("no data")
+
+
+def test_only_missing_targets_are_remembered():
+    targets = resolver()
+    calls = []
+
+    def failing(target):
+        calls.append(target)
+        raise ValueError("bad light curve")
+
+    # other errors are retried on the next request
+    for _ in range(2):
+        with pytest.raises(ValueError, match="bad light curve"):
+            targets.load("Kepler-1 b", failing)
+    assert len(calls) == 2
+
+    def counted_missing(target):
+        calls.append(target)
+        missing(target)
+
+    for _ in range(2):
+        with pytest.raises(TargetNotFound, match="no data"):
+            targets.load("Kepler-2 b", counted_missing)
+    assert len(calls) == 3
+
+
+def test_unknown_identifiers_are_remembered():
+    targets = resolver()
+
+    with pytest.raises(TargetNotFound):
+        targets.load("nowhere", lambda target: target)
+    with pytest.raises(TargetNotFound, match="nowhere"):
+        targets.load("nowhere", lambda target: pytest.fail("looked up again"))
+
+
+def test_remembered_failures_are_bounded():
+    targets = resolver(max_negative=3)
+    for i in range(10):
+        with pytest.raises(TargetNotFound):
+            targets.load(f"unknown-{i}", lambda target: target)
+
+    assert list(targets._negative) == ["unknown-7", "unknown-8", "unknown-9"]
+    assert targets.load("Kepler-1 b", lambda target: target.kind) == KEPLER
+
+
+def test_expired_failures_are_searched_again(monkeypatch):
+    targets = resolver(negative_ttl=10.0)
+    now = [100.0]
+    monkeypatch.setattr("exoplings.target_resolver.time.monotonic", lambda: now[0])
+    with pytest.raises(TargetNotFound):
+        targets.load("Kepler-1 b", missing)
+
+    now[0] += 11.0
+    assert targets.load("Kepler-1 b", lambda target: target.kind) == KEPLER
+    assert targets._negative == {}
@@ -0,0 +1,48 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+import torch
+
+from exoplings.models.networks.OneDim import ExoplingDetector
+from exoplings.uncertainty import mc_dropout_logratios
+
+
+@pytest.fixture(scope="module")
+def network():
+    torch.manual_seed(0)
+    return ExoplingDetector(input_length=250).eval()
+
+
+@pytest.fixture(scope="module")
+def light_curve():
+    return np.random.default_rng(0).normal(1.0, 1e-3, 250).astype(np.float32)
+
+
+def test_mc_dropout_masks_follow_the_seed(network, light_curve):
+    z_grid = torch.linspace(0.0, 0.3, 20)
+    first = mc_dropout_logratios(network, light_curve, z_grid, 4, seed=1)
+
+    assert torch.equal(first, mc_dropout_logratios(network, light_curve, z_grid, 4, seed=1))
+    assert not torch.equal(first, mc_dropout_logratios(network, light_curve, z_grid, 4, seed=2))
+    # the passes differ from each other
+    assert not torch.equal(first[0], first[1])
+
+
+def test_mc_dropout_leaves_the_network_and_global_random_state_alone(network, light_curve):
+    z_grid = torch.linspace(0.0, 0.3, 20)
+    state = torch.random.get_rng_state()
+    mc_dropout_logratios(network, light_curve, z_grid, 4, seed=1)
+
+    assert torch.equal(torch.random.get_rng_state(), state)
+    assert not any(module.training for module in network.modules())
+
+
+def test_mc_dropout_is_deterministic_across_threads(network, light_curve):
+    z_grid = torch.linspace(0.0, 0.3, 20)
+    expected = {seed: mc_dropout_logratios(network, light_curve, z_grid, 4, seed=seed) for seed in range(4)}
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda seed: (seed, mc_dropout_logratios(network, light_curve, z_grid, 4, seed=seed)), list(range(4)) * 8))
+
+    assert all(torch.equal(logratios, expected[seed]) for seed, logratios in results)
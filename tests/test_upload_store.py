@@ -0,0 +1,67 @@
+import time
+
+import pytest
+
+from exoplings.upload_store import UploadStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return UploadStore(tmp_path)
+
+
+def write_csv(store, name, text):
+    path = store.directory / name
+    path.write_text(text)
+    return path
+
+
+def test_add_caches_only_the_light_curve_columns(store):
+    path = write_csv(store, "labelled.csv", "time_btjd,flux,flux_err,label\n1.0,1.0,0.1,a\n2.0,0.9,0.1,b\n")
+    record, duplicate = store.add(path)
+
+    assert not duplicate
+    assert record["n_rows"] == 2
+    df = store.load_frame("labelled.csv")
+    assert list(df.columns) == ["time_btjd", "flux", "flux_err"]
+    assert df["flux"].tolist() == [1.0, 0.9]
+
+
+def test_add_rejects_uploads_without_time_or_flux(store):
+    path = write_csv(store, "other.csv", "t,f\n1.0,1.0\n")
+
+    with pytest.raises(ValueError, match="time_btjd"):
+        store.add(path)
+    assert store.get("other.csv") is None
+
+
+def test_evict_counts_the_cached_arrays(store):
+    for i in range(3):
+        store.add(write_csv(store, f"{i}.csv", f"time_btjd,flux\n{i}.0,1.0\n"))
+    sizes = [store.get(f"{i}.csv")["size"] for i in range(3)]
+    csv_sizes = [(store.directory / f"{i}.csv").stat().st_size for i in range(3)]
+    assert all(size > csv_size for size, csv_size in zip(sizes, csv_sizes))
+
+    # the CSV files alone fit, with their arrays only the newest upload does
+    evicted = store.evict(max_bytes=sum(csv_sizes) + sizes[2] - csv_sizes[2])
+    assert len(evicted) == 2
+    assert len(store.most_recent()) == 1
+
+
+def test_evict_in_background(store):
+    store.add(write_csv(store, "old.csv", "time_btjd,flux\n1.0,1.0\n"))
+    store.evict_in_background(max_bytes=0)
+
+    deadline = time.monotonic() + 5
+    while store.most_recent() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert store.most_recent() == []
+
+
+def test_ephemeris_is_stored_with_the_upload(store):
+    store.add(write_csv(store, "long.csv", "time_btjd,flux\n1.0,1.0\n"))
+    assert store.ephemeris("long.csv") is None
+
+    ephemeris = {"period": 3.2, "t0": 1.5, "duration": 0.1, "depth": 0.01}
+    store.set_ephemeris("long.csv", ephemeris)
+    assert UploadStore(store.directory).ephemeris("long.csv") == ephemeris
@@ -0,0 +1,31 @@
+import os
+import time
+
+from exoplings import app as app_module  # the app first, the warmup imports its pipeline through it
+from exoplings.warmup import Warmup
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_default_sample_does_not_depend_on_the_working_directory():
+    assert os.path.isfile(app_module.app.config["WARMUP_SAMPLE"])
+
+
+def test_failed_warmup_is_retried(tmp_path, monkeypatch):
+    sample = tmp_path / "sample.csv"
+    warmup = Warmup(app_module.app, str(sample), retry_delay=0.01)
+    monkeypatch.setattr(warmup, "_time_request", lambda df: {"total": 1.0})
+
+    # the sample is missing at the first attempt
+    warmup.start()
+    assert wait_for(lambda: warmup.failures)
+    assert warmup.state == "failed"
+
+    sample.write_text("time_btjd,flux\n1.0,1.0\n")
+    assert wait_for(lambda: warmup.ready)
+    assert warmup.error is None